@@ -1,9 +1,12 @@
 # app/__init__.py
 from flask import Flask
 
-def create_app() -> Flask:
+def create_app(warm_up: bool = True) -> Flask:
     """
     애플리케이션 팩토리
+
+    warm_up: PDF 렌더링 워커를 바로 띄울지 여부. 요청을 처리하지 않는 프로세스
+             (werkzeug 리로더의 감시 프로세스)에서는 False
     """
     app = Flask(
         __name__,
@@ -22,11 +25,26 @@ def create_app() -> Flask:
     from app.routes.certificate import certificate_bp
     from app.routes.payment    import payment_bp
     from app.routes.chatbot    import chatbot_bp # Added chatbot blueprint import
+    from app.routes.queue      import queue_bp
+    from app.routes.changes    import changes_bp
+    from app.routes.admin      import admin_bp
 
     app.register_blueprint(home_bp)        # "/"
     app.register_blueprint(reception_bp)   # "/reception"
     app.register_blueprint(certificate_bp) # "/certificate"
     app.register_blueprint(payment_bp)     # "/payment"
     app.register_blueprint(chatbot_bp)     # "/api/chatbot" (as per url_prefix in chatbot.py)
+    app.register_blueprint(queue_bp)       # "/queue"
+    app.register_blueprint(changes_bp)     # "/api/changes"
+    app.register_blueprint(admin_bp)       # "/admin"
+
+    # 원장에는 커밋되었지만 예약에 반영되지 못한 결제(직전 실행의 쓰기 실패·비정상 종료)를 다시 적용
+    from app.services.payment_service import recover_payment_commits_on_startup
+    recover_payment_commits_on_startup()
+
+    # PDF 렌더링 워커 프로세스를 미리 띄워 (각자 한글 폰트를 한 번 파싱) 첫 증명서 발급이 느려지지 않도록 함
+    if warm_up:
+        from app.services.render_pool import get_render_pool
+        get_render_pool().warm_up()
 
     return app
@@ -0,0 +1,213 @@
+"""
+Command-line maintenance tasks for the kiosk.
+
+Usage:
+    python -m app.cli import-reservations [--csv PATH] [--db PATH] [--replace]
+    python -m app.cli bulk-update CHANGES_FILE
+    python -m app.cli partition-reservations [--csv PATH] [--dir PATH] [--compress]
+    python -m app.cli recover-payments [--since DATE]
+    python -m app.cli settlement [--date DATE] [--format csv|jsonl] [--output PATH]
+    python -m app.cli terminal-simulator [--host HOST] [--port PORT] [--latency S] [--jitter S]
+                                         [--failure-rate P] [--decline-rate P]
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import sys
+from datetime import date
+
+from app.services.reservation_repository import RESV_CSV
+from app.services.storage import DEFAULT_FIELDNAMES, PARTITION_COMPRESS, PARTITION_DIR, SQLITE_DB
+
+
+def _cmd_import_reservations(args) -> int:
+    from app.services.sqlite_store import import_reservations_csv
+
+    try:
+        count = import_reservations_csv(args.csv, args.db, replace=args.replace)
+    except FileNotFoundError:
+        print(f"Error: {args.csv} not found.", file=sys.stderr)
+        return 1
+    print(f"Imported {count} reservations from {args.csv} into {args.db}")
+    return 0
+
+
+def read_changes_file(path: str) -> dict:
+    """
+    Reads a batch of reservation changes from CSV or JSONL.
+
+    CSV:   header with an `rrn` column plus the columns to change; empty
+           cells leave that field untouched.
+             rrn,status
+             970405-1660660,Cancelled
+    JSONL: one object per line with `rrn` and the fields to change.
+             {"rrn": "970405-1660660", "status": "Cancelled"}
+
+    Later lines for the same RRN are merged over earlier ones.
+    """
+    changes = {}
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8-sig") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            entries = [{key: value for key, value in row.items() if value not in (None, "")}
+                       for row in csv.DictReader(f)]
+    for line_no, entry in enumerate(entries, start=1):
+        rrn = str(entry.pop("rrn", "") or "").strip()
+        if not rrn:
+            raise ValueError(f"{path}: entry {line_no} has no rrn")
+        changes.setdefault(rrn, {}).update(entry)
+    return changes
+
+
+def _cmd_bulk_update(args) -> int:
+    from app.services.reception_service import update_reservations_bulk
+
+    try:
+        changes = read_changes_file(args.changes_file)
+    except FileNotFoundError:
+        print(f"Error: {args.changes_file} not found.", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    results = update_reservations_bulk(changes)
+    missing = [rrn for rrn, ok in results.items() if not ok]
+    print(f"Updated {len(results) - len(missing)} of {len(results)} reservations")
+    for rrn in missing:
+        print(f"  not updated: {rrn}")
+    return 0 if not missing else 2
+
+
+def _cmd_partition_reservations(args) -> int:
+    from app.services.partitioned_store import PartitionedReservationStore, split_into_partitions
+    from app.services.reservation_repository import ReservationRepository
+
+    if not os.path.exists(args.csv):
+        print(f"Error: {args.csv} not found.", file=sys.stderr)
+        return 1
+    repo = ReservationRepository(args.csv)
+    fieldnames = repo.fieldnames
+    for column in DEFAULT_FIELDNAMES:
+        if column not in fieldnames:
+            fieldnames.append(column)
+    counts = split_into_partitions(repo.all(), args.dir, fieldnames)
+    # Seal (and optionally compress) every day before today right away
+    PartitionedReservationStore(args.dir, compress=args.compress).roll_over()
+    print(f"Wrote {sum(counts.values())} reservations into {len(counts)} day partitions under {args.dir}")
+    return 0
+
+
+def _cmd_recover_payments(args) -> int:
+    from app.services.payment_service import recover_payment_commits
+
+    count = recover_payment_commits(args.since)
+    print(f"Re-applied {count} committed payments to their reservations")
+    return 0
+
+
+def _cmd_settlement(args) -> int:
+    from app.services.settlement_service import EXPORT_FORMATS, settlement_records
+
+    try:
+        date.fromisoformat(args.date)
+    except ValueError:
+        print(f"Error: {args.date} is not a YYYY-MM-DD date.", file=sys.stderr)
+        return 1
+    exporter = EXPORT_FORMATS[args.format][0]
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        # Service log lines go to stderr so they never end up in the export
+        with contextlib.redirect_stdout(sys.stderr):
+            for chunk in exporter(settlement_records(args.date)):
+                out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+def _cmd_terminal_simulator(args) -> int:
+    from app.services.terminal_simulator import TerminalSimulator
+
+    simulator = TerminalSimulator(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                                  failure_rate=args.failure_rate, decline_rate=args.decline_rate)
+    print(f"Card terminal simulator on {args.host}:{args.port} "
+          f"(latency {args.latency}s ± {args.jitter}s, failure {args.failure_rate:.0%}, decline {args.decline_rate:.0%})")
+    try:
+        asyncio.run(simulator.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Kiosk maintenance tasks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    importer = subparsers.add_parser(
+        "import-reservations", help="Copy reservations.csv into the SQLite database"
+    )
+    importer.add_argument("--csv", default=RESV_CSV, help="Source CSV (default: data/reservations.csv)")
+    importer.add_argument("--db", default=SQLITE_DB, help="Target SQLite file (default: KIOSK_SQLITE_DB)")
+    importer.add_argument("--replace", action="store_true", help="Delete existing reservations first")
+    importer.set_defaults(func=_cmd_import_reservations)
+
+    bulk = subparsers.add_parser(
+        "bulk-update", help="Apply a CSV/JSONL file of {rrn: fields} changes in one pass"
+    )
+    bulk.add_argument("changes_file", help="CSV with an rrn column, or JSONL objects with an rrn key")
+    bulk.set_defaults(func=_cmd_bulk_update)
+
+    partition = subparsers.add_parser(
+        "partition-reservations", help="Split reservations.csv into per-day partition files"
+    )
+    partition.add_argument("--csv", default=RESV_CSV, help="Source CSV (default: data/reservations.csv)")
+    partition.add_argument("--dir", default=PARTITION_DIR, help="Partition directory (default: KIOSK_PARTITION_DIR)")
+    partition.add_argument("--compress", action="store_true", default=PARTITION_COMPRESS,
+                           help="Gzip sealed partitions (default: KIOSK_PARTITION_COMPRESS)")
+    partition.set_defaults(func=_cmd_partition_reservations)
+
+    recover = subparsers.add_parser(
+        "recover-payments", help="Re-apply reservation updates of ledger payments interrupted by a crash"
+    )
+    recover.add_argument("--since", default=date.today().isoformat(),
+                         help="Check payments from this ISO date/time on (default: today)")
+    recover.set_defaults(func=_cmd_recover_payments)
+
+    settlement = subparsers.add_parser(
+        "settlement", help="Export one day's payments with department/method subtotals"
+    )
+    settlement.add_argument("--date", default=date.today().isoformat(), help="Day to export (default: today)")
+    settlement.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Output format (default: csv)")
+    settlement.add_argument("--output", help="File to write (default: standard output)")
+    settlement.set_defaults(func=_cmd_settlement)
+
+    terminal = subparsers.add_parser(
+        "terminal-simulator", help="Run a local card terminal for KIOSK_PAYMENT_GATEWAY=terminal"
+    )
+    terminal.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    terminal.add_argument("--port", type=int, default=9100, help="Port to listen on (default: 9100)")
+    terminal.add_argument("--latency", type=float, default=0.3, help="Seconds per authorization (default: 0.3)")
+    terminal.add_argument("--jitter", type=float, default=0.1, help="Random ± seconds on the latency (default: 0.1)")
+    terminal.add_argument("--failure-rate", type=float, default=0.0,
+                          help="Share of requests answered by dropping the connection (default: 0)")
+    terminal.add_argument("--decline-rate", type=float, default=0.0,
+                          help="Share of payments declined (default: 0)")
+    terminal.set_defaults(func=_cmd_terminal_simulator)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
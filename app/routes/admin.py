@@ -0,0 +1,62 @@
+"""
+관리자 기능 (Blueprint) – 직원 인증 필요 (app/utils/staff_auth.py)
+  • GET /admin/settlement?date=YYYY-MM-DD&format=csv|jsonl → 일일 정산 내역 다운로드 (스트리밍)
+  • GET /admin/analytics?start=YYYY-MM-DD&end=YYYY-MM-DD   → 진료과별 수납액·평균 진료비·상태 분포 (JSON)
+"""
+import sys # Added for logging
+from datetime import date
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from app.services.analytics_service import get_revenue_summary
+from app.services.settlement_service import EXPORT_FORMATS, settlement_records
+from app.utils.staff_auth import require_staff
+
+admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
+admin_bp.before_request(require_staff)  # Exports carry patient data: staff only
+
+
+@admin_bp.route("/settlement", methods=["GET"])
+def settlement():
+    """
+    Payments of one day (default today) joined with reservation department
+    and prescriptions, followed by department/method subtotals and the total.
+    The file is streamed as it is produced.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.settlement(args={{_func_args}})")
+    day = request.args.get("date") or date.today().isoformat()
+    export_format = request.args.get("format", "csv").lower()
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    exporter, content_type = EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(exporter(settlement_records(day))),
+        content_type=content_type,
+        headers={"Content-Disposition": f"attachment; filename=settlement-{day}.{export_format}"},
+    )
+
+
+@admin_bp.route("/analytics", methods=["GET"])
+def analytics():
+    """
+    Revenue and average total_fee per department (Paid reservations) and the
+    status mix, for appointment days in [start, end); both are optional.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.analytics(args={{_func_args}})")
+    start = request.args.get("start") or None
+    end = request.args.get("end") or None
+    try:
+        for day in (start, end):
+            if day is not None:
+                date.fromisoformat(day)
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD"}), 400
+    return jsonify(get_revenue_summary(start, end))
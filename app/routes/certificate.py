@@ -21,6 +21,7 @@ from app.services.certificate_service import (
     prepare_medical_confirmation_pdf,
 )
 from app.services.reception_service import lookup_reservation
+from app.services.render_pool import RenderPoolBusyError
 
 certificate_bp = Blueprint(
     "certificate", __name__, url_prefix="/certificate", template_folder="../../templates"
@@ -98,6 +99,8 @@ def generate_prescription_pdf():
 
         except MissingKoreanFontError as e:
             return render_template("error.html", message=str(e)), 500
+        except RenderPoolBusyError:
+            return render_template("error.html", message="증명서 발급 요청이 많습니다. 잠시 후 다시 시도해주세요."), 503
 
         disposition = f"inline; filename*=UTF-8''{quote(filename)}"
         return Response(
@@ -164,6 +167,8 @@ def generate_confirmation_pdf():
 
     except MissingKoreanFontError as e:
         return render_template("error.html", message=str(e)), 500
+    except RenderPoolBusyError:
+        return render_template("error.html", message="증명서 발급 요청이 많습니다. 잠시 후 다시 시도해주세요."), 503
 
     disposition = f"inline; filename*=UTF-8''{quote(filename)}"
     return Response(
@@ -0,0 +1,40 @@
+"""
+예약 변경 피드 (Blueprint) – 직원 인증 필요 (app/utils/staff_auth.py)
+  • GET /api/changes?since=<seq>&limit=<n> → seq 이후의 예약 변경 내역 (JSON)
+"""
+import sys # Added for logging
+from flask import Blueprint, request, jsonify
+
+from app.services.change_log import MAX_CHANGES_PER_READ, get_change_log
+from app.utils.staff_auth import require_staff
+
+changes_bp = Blueprint("changes", __name__, url_prefix="/api")
+changes_bp.before_request(require_staff)  # Change records carry names and RRNs: staff only
+
+
+@changes_bp.route("/changes", methods=["GET"])
+def changes():
+    """
+    Reservation changes after `since` (default 0), oldest first. Consumers
+    keep `next_since` and pass it back as `since` on their next call; when
+    `next_since` equals `latest` they are up to date.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.changes(args={{_func_args}})")
+    try:
+        since = int(request.args.get("since", 0))
+        limit = int(request.args.get("limit", MAX_CHANGES_PER_READ))
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    if since < 0 or limit < 1:
+        return jsonify({"error": "since must be >= 0 and limit >= 1"}), 400
+
+    log = get_change_log()
+    latest = log.last_seq
+    changes = log.read(since, limit)
+    return jsonify({
+        "changes": changes,
+        "next_since": changes[-1]["seq"] if changes else since,
+        "latest": max(latest, changes[-1]["seq"] if changes else 0),
+    })
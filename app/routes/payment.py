@@ -5,16 +5,17 @@
   • GET  /payment/done   → 결제 완료 화면
 """
 import sys # Added for logging
+import uuid
 from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify
-# Removed: uuid, random, csv, os as their functionality is moved to service
+# Removed: random, csv, os as their functionality is moved to service
 
 from app.services.payment_service import (
-    process_new_payment,
+    commit_payment,
     get_payment_details,
-    load_department_prescriptions,
-    update_reservation_with_payment_details,
+    get_prescription_quote,
 )
 from app.services.reception_service import lookup_reservation
+from app.services.idempotency import get_idempotency_cache
 
 # ──────────────────────────────────────────────────────────
 #  Blueprint 인스턴트를 'payment_bp'라는 이름으로 노출
@@ -34,55 +35,47 @@ def payment():
     print(f"ENTERING: {_module_path}.payment(args={{_func_args}})")
 
     if request.method == "POST":
-        # POST logic remains largely the same, ensure department is available if needed
-        # For POST, department is implicitly handled by what's in session from GET or load_prescriptions
-        patient_id = request.form.get("patient_id", "").strip() # Should come from session or a secure source ideally
-        patient_id = request.form.get("patient_id", "").strip() # Should come from session or a secure source ideally
-
-        amount_raw = request.form.get("amount", "0").replace(",", "")
-        try:
-            # Ensure amount is stored as a number, service expects int for now.
-            # Consider if float is truly needed or if amounts are always integer cents/krw.
-            amount = int(float(amount_raw))
-        except ValueError:
-            amount = 0
-
+        # Only the reservation's own quote is charged; the posted amount is never trusted
+        patient_rrn = session.get("patient_rrn")
+        patient_name = session.get("patient_name")
         method = request.form.get("method", "card")
 
-        # Use patient_rrn from session as patient_id for payment processing, as per previous context
-        # This assumes patient_rrn is a suitable unique identifier for the patient.
-        patient_identifier_for_payment = session.get("patient_rrn", patient_id) # Fallback to form patient_id if not in session
-
-        if not patient_identifier_for_payment:
-             # Handle missing patient identifier, perhaps redirect with error
+        if not patient_rrn or not patient_name:
+            # Handle missing patient identifier, perhaps redirect with error
             return redirect(url_for("reception.reception", error="patient_id_missing_for_payment"))
 
-        pay_id = process_new_payment(
-            patient_id=patient_identifier_for_payment,
-            amount=amount,
-            method=method
-        )
-
-        # Update reservation with prescription details
-        patient_rrn_for_reservation_update = session.get("patient_rrn")
-        # 'last_prescriptions' should hold the list of names from load_prescriptions route
-        prescription_names_to_save = session.get("last_prescriptions")
-        # 'last_total_fee' should hold the total fee from load_prescriptions route
-        total_fee_to_save = session.get("last_total_fee")
-
-        if patient_rrn_for_reservation_update and \
-           prescription_names_to_save is not None and \
-           total_fee_to_save is not None:
-            # Optionally, log the result or handle failure
-            update_reservation_with_payment_details(
-                patient_rrn_for_reservation_update,
-                prescription_names_to_save,
-                total_fee_to_save
+        reservation_details = lookup_reservation(name=patient_name, rrn=patient_rrn)
+        department = (reservation_details or {}).get("department")
+        if not department:
+            return redirect(url_for("reception.reception", error="no_reservation_found"))
+
+        # The quote shown by load_prescriptions; if it expired or was stored by another
+        # worker process, the seeded draw for this department gives the same one again
+        quote = get_prescription_quote(patient_rrn, department)
+        if quote is None or quote.get("error"):
+            return redirect(url_for("payment.payment", error="quote_unavailable"))
+
+        def charge():
+            # Payment and reservation update (prescriptions, total, 'Paid') in one commit
+            return commit_payment(
+                patient_rrn,
+                quote["prescription_names"],
+                quote["total_fee"],
+                method,
+                idempotency_key=key
             )
-        # else:
-            # Optionally, log that some data was missing for reservation update
-            # For example: print("DEBUG: Missing data for reservation update in payment POST")
 
+        # A double tap or a resent POST carries the same key and gets the original
+        # payment back, without another ledger entry or reservation rewrite. The
+        # cache joins repeats in flight in this process; the key stored with the
+        # payment catches repeats that reach another worker process
+        idempotency_key = request.form.get("idempotency_key") or request.headers.get("Idempotency-Key")
+        key = f"{patient_rrn}:{idempotency_key}" if idempotency_key else None
+        pay_id = get_idempotency_cache().run(key, charge)
+
+        if pay_id is None:
+            # Nothing was charged (reservation missing, card declined, storage error): back to the payment form
+            return redirect(url_for("payment.payment", error="payment_failed"))
 
         # 완료 페이지로 리다이렉트
         return redirect(url_for("payment.done", pay_id=pay_id))
@@ -106,7 +99,8 @@ def payment():
             # Redirect or show error if department is missing in reservation
             return redirect(url_for("reception.reception", error="department_missing_in_reservation"))
 
-        return render_template("payment.html", step="initial_payment", department=department)
+        return render_template("payment.html", step="initial_payment", department=department,
+                               idempotency_key=uuid.uuid4().hex)
 
 
 @payment_bp.route("/load_prescriptions", methods=["GET"])
@@ -130,18 +124,13 @@ def load_prescriptions():
     if not department: # Check if department is empty or None
         return jsonify({"error": "Department not found in reservation details. Please complete reception.", "prescriptions": [], "total_fee": 0}), 400
 
-    # Call the service function to load prescriptions
-    result = load_department_prescriptions(department)
+    # The quote is kept server-side (per RRN, with a TTL) and charged as-is by the POST handler
+    result = get_prescription_quote(patient_rrn, department)
 
     if result.get("error"):
         # If the service returns an error, forward it to the client
         return jsonify(result), 400 # Or 500 depending on error type
 
-    # Store prescription names and total fee in session for certificate generation
-    # The service now returns a list of names directly in result["prescriptions"]
-    session["last_prescriptions"] = result["prescription_names"]
-    session["last_total_fee"] = result["total_fee"]
-
     # The client-side JavaScript in payment.html expects a list of objects,
     # each with "Prescription" and "Fee".
     # The current `load_department_prescriptions` service returns a list of names.
@@ -204,10 +193,6 @@ def load_prescriptions():
     # For now, I will use the `prescriptions` key as if it contains the detailed objects.
     # This means I need to ensure the service's `load_department_prescriptions` returns this. (Done in previous step)
 
-    # Store prescription names (for certificate service) and total fee in session
-    session["last_prescriptions"] = result["prescription_names"]
-    session["last_total_fee"] = result["total_fee"]
-
     # Return detailed prescriptions for display on the payment page (for client-side JS)
     return jsonify({"prescriptions": result["prescriptions_for_display"], "total_fee": result["total_fee"]})
 
@@ -0,0 +1,100 @@
+"""
+대기 현황판 (Blueprint)
+  • GET  /queue/          → 대기실 현황판 화면
+  • GET  /queue/stream    → Server-Sent Events (호출·상태 변경 실시간 전송)
+  • POST /queue/call      → 다음 번호 호출 (department, desk)   [직원 인증 필요]
+  • POST /queue/complete  → 진료 완료 처리 (ticket)             [직원 인증 필요]
+"""
+import json
+import os
+import sys # Added for logging
+from flask import Blueprint, Response, render_template, request, jsonify
+
+from app.services.event_bus import get_event_bus
+from app.services.reception_service import call_next_ticket, complete_ticket, get_queue_board
+from app.utils.staff_auth import staff_required
+
+queue_bp = Blueprint("queue", __name__, url_prefix="/queue")
+
+# Idle connections get a comment line this often, so proxies keep them open
+# and a display that went away is noticed on the next write
+SSE_HEARTBEAT_SECONDS = float(os.getenv("KIOSK_SSE_HEARTBEAT", "15"))
+
+
+def _sse(event_type: str, data, event_id: int | None = None) -> str:
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream(subscription, send_snapshot: bool):
+    try:
+        yield "retry: 3000\n\n"
+        if send_snapshot:
+            yield _sse("snapshot", get_queue_board())
+        while True:
+            events = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+            if subscription.take_overflow():
+                # This display fell behind and lost events; the full board replaces them
+                yield _sse("snapshot", get_queue_board())
+            elif events:
+                yield "".join(_sse(event["type"], event["data"], event["id"]) for event in events)
+            else:
+                yield ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+
+@queue_bp.route("/")
+def board():
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.board(args={{_func_args}})")
+    return render_template("queue_board.html")
+
+
+@queue_bp.route("/stream")
+def stream():
+    """
+    Event stream for queue displays. A new display gets a `snapshot` of all
+    departments; a reconnecting one (Last-Event-ID header) gets the events it
+    missed, or a new snapshot if they are no longer buffered.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.stream(args={{_func_args}})")
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+    # Subscribe before the snapshot is read so no event falls in between
+    subscription = get_event_bus().subscribe(last_event_id)
+    return Response(
+        _stream(subscription, send_snapshot=last_event_id is None),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@queue_bp.route("/call", methods=["POST"])
+@staff_required
+def call():
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.call(args={{_func_args}})")
+    data = request.get_json(silent=True) or request.form
+    department = (data.get("department") or "").strip()
+    if not department:
+        return jsonify({"error": "department is required"}), 400
+    ticket = call_next_ticket(department, (data.get("desk") or "").strip())
+    return jsonify({"department": department, "ticket": ticket})
+
+
+@queue_bp.route("/complete", methods=["POST"])
+@staff_required
+def complete():
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.complete(args={{_func_args}})")
+    data = request.get_json(silent=True) or request.form
+    ticket = (data.get("ticket") or "").strip()
+    if not ticket:
+        return jsonify({"error": "ticket is required"}), 400
+    return jsonify({"ticket": ticket, "completed": complete_ticket(ticket)})
@@ -102,6 +102,8 @@ def reception():
             return render_template("reception.html", step="ticket",
                                    department=symptom_result["department"],
                                    ticket=symptom_result["ticket"],
+                                   position=symptom_result.get("position"),
+                                   eta_minutes=symptom_result.get("eta_minutes"),
                                    name=patient_name) # Added name here
 
     # GET → 접수 방법 선택
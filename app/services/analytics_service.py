@@ -0,0 +1,147 @@
+import sys # Added for logging
+import threading
+from itertools import repeat
+
+import numpy as np
+
+from app.services.reservation_repository import RESV_CSV
+from app.services.storage import get_reservation_store
+
+
+def _encode(values: list, label=lambda value: value or "") -> tuple:
+    """
+    Categorical encoding: (sorted labels, int32 code of every value into
+    those labels). `label` maps a raw value to its label; it runs once per
+    distinct value, and values with the same label share a code.
+    """
+    distinct = list(dict.fromkeys(values))
+    labels = sorted({label(value) for value in distinct})
+    code_of = {name: code for code, name in enumerate(labels)}
+    lookup = {value: code_of[label(value)] for value in distinct}
+    return tuple(labels), np.fromiter(map(lookup.__getitem__, values), dtype=np.int32, count=len(values))
+
+
+def _fee(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _day(value) -> str:
+    return (value or "")[:10]
+
+
+def _columns(rows: list, names: tuple) -> list:
+    """One list of values per column name ("" where a row has no such column)."""
+    if not rows:
+        return [[] for _ in names]
+    get = tuple.__getitem__
+    header = get(rows[0], -1)
+    # Every row of one file shares the same header tuple object (count() compares identity first)
+    if list(map(get, rows, repeat(-1))).count(header) != len(rows):
+        # Rows from files with different headers (partitions): per-row Mapping lookups
+        return [[row.get(name, "") for row in rows] for name in names]
+    # Reservation records are tuples: read each column by position, in C
+    return [list(map(get, rows, repeat(header.index(name)))) if name in header else [""] * len(rows)
+            for name in names]
+
+
+class ReservationFrame:
+    """
+    Reservation columns as NumPy arrays, for group-by aggregates over many
+    rows: department, status and appointment day as categorical int32 codes
+    (with their label tuples) and total_fee as int64. Rows are read once;
+    every aggregate is a few vectorized passes (bincount over the codes).
+    """
+
+    def __init__(self, rows):
+        rows = rows if isinstance(rows, list) else list(rows)
+        departments, statuses, times, fees = _columns(rows, ("department", "status", "time", "total_fee"))
+        self.departments, self.department = _encode(departments)
+        self.statuses, self.status = _encode(statuses)
+        self.days, self.day = _encode(times, _day)
+        fee_labels, fee_codes = _encode(fees, _fee)
+        self.total_fee = np.array(fee_labels, dtype=np.int64)[fee_codes]
+
+    def __len__(self) -> int:
+        return len(self.total_fee)
+
+    def _mask(self, status: str | None = None, start: str | None = None, end: str | None = None):
+        """Rows with `status` and an appointment day in [start, end) (YYYY-MM-DD), as a bool array."""
+        mask = np.ones(len(self), dtype=bool)
+        if status is not None:
+            mask &= self.status == (self.statuses.index(status) if status in self.statuses else -1)
+        if start is not None or end is not None:
+            # Filter on the few distinct day labels, then select their codes
+            wanted = [code for code, day in enumerate(self.days)
+                      if day and (start is None or day >= start) and (end is None or day < end)]
+            mask &= np.isin(self.day, wanted)
+        return mask
+
+    def revenue_by_department(self, status: str | None = "Paid", start: str | None = None,
+                              end: str | None = None) -> dict:
+        """{department: (count, total_fee sum)} of the selected rows."""
+        mask = self._mask(status, start, end)
+        codes = self.department[mask]
+        counts = np.bincount(codes, minlength=len(self.departments))
+        sums = np.bincount(codes, weights=self.total_fee[mask], minlength=len(self.departments))
+        return {department: (int(counts[code]), int(sums[code]))
+                for code, department in enumerate(self.departments) if counts[code]}
+
+    def status_mix(self, start: str | None = None, end: str | None = None) -> dict:
+        """{department: {status: count}} of the rows in the day range."""
+        mask = self._mask(None, start, end)
+        width = len(self.statuses)
+        cells = np.bincount(self.department[mask].astype(np.int64) * width + self.status[mask],
+                            minlength=len(self.departments) * width).reshape(len(self.departments), width)
+        return {department: {status: int(cells[d, s]) for s, status in enumerate(self.statuses) if cells[d, s]}
+                for d, department in enumerate(self.departments) if cells[d].any()}
+
+
+_frame_lock = threading.Lock()
+_frame_cache = {}  # "key" -> (store, store signature), "frame" -> ReservationFrame
+
+
+def get_reservation_frame() -> ReservationFrame:
+    """
+    ReservationFrame of every reservation. It is rebuilt only when the
+    store's signature() changed (any write, from any process), so repeated
+    summaries cost just the vectorized aggregates.
+    """
+    store = get_reservation_store(RESV_CSV)
+    # Read before all(): a write in between makes the frame newer than its key, never older
+    signature = store.signature()
+    key = (id(store), signature)
+    with _frame_lock:
+        if signature is None or _frame_cache.get("key") != key:
+            _frame_cache["frame"] = ReservationFrame(store.all())
+            _frame_cache["key"] = key
+        return _frame_cache["frame"]
+
+
+def get_revenue_summary(start: str | None = None, end: str | None = None) -> dict:
+    """
+    Revenue per department (sum and average total_fee of Paid reservations)
+    and the status mix per department, for appointments on days in
+    [start, end) (YYYY-MM-DD; both optional).
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.get_revenue_summary(args={{_func_args}})")
+    frame = get_reservation_frame()
+    revenue = frame.revenue_by_department("Paid", start, end)
+    paid_count = sum(count for count, _ in revenue.values())
+    paid_total = sum(total for _, total in revenue.values())
+    return {
+        "start": start,
+        "end": end,
+        "departments": {
+            department: {"paid": count, "revenue": total, "average_fee": round(total / count)}
+            for department, (count, total) in revenue.items()
+        },
+        "paid": paid_count,
+        "revenue": paid_total,
+        "average_fee": round(paid_total / paid_count) if paid_count else 0,
+        "status_mix": frame.status_mix(start, end),
+    }
@@ -0,0 +1,224 @@
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Issued certificate PDFs on disk, shared by every worker process and kept across
+# restarts. Off unless set: the files hold patient names and RRNs.
+CERTIFICATE_CACHE_DIR = os.getenv("KIOSK_CERTIFICATE_CACHE_DIR", "")
+# Size bounds of the in-memory tier and of the disk tier
+CERTIFICATE_CACHE_MEMORY_BYTES = int(os.getenv("KIOSK_CERTIFICATE_CACHE_MEMORY_MB", "32")) * 1024 * 1024
+CERTIFICATE_CACHE_DISK_BYTES = int(os.getenv("KIOSK_CERTIFICATE_CACHE_DISK_MB", "512")) * 1024 * 1024
+# Disk files older than this are deleted, hit or not
+CERTIFICATE_CACHE_MAX_AGE = float(os.getenv("KIOSK_CERTIFICATE_CACHE_DAYS", "1")) * 24 * 3600
+# Key of the file names; without it a secret is generated in the cache directory
+CERTIFICATE_CACHE_SECRET = os.getenv("KIOSK_CERTIFICATE_CACHE_SECRET", "")
+SECRET_FILE_NAME = ".secret"
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def cache_secret() -> bytes:
+    """
+    HMAC key of certificate_key(): KIOSK_CERTIFICATE_CACHE_SECRET, else a
+    random key stored once per install in CERTIFICATE_CACHE_DIR (readable by
+    this user only, so every worker process names files alike), else a
+    random key for this process (memory tier only).
+    """
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            if CERTIFICATE_CACHE_SECRET:
+                _secret = CERTIFICATE_CACHE_SECRET.encode("utf-8")
+            elif CERTIFICATE_CACHE_DIR:
+                _secret = _load_or_create_secret(os.path.join(CERTIFICATE_CACHE_DIR, SECRET_FILE_NAME))
+            else:
+                _secret = os.urandom(32)
+        return _secret
+
+
+def _load_or_create_secret(path: str) -> bytes:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):  # Another worker may be writing it right now
+            with open(path, "rb") as f:
+                secret = f.read()
+            if len(secret) == 32:
+                return secret
+            time.sleep(0.01)
+        raise RuntimeError(f"Certificate cache secret {path} is damaged; delete it to start a new cache")
+    secret = os.urandom(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+        f.flush()
+        os.fsync(f.fileno())
+    return secret
+
+
+def certificate_key(doc_type: str, fields: dict, layout: str = "", secret: bytes | None = None) -> str:
+    """
+    Content address of a certificate: HMAC-SHA256, keyed with `secret`
+    (default cache_secret()), of its type, layout version and every field
+    printed on it, so the same inputs always give the same key but a file
+    name cannot be checked against a guessed RRN without the key.
+    """
+    payload = json.dumps({"type": doc_type, "layout": layout, "fields": fields},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hmac.new(secret or cache_secret(), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+class CertificateCache:
+    """
+    Issued certificate PDFs by content address, in two tiers: an LRU in
+    memory holding at most `memory_bytes`, over one file per certificate in
+    `directory` (None: memory only). The disk tier is shared by worker
+    processes; files are written atomically and count as missing once they
+    are `max_age` seconds old. Expired files are deleted on a hit and by a
+    sweep of the directory at most every `max_age` / 24 seconds, and once it
+    grows past `disk_bytes` the oldest files are deleted down to 90% of it.
+    """
+
+    def __init__(self, directory: str | None = CERTIFICATE_CACHE_DIR or None,
+                 memory_bytes: int = CERTIFICATE_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = CERTIFICATE_CACHE_DISK_BYTES,
+                 max_age: float = CERTIFICATE_CACHE_MAX_AGE):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> PDF bytes, least recently used first
+        self._memory_size = 0
+        self._disk_size = None        # Bytes in `directory`, scanned on first write
+        self._next_sweep = 0.0        # time.time() of the next sweep for expired files
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _remember_locked(self, key: str, data: bytes) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        if len(data) > self.memory_bytes:
+            return
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def get(self, key: str) -> bytes | None:
+        """The cached PDF for `key` from memory or disk, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        data = None
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    if time.time() - os.fstat(f.fileno()).st_mtime < self.max_age:
+                        data = f.read()
+                if data is None:
+                    os.remove(path)  # Expired
+            except OSError:
+                data = None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember_locked(key, data)
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Stores a PDF in memory and on disk."""
+        with self._lock:
+            self._remember_locked(key, data)
+        if self.directory is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            existed = os.path.exists(path)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")  # Readable by this user only
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print(f"Warning: Could not write certificate cache file {path}: {e}")
+            return
+        with self._lock:
+            if self._disk_size is not None and not existed:
+                self._disk_size += len(data)
+            needs_scan = (self._disk_size is None or self._disk_size > self.disk_bytes
+                          or time.time() >= self._next_sweep)
+        if needs_scan:
+            self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        """Deletes expired files, then the oldest ones once the directory exceeds disk_bytes."""
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                    if now - stat.st_mtime >= self.max_age:
+                        os.remove(entry.path)
+                        continue
+                except OSError:
+                    continue  # Deleted by another worker
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        total = sum(size for _, _, size in files)
+        if total > self.disk_bytes:
+            files.sort()
+            for _, path, size in files:
+                if total <= self.disk_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+        with self._lock:
+            self._disk_size = total
+            self._next_sweep = now + self.max_age / 24
+
+    def get_or_render(self, key: str, render) -> bytes:
+        """The cached PDF for `key`; on a miss `render()` builds it and the result is stored."""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            if data:
+                self.put(key, data)
+        return data
+
+
+_certificate_cache = None
+_certificate_cache_lock = threading.Lock()
+
+
+def get_certificate_cache() -> CertificateCache:
+    """Returns the process-wide certificate cache."""
+    global _certificate_cache
+    with _certificate_cache_lock:
+        if _certificate_cache is None:
+            _certificate_cache = CertificateCache()
+        return _certificate_cache
@@ -1,11 +1,20 @@
-import csv
 import os
 import random
 import sys # Added for logging
-from datetime import datetime, timedelta # Moved timedelta here
+from datetime import datetime
 from io import BytesIO
 
-from app.utils.pdf_generator import create_prescription_pdf_bytes, create_confirmation_pdf_bytes, MissingKoreanFontError
+from app.services.certificate_cache import certificate_key, get_certificate_cache
+from app.services.fee_catalog import get_fee_catalog
+from app.services.render_pool import get_render_pool
+from app.services.reservation_repository import RESV_CSV
+from app.services.storage import get_reservation_reader
+from app.utils.pdf_generator import (
+    create_prescription_pdf_bytes,
+    create_confirmation_pdf_bytes,
+    layout_fingerprint,
+    MissingKoreanFontError,
+)
 
 
 def get_prescription_data_for_pdf(patient_rrn: str, department: str):
@@ -24,18 +33,9 @@ def get_prescription_data_for_pdf(patient_rrn: str, department: str):
         # Fallback if __file__ is not defined
         reservations_csv_path = os.path.join("data", "reservations.csv") # Assumes PWD is project root
 
-    if not os.path.exists(reservations_csv_path):
-        return ("FILE_NOT_FOUND", "예약 데이터 파일을 찾을 수 없습니다.")
-
-    patient_reservation_data = None
     try:
-        with open(reservations_csv_path, mode='r', encoding='utf-8-sig') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row.get('rrn') == patient_rrn:
-                    patient_reservation_data = row
-                    break
-    except FileNotFoundError: # Should be caught by os.path.exists, but good for robustness
+        patient_reservation_data = get_reservation_reader(reservations_csv_path).get_by_rrn(patient_rrn)
+    except FileNotFoundError:
         return ("FILE_NOT_FOUND", "예약 데이터 파일을 찾을 수 없습니다.")
     except Exception as e:
         # print(f"Error reading {reservations_csv_path}: {e}") # For server-side debugging
@@ -82,21 +82,14 @@ def get_prescription_data_for_pdf(patient_rrn: str, department: str):
             else:
                 parsed_prescription_names = []
 
-            treatment_fees_path = os.path.join(base_dir, "data", "treatment_fees.csv")
-            treatment_fee_map = {}
-            if os.path.exists(treatment_fees_path):
-                try:
-                    with open(treatment_fees_path, newline="", encoding="utf-8-sig") as fee_file:
-                        fee_reader = csv.DictReader(fee_file)
-                        for row in fee_reader:
-                            treatment_fee_map[row.get("Prescription", "").strip()] = int(row.get("Fee", 0))
-                except Exception:
-                    # If CSV reading fails, fall back to zero fees
-                    treatment_fee_map = {}
-
+            fee_catalog = get_fee_catalog()
             selected_prescriptions = []
             for med_name in parsed_prescription_names:
-                fee_val = treatment_fee_map.get(med_name, 0)
+                try:
+                    fee_val = fee_catalog.fee_of(med_name, 0)
+                except Exception:
+                    # If the fee table cannot be read, fall back to zero fees
+                    fee_val = 0
                 selected_prescriptions.append({"name": med_name, "fee": fee_val})
 
             # department argument is used here
@@ -111,6 +104,31 @@ def get_prescription_data_for_pdf(patient_rrn: str, department: str):
             return ("OK", prescription_data_template)
 
 
+def _issue_certificate(doc_type: str, fields: dict, build):
+    """
+    PDF bytes of a certificate, from the certificate cache when the same
+    certificate (type, layout and printed fields) was issued before, so a
+    reprint is not rendered again. Otherwise build(**fields) runs in the
+    render pool; raises RenderPoolBusyError when the pool cannot take it.
+    """
+    key = certificate_key(doc_type, fields, layout_fingerprint(doc_type))
+    return get_certificate_cache().get_or_render(key, lambda: get_render_pool().run(build, **fields))
+
+
+def _visit_date(patient_rrn: str) -> str | None:
+    """Appointment date (YYYY-MM-DD) of the patient's reservation, or None."""
+    try:
+        reservation = get_reservation_reader(RESV_CSV).get_by_rrn(patient_rrn)
+    except Exception as e:
+        print(f"Warning: Could not read the reservation of {patient_rrn}: {e}")
+        return None
+    day = ((reservation or {}).get("time") or "")[:10]
+    try:
+        return datetime.strptime(day, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
 def prepare_prescription_pdf(patient_name: str, patient_rrn: str, department: str, prescription_details: dict):
     """
     Prepares the prescription PDF using the provided data.
@@ -121,21 +139,17 @@ def prepare_prescription_pdf(patient_name: str, patient_rrn: str, department: st
     if not prescription_details:
         return None, None
 
-    # Add patient information to the prescription data
-    prescription_data = prescription_details.copy() # Avoid modifying the input dict directly
-    prescription_data["patient_name"] = patient_name
-    prescription_data["patient_rrn"] = patient_rrn
-
-    # Call with explicit arguments matching the updated signature
-    pdf_bytes = create_prescription_pdf_bytes(
-        patient_name=prescription_data["patient_name"],
-        patient_rrn=prescription_data["patient_rrn"],
-        department=prescription_data["department"],
-        prescriptions=prescription_data["prescriptions"],
-        total_fee=prescription_data["total_fee"],
-        doctor_name=prescription_data["doctor_name"],
-        issue_date=prescription_data["issue_date"]
-    )
+    # Everything printed on the prescription; the same inputs give the same (cached) PDF
+    fields = {
+        "patient_name": patient_name,
+        "patient_rrn": patient_rrn,
+        "department": prescription_details["department"],
+        "prescriptions": prescription_details["prescriptions"],
+        "total_fee": prescription_details["total_fee"],
+        "doctor_name": prescription_details["doctor_name"],
+        "issue_date": prescription_details["issue_date"],
+    }
+    pdf_bytes = _issue_certificate("prescription", fields, create_prescription_pdf_bytes)
     filename = f"prescription_{patient_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
     return pdf_bytes, filename
 
@@ -147,17 +161,17 @@ def prepare_medical_confirmation_pdf(patient_name: str, patient_rrn: str, diseas
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.prepare_medical_confirmation_pdf(args={{_func_args}})")
-    # For confirmation, we might need a diagnosis date.
-    # This could come from session or be fixed for simplicity here.
-    date_of_diagnosis = (datetime.now() - timedelta(days=random.randint(1, 30))).strftime("%Y-%m-%d") # Simulate a past diagnosis
     date_of_issue = datetime.now().strftime("%Y-%m-%d")
-
-    pdf_bytes = create_confirmation_pdf_bytes(
-        patient_name=patient_name,
-        patient_rrn=patient_rrn,
-        disease_name=disease_name, # department is used as disease_name
-        date_of_diagnosis=date_of_diagnosis,
-        date_of_issue=date_of_issue
-    )
+    # The visit date on record, so a reprint states the same diagnosis date
+    date_of_diagnosis = _visit_date(patient_rrn) or date_of_issue
+
+    fields = {
+        "patient_name": patient_name,
+        "patient_rrn": patient_rrn,
+        "disease_name": disease_name, # department is used as disease_name
+        "date_of_diagnosis": date_of_diagnosis,
+        "date_of_issue": date_of_issue,
+    }
+    pdf_bytes = _issue_certificate("confirmation", fields, create_confirmation_pdf_bytes)
     filename = f"medical_confirmation_{patient_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
     return pdf_bytes, filename
@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+
+from app.utils.file_lock import append_bytes, file_lock
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+CHANGE_LOG = os.getenv("KIOSK_CHANGE_LOG", os.path.join(BASE_DIR, "data", "changes.jsonl"))
+# fsync every change (survives power loss, costs a disk flush per mutation)
+CHANGE_LOG_FSYNC = os.getenv("KIOSK_CHANGE_LOG_FSYNC", "0").strip().lower() in ("1", "true", "yes")
+# Most changes returned by one read
+MAX_CHANGES_PER_READ = 1000
+
+
+class ChangeLog:
+    """
+    Durable, sequenced feed of reservation mutations (change data capture).
+
+    Every change is one JSON line in an append-only file:
+    {"seq", "ts", "op", "rrn", "status", "previous_status", "fields"}.
+    `seq` increases by one per change across all worker processes: appends
+    hold an fcntl lock on `<log>.lock`, catch up on lines other processes
+    wrote, and take the next number.
+
+    Only the byte offset of each line is kept in memory, so a consumer's
+    `read(since)` is a binary search plus one seek, however long the log is.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._seqs = array("q")
+        self._offsets = array("q")
+        self._offset = 0
+
+    @property
+    def last_seq(self) -> int:
+        with self._lock:
+            self._catch_up_locked(repair=False)
+            return self._seqs[-1] if self._seqs else 0
+
+    def _catch_up_locked(self, repair: bool) -> None:
+        try:
+            with open(self.path, mode="rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        if repair and end < len(data):
+            # Only called with the file lock held: a line without newline was
+            # left by a writer that died mid-append. Terminate it so it is skipped.
+            append_bytes(self.path, b"\n")
+            data += b"\n"
+            end = len(data)
+        position = 0
+        while position < end:
+            line_end = data.index(b"\n", position) + 1
+            try:
+                seq = json.loads(data[position:line_end])["seq"]
+            except (ValueError, KeyError, TypeError):
+                print(f"Warning: Skipping malformed record in {self.path}")
+            else:
+                self._seqs.append(seq)
+                self._offsets.append(self._offset + position)
+            position = line_end
+        self._offset += end
+
+    def append_many(self, changes: list) -> list:
+        """
+        Appends changes (dicts made by reservation_change) in one write.
+        Returns their sequence numbers.
+        """
+        if not changes:
+            return []
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.now().isoformat(timespec="milliseconds")
+        with self._lock, file_lock(self.path + ".lock"):
+            self._catch_up_locked(repair=True)
+            seq = self._seqs[-1] if self._seqs else 0
+            seqs, lines = [], []
+            for change in changes:
+                seq += 1
+                seqs.append(seq)
+                lines.append(json.dumps({"seq": seq, "ts": timestamp, **change},
+                                        ensure_ascii=False, separators=(",", ":")) + "\n")
+            append_bytes(self.path, "".join(lines).encode("utf-8"), fsync=self.fsync)
+            # Let the next catch-up index our own lines like anyone else's
+            self._catch_up_locked(repair=False)
+        return seqs
+
+    def read(self, since: int = 0, limit: int = MAX_CHANGES_PER_READ) -> list:
+        """Changes with seq > `since`, oldest first, at most `limit` of them."""
+        limit = max(0, min(limit, MAX_CHANGES_PER_READ))
+        with self._lock:
+            self._catch_up_locked(repair=False)
+            start = bisect_right(self._seqs, since)
+            stop = min(start + limit, len(self._offsets))
+            if start >= stop:
+                return []
+            first = self._offsets[start]
+            last = self._offsets[stop] if stop < len(self._offsets) else self._offset
+        with open(self.path, mode="rb") as f:
+            f.seek(first)
+            data = f.read(last - first)
+        changes = []
+        for line in data.splitlines():
+            try:
+                changes.append(json.loads(line))
+            except ValueError:
+                continue  # Torn line, already reported when indexed
+        return changes
+
+
+_change_logs = {}
+_change_logs_lock = threading.Lock()
+
+
+def get_change_log(path: str | None = None) -> ChangeLog:
+    """Returns the process-wide change log for `path` (CHANGE_LOG by default)."""
+    path = path or CHANGE_LOG
+    with _change_logs_lock:
+        log = _change_logs.get(path)
+        if log is None:
+            log = ChangeLog(path, fsync=CHANGE_LOG_FSYNC)
+            _change_logs[path] = log
+        return log
+
+
+def reservation_change(op: str, rrn: str, fields: dict, previous=None) -> dict:
+    """
+    One change record: `op` is "insert" or "update", `fields` the columns
+    written, `previous` the reservation as it was before (None for inserts).
+    """
+    return {
+        "op": op,
+        "rrn": rrn,
+        "status": fields.get("status"),
+        "previous_status": previous.get("status") if previous is not None else None,
+        "fields": dict(fields),
+    }
+
+
+def record_changes(changes: list) -> list:
+    """Appends reservation changes to the change log. Returns their sequence numbers; write errors propagate."""
+    return get_change_log().append_many(changes)
+
+
+def change_recorder(op: str):
+    """
+    `on_commit` callback for store writes (see storage.ReservationStore):
+    records one `op` change per applied (rrn, fields, previous), while the
+    store still holds its write lock.
+    """
+    def record(applied: list) -> None:
+        record_changes([reservation_change(op, rrn, fields, previous) for rrn, fields, previous in applied])
+    return record
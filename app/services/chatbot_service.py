@@ -13,19 +13,24 @@ from app.services.reception_service import (
     handle_choose_symptom_action,
     # add_new_patient_reception, # Removed as per new logic
     new_ticket, # Added
+    join_queue,
+    get_queue_status,
     update_reservation_status, # Added
     # fake_scan_rrn # Not using fake_scan_rrn in this path for now
 )
 from app.services.payment_service import (
-    load_department_prescriptions,
-    update_reservation_with_payment_details
+    get_prescription_quote,
+    commit_payment,
+    quote_idempotency_key
 )
+from app.services.idempotency import get_idempotency_cache
 from app.services.certificate_service import (
     get_prescription_data_for_pdf,
     prepare_prescription_pdf,
     prepare_medical_confirmation_pdf
 )
 from app.utils.pdf_generator import MissingKoreanFontError
+from app.services.render_pool import RenderPoolBusyError
 # base64 is already imported at the top of the file, so no need to re-import here.
 
 # Corrected SYSTEM_INSTRUCTION_PROMPT based on original chatbot.py
@@ -211,6 +216,15 @@ SYSTEM_INSTRUCTION_PROMPT = """당신은 대한민국 공공 보건소의 친절
 이제 사용자의 요청에 따라 위 지침을 정확히 준수하여 응답해주세요."""
 
 # Placeholder functions for handling specific intents
+def _queue_eta_text(queue_status: dict | None) -> str:
+    """Sentence with the place in line and estimated wait, or "" if the ticket is not waiting."""
+    if not queue_status or queue_status.get("state") != "waiting":
+        return ""
+    if queue_status["eta_minutes"] > 0:
+        return f" 현재 대기 순서는 {queue_status['position']}번째이며, 예상 대기시간은 약 {queue_status['eta_minutes']}분입니다."
+    return f" 현재 대기 순서는 {queue_status['position']}번째이며, 곧 호출될 예정입니다."
+
+
 def handle_reception_request(parameters: dict, user_query: str) -> dict:
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
@@ -237,6 +251,7 @@ def handle_reception_request(parameters: dict, user_query: str) -> dict:
 
         if status == "Registered":
             reply_message = f"{name}님은 이미 {dept}으로 접수되셨습니다. 대기번호는 {ticket}번 입니다."
+            reply_message += _queue_eta_text(get_queue_status(ticket) if ticket != "알 수 없음" else None)
             if time_from_csv and time_from_csv.strip():
                 reply_message += f" 예약 시간: {time_from_csv}."
             if location_from_csv and location_from_csv.strip():
@@ -279,7 +294,13 @@ def handle_reception_request(parameters: dict, user_query: str) -> dict:
             if not final_department : # Should ideally be resolved by now, but as a safeguard
                  return {"reply": f"{patient_name}님, 예약 처리를 위해 진료 부서 정보가 필요합니다. 증상을 말씀해주시겠어요?"}
 
-            new_ticket_number = new_ticket(final_department)
+            if not pending_department:
+                # handle_choose_symptom_action already issued and queued a ticket
+                new_ticket_number = symptom_action_result["ticket"]
+                queue_status = get_queue_status(new_ticket_number)
+            else:
+                new_ticket_number = new_ticket(final_department)
+                queue_status = join_queue(new_ticket_number)
 
             update_kwargs = {
                 'department': final_department,
@@ -303,6 +324,7 @@ def handle_reception_request(parameters: dict, user_query: str) -> dict:
                     base_reply += f" 위치: {loc_val}."
                 if doc_val and doc_val.strip():
                     base_reply += f" 담당 의사: {doc_val}."
+                base_reply += _queue_eta_text(queue_status)
                 return {"reply": base_reply}
             else:
                 return {"error": "예약 상태 업데이트 중 오류가 발생했습니다. 데스크에 문의해주세요.", "status_code": 500}
@@ -351,7 +373,8 @@ def handle_payment_request(parameters: dict, user_query: str) -> dict:
 
     if payment_stage == "initial":
         try:
-            prescription_info = load_department_prescriptions(department)
+            # Stored server-side per RRN, so the confirmation stage charges exactly this quote
+            prescription_info = get_prescription_quote(rrn, department)
             if prescription_info.get("error"):
                 return {"reply": f"처방 정보를 불러오는 중 오류가 발생했습니다: {prescription_info['error']}"}
 
@@ -393,24 +416,13 @@ def handle_payment_request(parameters: dict, user_query: str) -> dict:
 
     
         # Optional: Validate AI extracted parameters against actual data if needed.
-        # For now, we will trust the re-fetched data as the source of truth.
-        # The variables retrieved_total_fee_str and retrieved_prescription_names from parameters are no longer used directly for processing.
+        # The quote stored in the initial stage is the source of truth; the
+        # variables retrieved_total_fee_str and retrieved_prescription_names from parameters are not used for processing.
 
-        prescription_info = load_department_prescriptions(department)
+        prescription_info = get_prescription_quote(rrn, department)
         if prescription_info.get("error"):
             return {"reply": f"처방 정보를 불러오는 중 오류가 발생했습니다: {prescription_info['error']}"}
 
-        print(prescription_info)
-
-        
-        # Correctly get the list of detailed prescription objects
-        detailed_prescriptions = prescription_info.get("prescriptions_for_display", [])
-
-        # Format the prescriptions for display.
-        # This relies on payment_service.load_department_prescriptions correctly providing 'name' and 'fee'
-        # in the dictionaries within the 'prescriptions_for_display' list.
-        formatted_prescriptions = "\n".join([f"- {item['name']}: {item['fee']}원" for item in detailed_prescriptions])
-
         # Get other necessary info from prescription_info
         actual_prescription_names = prescription_info.get("prescription_names", [])
         actual_total_fee = prescription_info.get("total_fee")
@@ -420,9 +432,16 @@ def handle_payment_request(parameters: dict, user_query: str) -> dict:
             if not isinstance(actual_total_fee, int):
                  actual_total_fee = int(actual_total_fee)
 
-            success = update_reservation_with_payment_details(rrn, actual_prescription_names, actual_total_fee)
+            # A repeated confirmation for the same reservation and quote returns the
+            # original payment instead of charging again, in any worker process
+            key = quote_idempotency_key(rrn, reservation_details.get("time", ""), prescription_info)
+            pay_id = get_idempotency_cache().run(
+                key,
+                lambda: commit_payment(rrn, actual_prescription_names, actual_total_fee, payment_method,
+                                       idempotency_key=key)
+            )
 
-            if success:
+            if pay_id is not None:
                 return {"reply": f"{name}님의 결제가 {payment_method}로 완료되었습니다. 총 {actual_total_fee}원이 결제되었습니다. 감사합니다."}
             else:
                 return {"error": "결제 처리 중 내부 오류가 발생했습니다. 다시 시도해주시거나 데스크에 문의하세요.", "status_code": 500}
@@ -516,6 +535,10 @@ def handle_certificate_request(parameters: dict, user_query: str) -> dict:
         # This error is specifically from the PDF generation utility.
         print("MissingKoreanFontError caught in handle_certificate_request")
         return {"reply": "증명서 PDF 생성에 필요한 한글 글꼴을 찾을 수 없습니다. 시스템 관리자에게 문의해주세요.", "status_code": 500}
+    except RenderPoolBusyError as e:
+        # The PDF workers are saturated or too slow; the request can simply be repeated.
+        print(f"RenderPoolBusyError caught in handle_certificate_request: {e}")
+        return {"reply": "증명서 발급 요청이 많습니다. 잠시 후 다시 시도해주세요.", "status_code": 503}
     except Exception as e:
         # Catch any other unexpected errors during the process.
         print(f"Error in handle_certificate_request for {name} ({rrn}), type {certificate_type}: {e}")
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Events a display may fall behind by before the oldest are dropped
+EVENT_BUFFER_SIZE = int(os.getenv("KIOSK_EVENT_BUFFER", "256"))
+# Recent events kept for displays that reconnect with Last-Event-ID
+EVENT_HISTORY_SIZE = int(os.getenv("KIOSK_EVENT_HISTORY", "256"))
+
+
+class Subscription:
+    """
+    One connected display. Events land in a bounded deque; when the display
+    reads too slowly the oldest events are dropped and `overflowed` is set,
+    so it can resync from a snapshot instead of holding up the publisher.
+    """
+
+    def __init__(self, bus, maxlen: int):
+        self._bus = bus
+        self._events = deque(maxlen=maxlen)
+        self._ready = threading.Condition(threading.Lock())
+        self.overflowed = False
+        self.closed = False
+
+    def _push(self, event: dict) -> None:
+        with self._ready:
+            if len(self._events) == self._events.maxlen:
+                self.overflowed = True
+            self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: float | None = None) -> list:
+        """
+        Waits up to `timeout` seconds for events and returns all that are
+        buffered (oldest first), or [] on timeout or once closed.
+        """
+        with self._ready:
+            if not self._events and not self.closed:
+                self._ready.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def take_overflow(self) -> bool:
+        """True once after events were dropped for this display."""
+        with self._ready:
+            overflowed, self.overflowed = self.overflowed, False
+            return overflowed
+
+    def close(self) -> None:
+        self._bus.unsubscribe(self)
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for the queue board.
+
+    `publish()` stamps an event with an increasing id and appends it to every
+    subscriber's buffer; it never waits on a reader, so N displays cost one
+    fan-out per event rather than N polls of the reservation file.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE, history_size: int = EVENT_HISTORY_SIZE):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: dict) -> dict:
+        """Sends {id, type, data, ts} to every subscriber and returns it."""
+        with self._lock:
+            self._last_id += 1
+            event = {"id": self._last_id, "type": event_type, "data": data, "ts": time.time()}
+            self._history.append(event)
+            # Pushing never blocks, so holding the lock only keeps ids in order per display
+            for subscription in self._subscribers:
+                subscription._push(event)
+        return event
+
+    def subscribe(self, last_event_id: int | None = None) -> Subscription:
+        """
+        Registers a display. With `last_event_id`, events after it that are
+        still in the history are queued first; if the gap is older than the
+        history, the subscription starts out overflowed (resync needed).
+        """
+        subscription = Subscription(self, self.buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [event for event in self._history if event["id"] > last_event_id]
+                oldest = self._history[0]["id"] if self._history else self._last_id + 1
+                if oldest > last_event_id + 1:
+                    subscription.overflowed = True
+                for event in missed:
+                    subscription._push(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    """Returns the process-wide event bus."""
+    return _bus
+
+
+def publish(event_type: str, data: dict) -> dict:
+    """Publishes on the process-wide event bus."""
+    return _bus.publish(event_type, data)
+
+
+def publish_status_change(record, status: str) -> dict | None:
+    """
+    Announces a reservation status change on the board. Only the ticket and
+    department go out, never the patient's name or RRN (displays are public).
+    """
+    if record is None:
+        return None
+    return _bus.publish("status_changed", {
+        "ticket": record.get("ticket_number") or "",
+        "department": record.get("department") or "",
+        "status": status,
+    })
@@ -0,0 +1,81 @@
+import csv
+import os
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+TREATMENT_FEES_CSV = os.path.join(BASE_DIR, "data", "treatment_fees.csv")
+
+
+def _department_key(department: str) -> str:
+    return (department or "").strip().lower()
+
+
+class FeeCatalog:
+    """
+    data/treatment_fees.csv parsed once and indexed two ways: department →
+    prescription items ({"name", "fee"}, in file order) and prescription
+    name → fee. Every lookup stats the file and reloads it only when its
+    mtime, size or inode changed, so edits to the fee table are picked up
+    without re-parsing it on each request.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._by_department = {}
+        self._fees = {}
+        self._invalid = {}
+
+    def _refresh(self) -> None:
+        """Reloads the table if it changed. Raises FileNotFoundError if it is missing."""
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._lock:
+            if signature == self._signature:
+                return
+            by_department, fees, invalid = {}, {}, {}
+            with open(self.path, newline="", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    name = (row.get("Prescription") or "").strip()
+                    key = _department_key(row.get("Department"))
+                    try:
+                        fee = int(row.get("Fee"))
+                    except (TypeError, ValueError):
+                        invalid.setdefault(key, row.get("Prescription"))
+                        continue
+                    by_department.setdefault(key, []).append({"name": row["Prescription"], "fee": fee})
+                    fees[name] = fee
+            self._by_department = {key: tuple(items) for key, items in by_department.items()}
+            self._fees, self._invalid = fees, invalid
+            self._signature = signature
+
+    def items_for(self, department: str) -> list:
+        """Prescription items ({"name", "fee"}) of a department, case-insensitive; [] if none."""
+        self._refresh()
+        return [dict(item) for item in self._by_department.get(_department_key(department), ())]
+
+    def invalid_item(self, department: str) -> str | None:
+        """Name of the first prescription of a department whose fee is not a number, if any."""
+        self._refresh()
+        return self._invalid.get(_department_key(department))
+
+    def fee_of(self, prescription_name: str, default: int = 0) -> int:
+        """Fee of a prescription by name, or `default` if it is not in the table."""
+        self._refresh()
+        return self._fees.get((prescription_name or "").strip(), default)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_fee_catalog(path: str | None = None) -> FeeCatalog:
+    """Returns the process-wide catalog for `path` (TREATMENT_FEES_CSV by default)."""
+    path = path or TREATMENT_FEES_CSV
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None:
+            catalog = FeeCatalog(path)
+            _catalogs[path] = catalog
+        return catalog
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# How long a finished request's result is replayed for a repeated idempotency key
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("KIOSK_IDEMPOTENCY_TTL", "600"))
+# Most keys remembered at once; the oldest are dropped first beyond this
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("KIOSK_IDEMPOTENCY_MAX_KEYS", "10000"))
+
+
+class _Entry:
+    __slots__ = ("expires_at", "done", "result")
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.result = None
+
+
+class IdempotencyCache:
+    """
+    Results of requests by idempotency key, so a resent request (double tap
+    on the touchscreen, network retry) gets the original result instead of
+    being processed again.
+
+    `run(key, fn)` calls `fn` once per key; a repeat of the key within `ttl`
+    seconds returns the stored result, and a repeat that arrives while the
+    first call is still running waits for it. A call that raises or returns
+    None is not remembered, so the request can be retried. Entries are kept
+    in expiry order and at most `max_keys` are held, so expired and excess
+    keys are dropped from the front in amortised O(1) on every call.
+
+    The cache lives in one process. Payments also store their key with the
+    payment record (see payment_service.commit_payment), so a repeat that
+    reaches another worker process is caught there.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS,
+                 max_keys: int = IDEMPOTENCY_MAX_KEYS, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_keys = max(1, max_keys)
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> _Entry
+        self._lock = threading.Lock()
+
+    def _purge_locked(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[key]
+
+    def run(self, key, fn):
+        """Returns fn()'s result for the first call with `key`, and that same result for repeats."""
+        if key is None:
+            return fn()
+        while True:
+            with self._lock:
+                self._purge_locked(self._clock())
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = _Entry(self._clock() + self.ttl)
+                    self._entries[key] = entry
+                    self._purge_locked(self._clock())
+                    break
+            entry.done.wait()
+            if entry.result is not None:
+                return entry.result
+            # The first call failed and was forgotten: take over as the first call
+
+        try:
+            result = fn()
+        except BaseException:
+            self._forget(key, entry)
+            raise
+        if result is None:
+            self._forget(key, entry)
+        else:
+            entry.result = result
+            entry.done.set()
+        return result
+
+    def _forget(self, key, entry: _Entry) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_locked(self._clock())
+            return len(self._entries)
+
+
+_idempotency_cache = IdempotencyCache()
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    """Returns the process-wide idempotency cache."""
+    return _idempotency_cache
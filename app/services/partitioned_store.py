@@ -0,0 +1,309 @@
+import csv
+import gzip
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from app.services.reservation_repository import ReservationRepository, _Snapshot, parse_reservations
+from app.services.storage import DEFAULT_FIELDNAMES, Reservation, ReservationStore, reservoir_sample, sample_filter
+from app.utils.file_lock import atomic_write_bytes, file_lock
+
+_PARTITION_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.csv(\.gz)?$")
+
+# Parsed sealed partitions kept in memory for fallback lookups
+SEALED_CACHE_SIZE = 7
+
+
+def partition_day(row, default: date) -> date:
+    """Day a reservation belongs to: the date part of its `time` column, else `default`."""
+    try:
+        return date.fromisoformat(str(row.get("time") or "")[:10])
+    except ValueError:
+        return default
+
+
+class PartitionedReservationStore(ReservationStore):
+    """
+    Reservations split into one CSV per appointment day: `<dir>/YYYY-MM-DD.csv`.
+
+    Today's partition (and any future days) are open partitions, each served
+    by a ReservationRepository, so they get the in-memory index, the
+    journal and the cross-process locking. Today's is the one kept hot; the
+    working set is one day's rows instead of the whole history.
+
+    Days before today are sealed: read-only, with their journal folded into
+    the CSV and, when `compress` is set, gzipped to `YYYY-MM-DD.csv.gz`.
+    Sealing runs once per day rollover (checked on every access), under a
+    directory lock so only one worker does it.
+
+    Lookups check today first, then future days, then walk back through the
+    sealed days of the last `lookback_days` days, newest first. A few sealed
+    partitions are kept parsed in a small LRU cache.
+    """
+
+    def __init__(self, directory: str, compress: bool = False, lookback_days: int = 30, today=date.today):
+        self.directory = directory
+        self.compress = compress
+        self.lookback_days = lookback_days
+        self._today = today
+        self._lock = threading.RLock()
+        self._rolled_over_for = None
+        self._repos = {}
+        self._sealed_cache = OrderedDict()
+
+    # ── partitions ──────────────────────────────────────────
+    def _csv_path(self, day: date) -> str:
+        return os.path.join(self.directory, f"{day.isoformat()}.csv")
+
+    def _partitions(self) -> dict:
+        """{day: path} for every partition on disk (plain CSV preferred over .gz)."""
+        found = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return found
+        for filename in names:
+            match = _PARTITION_RE.match(filename)
+            if not match:
+                continue
+            try:
+                day = date.fromisoformat(match.group(1))
+            except ValueError:
+                continue
+            if day not in found or not match.group(2):
+                found[day] = os.path.join(self.directory, filename)
+        return found
+
+    def _open_repo(self, day: date) -> ReservationRepository:
+        with self._lock:
+            repo = self._repos.get(day)
+            if repo is None:
+                repo = ReservationRepository(self._csv_path(day))
+                self._repos[day] = repo
+            return repo
+
+    def roll_over(self) -> date:
+        """Seals every partition older than today, once per calendar day. Returns today."""
+        today = self._today()
+        if self._rolled_over_for == today:
+            return today
+        with self._lock:
+            if self._rolled_over_for != today:
+                os.makedirs(self.directory, exist_ok=True)
+                with file_lock(os.path.join(self.directory, ".rollover.lock")):
+                    for day, path in sorted(self._partitions().items()):
+                        if day < today and path.endswith(".csv"):
+                            self._seal(day, path)
+                # Sealed days are served from the LRU cache, not from repositories
+                for day in [day for day in self._repos if day < today]:
+                    del self._repos[day]
+                self._rolled_over_for = today
+        return today
+
+    def _seal(self, day: date, path: str) -> None:
+        # Under the partition's own lock: a worker that has not rolled over yet
+        # may still be writing to this day
+        def compress():
+            with open(path, "rb") as f:
+                atomic_write_bytes(path + ".gz", gzip.compress(f.read()))
+            os.remove(path)
+
+        self._open_repo(day).seal(compress if self.compress else None)
+        print(f"Info: Sealed reservation partition {day.isoformat()}")
+
+    def _load_sealed(self, path: str) -> _Snapshot:
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            snapshot = self._sealed_cache.get(key)
+            if snapshot is not None:
+                self._sealed_cache.move_to_end(key)
+                return snapshot
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, mode="rt", newline="", encoding="utf-8-sig") as f:
+            columns, rows = parse_reservations(f)
+        snapshot = _Snapshot(None, columns, rows)
+        with self._lock:
+            self._sealed_cache[key] = snapshot
+            while len(self._sealed_cache) > SEALED_CACHE_SIZE:
+                self._sealed_cache.popitem(last=False)
+        return snapshot
+
+    def _search_order(self, start: date | None = None, end: date | None = None) -> list:
+        """(day, path) pairs to search: today, future days, then sealed days newest first."""
+        today = self.roll_over()
+        if start is None:
+            start = today - timedelta(days=self.lookback_days)
+        partitions = self._partitions()
+        days = [day for day in partitions if start <= day and (end is None or day <= end)]
+        open_days = sorted(day for day in days if day >= today)
+        sealed_days = sorted((day for day in days if day < today), reverse=True)
+        return [(day, partitions[day]) for day in open_days + sealed_days]
+
+    def _reader(self, day: date, path: str):
+        if day >= self.roll_over() and path.endswith(".csv"):
+            return self._open_repo(day)
+        return self._load_sealed(path)
+
+    def search(self, rrn: str, name: str | None = None,
+               start: date | None = None, end: date | None = None) -> Reservation | None:
+        """
+        First reservation for `rrn` (and `name`, if given) between `start` and
+        `end` inclusive, checking today first. `start` defaults to
+        `lookback_days` before today; `end` is open.
+        """
+        today = self.roll_over()
+        if (start is None or start <= today) and (end is None or today <= end):
+            # Hot path: today's partition, without listing the directory
+            repo = self._open_repo(today)
+            try:
+                row = repo.get_by_rrn(rrn) if name is None else repo.find(name, rrn)
+            except FileNotFoundError:
+                row = None
+            if row is not None:
+                return row
+
+        for day, path in self._search_order(start, end):
+            if day == today:
+                continue
+            reader = self._reader(day, path)
+            if isinstance(reader, _Snapshot):
+                key = rrn if name is None else (name, rrn)
+                position = (reader.by_rrn if name is None else reader.by_name_rrn).get(key)
+                row = reader.rows[position] if position is not None else None
+            else:
+                row = reader.get_by_rrn(rrn) if name is None else reader.find(name, rrn)
+            if row is not None:
+                return row
+        return None
+
+    # ── ReservationStore ────────────────────────────────────
+    @property
+    def fieldnames(self) -> list:
+        today = self.roll_over()
+        try:
+            return self._open_repo(today).fieldnames
+        except FileNotFoundError:
+            return list(DEFAULT_FIELDNAMES)
+
+    def get_by_rrn(self, rrn: str) -> Reservation | None:
+        return self.search(rrn)
+
+    def find(self, name: str, rrn: str) -> Reservation | None:
+        return self.search(rrn, name=name)
+
+    def all(self) -> list:
+        """Every reservation in every partition, oldest day first."""
+        today = self.roll_over()
+        rows = []
+        for day, path in sorted(self._partitions().items()):
+            if day >= today and path.endswith(".csv"):
+                rows.extend(self._open_repo(day).all())
+            else:
+                opener = gzip.open if path.endswith(".gz") else open
+                with opener(path, mode="rt", newline="", encoding="utf-8-sig") as f:
+                    rows.extend(parse_reservations(f)[1])
+        return rows
+
+    def __len__(self) -> int:
+        return len(self.all())
+
+    def signature(self) -> tuple:
+        """Open days' repository signatures and sealed files' (path, mtime, size), oldest day first."""
+        today = self.roll_over()
+        parts = []
+        for day, path in sorted(self._partitions().items()):
+            if day >= today and path.endswith(".csv"):
+                parts.append((day, self._open_repo(day).signature()))
+            else:
+                st = os.stat(path)
+                parts.append((day, path, st.st_mtime_ns, st.st_size))
+        return tuple(parts)
+
+    def sample(self, rng, status: str | None = None, day: str | None = None) -> Reservation | None:
+        """
+        Random reservation from one partition only: `day`'s if given, else
+        today's. None when that partition is missing or has no match; the
+        other days are never read.
+        """
+        today = self.roll_over()
+        target = date.fromisoformat(day) if day else today
+        path = self._partitions().get(target)
+        if path is None:
+            return None
+        reader = self._reader(target, path)
+        if isinstance(reader, _Snapshot):
+            return reservoir_sample(reader.rows, rng, sample_filter(status, day))
+        return reader.sample(rng, status=status, day=day)
+
+    def update_many(self, changes: dict, on_commit=None) -> dict:
+        """
+        Routes each change to the open partition (today or later) holding the
+        RRN. Reservations that only exist in sealed days are read-only and
+        come back False. `on_commit` runs once per partition written, under
+        that partition's lock.
+        """
+        today = self.roll_over()
+        open_days = [day for day, _ in self._search_order(start=today)]
+        results = {rrn: False for rrn in changes}
+        pending = dict(changes)
+        for day in open_days:
+            if not pending:
+                break
+            repo = self._open_repo(day)
+            batch = {rrn: fields for rrn, fields in pending.items() if repo.get_by_rrn(rrn) is not None}
+            if batch:
+                results.update(repo.update_many(batch, on_commit))
+                for rrn in batch:
+                    del pending[rrn]
+        return results
+
+    def append(self, row: dict, default_fieldnames: list = DEFAULT_FIELDNAMES, on_commit=None) -> None:
+        """Appends to the partition of the row's `time` day (today if it has none)."""
+        today = self.roll_over()
+        day = partition_day(row, today)
+        if day < today:
+            raise ValueError(f"Reservation partition {day.isoformat()} is sealed")
+        os.makedirs(self.directory, exist_ok=True)
+        self._open_repo(day).append(row, default_fieldnames, on_commit)
+
+
+def split_into_partitions(rows, directory: str, fieldnames: list, today: date | None = None) -> dict:
+    """
+    Writes `rows` into per-day partition files under `directory`, replacing
+    any partition files of the same days. Returns {day: row count}.
+    Used to migrate an existing reservations.csv.
+    """
+    today = today or date.today()
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(partition_day(row, today), []).append(row)
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for day, day_rows in sorted(by_day.items()):
+        buffer = io.StringIO(newline="")
+        writer = csv.writer(buffer)
+        writer.writerow(fieldnames)
+        writer.writerows([row.get(key, "") for key in fieldnames] for row in day_rows)
+        atomic_write_bytes(os.path.join(directory, f"{day.isoformat()}.csv"), buffer.getvalue().encode("utf-8"))
+        counts[day] = len(day_rows)
+    return counts
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_partitioned_store(directory: str, compress: bool = False,
+                          lookback_days: int = 30) -> PartitionedReservationStore:
+    """Returns the shared partitioned store for `directory`, creating it on first use."""
+    directory = os.path.abspath(directory)
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = PartitionedReservationStore(directory, compress=compress, lookback_days=lookback_days)
+            _stores[directory] = store
+        return store
@@ -0,0 +1,225 @@
+"""
+Card-terminal authorization for payments.
+
+  • get_payment_gateway() → object implementing PaymentGateway
+
+Selected with KIOSK_PAYMENT_GATEWAY:
+
+  • "approve"  (default) – approves every payment at once (no terminal)
+  • "terminal"           – asks the terminal at KIOSK_TERMINAL_ADDR (host:port)
+                           over pooled TCP connections; see terminal_simulator.py
+                           for a local stand-in
+
+Terminal protocol: one JSON object per line each way.
+  authorize  request:  {"op": "authorize", "payment_id", "amount", "method"}
+             response: {"payment_id", "approved": bool, "auth_code" | "reason"}
+  void       request:  {"op": "void", "payment_id"}
+             response: {"payment_id", "voided": bool, "reason"?}
+The terminal answers a repeated payment_id with its first answer, so a
+request can be retried safely. A void cancels the approval of a payment
+the kiosk could not record; it is accepted before the authorization
+arrives too, and a voided payment_id is declined from then on.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+
+PAYMENT_GATEWAY = os.getenv("KIOSK_PAYMENT_GATEWAY", "approve").strip().lower()
+TERMINAL_ADDR = os.getenv("KIOSK_TERMINAL_ADDR", "127.0.0.1:9100")
+# Persistent connections kept open to the terminal
+TERMINAL_POOL_SIZE = int(os.getenv("KIOSK_TERMINAL_POOL_SIZE", "4"))
+# Deadline for one authorization, retries included
+TERMINAL_TIMEOUT = float(os.getenv("KIOSK_TERMINAL_TIMEOUT", "5.0"))
+# Extra attempts after a connection failure or a timed-out attempt
+TERMINAL_RETRIES = int(os.getenv("KIOSK_TERMINAL_RETRIES", "2"))
+TERMINAL_BACKOFF = float(os.getenv("KIOSK_TERMINAL_BACKOFF", "0.1"))
+
+
+class PaymentGateway(ABC):
+    """Interface shared by every payment gateway."""
+
+    @abstractmethod
+    def authorize(self, payment_id: str, amount: int, method: str) -> dict:
+        """
+        Authorizes a payment. Returns {"approved": True, "auth_code": ...} or
+        {"approved": False, "reason": ...}; never raises for terminal errors.
+        """
+
+    @abstractmethod
+    def void(self, payment_id: str) -> bool:
+        """
+        Cancels the authorization of `payment_id` (approved or still in
+        flight). Returns False if the terminal did not confirm it; never raises.
+        """
+
+
+class ApprovingGateway(PaymentGateway):
+    """Approves every payment immediately (kiosks without a card terminal, tests)."""
+
+    def authorize(self, payment_id: str, amount: int, method: str) -> dict:
+        return {"approved": True, "auth_code": "LOCAL"}
+
+    def void(self, payment_id: str) -> bool:
+        return True
+
+
+class TerminalGateway(PaymentGateway):
+    """
+    asyncio client for a card terminal speaking the line-delimited JSON
+    protocol above.
+
+    Up to `pool_size` persistent connections are kept open and reused, one
+    request in flight on each. Every authorization has one deadline
+    (`timeout` seconds, retries included); a broken connection or an
+    attempt cut off by the per-attempt share of the deadline is retried up
+    to `retries` times with exponential backoff plus jitter, on a fresh
+    connection. A decline is an answer, not a failure, and is not retried.
+    An authorization left without an answer may still have been approved at
+    the terminal, so it is voided (with a deadline of its own) before
+    "terminal_unavailable" is returned.
+
+    The event loop runs in a daemon thread, so the blocking `authorize()`
+    can be called from Flask request threads; `authorize_async()` is the
+    coroutine for callers already on that loop.
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int = TERMINAL_POOL_SIZE,
+                 timeout: float = TERMINAL_TIMEOUT, retries: int = TERMINAL_RETRIES,
+                 backoff: float = TERMINAL_BACKOFF):
+        self.host = host
+        self.port = port
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="terminal-gateway", daemon=True)
+        self._thread.start()
+        self._idle = []        # open (reader, writer) pairs not in use
+        self._slots = None     # asyncio.Semaphore(pool_size), created on the loop
+
+    # ── connection pool ─────────────────────────────────────
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        await self._slots.acquire()
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        try:
+            return await asyncio.open_connection(self.host, self.port)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, connection, reusable: bool) -> None:
+        if reusable:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+        self._slots.release()
+
+    # ── requests ────────────────────────────────────────────
+    async def _attempt(self, request: bytes) -> dict:
+        connection = await self._acquire()
+        reusable = False
+        try:
+            reader, writer = connection
+            writer.write(request)
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("terminal closed the connection")
+            response = json.loads(line)
+            reusable = True
+            return response
+        finally:
+            # A connection left mid-request (timeout, error) may still get the
+            # old answer later, so it is closed rather than reused
+            self._release(connection, reusable)
+
+    async def _request_async(self, message: dict) -> dict | None:
+        """Sends `message` with retries within one deadline; the terminal's answer, or None if none came."""
+        payment_id = message["payment_id"]
+        request = (json.dumps(message) + "\n").encode("utf-8")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        attempts = self.retries + 1
+        for attempt in range(attempts):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                # Each attempt gets an equal share of what is left, so a retry still fits
+                response = await asyncio.wait_for(self._attempt(request), remaining / (attempts - attempt))
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                print(f"Warning: Terminal {message['op']} attempt {attempt + 1}/{attempts} for {payment_id} failed: {e!r}")
+                if attempt + 1 < attempts:
+                    delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+                continue
+            return response
+        return None
+
+    async def authorize_async(self, payment_id: str, amount: int, method: str) -> dict:
+        response = await self._request_async({"op": "authorize", "payment_id": payment_id,
+                                              "amount": amount, "method": method})
+        if response is None:
+            # An attempt may have reached the terminal and been approved after we gave up on it
+            await self.void_async(payment_id)
+            return {"approved": False, "reason": "terminal_unavailable"}
+        if response.get("approved"):
+            return {"approved": True, "auth_code": response.get("auth_code", "")}
+        return {"approved": False, "reason": response.get("reason", "declined")}
+
+    async def void_async(self, payment_id: str) -> bool:
+        response = await self._request_async({"op": "void", "payment_id": payment_id})
+        if response is None or not response.get("voided"):
+            reason = "no answer" if response is None else response.get("reason", "refused")
+            print(f"Warning: Payment {payment_id} could not be voided ({reason}); cancel it at the terminal")
+            return False
+        return True
+
+    def authorize(self, payment_id: str, amount: int, method: str) -> dict:
+        future = asyncio.run_coroutine_threadsafe(self.authorize_async(payment_id, amount, method), self._loop)
+        return future.result()
+
+    def void(self, payment_id: str) -> bool:
+        return asyncio.run_coroutine_threadsafe(self.void_async(payment_id), self._loop).result()
+
+    def close(self) -> None:
+        """Closes the pooled connections and stops the event loop."""
+        async def _close():
+            while self._idle:
+                self._idle.pop()[1].close()
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def parse_address(address: str) -> tuple:
+    """"host:port" → (host, port)."""
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_payment_gateway() -> PaymentGateway:
+    """Returns the process-wide gateway for KIOSK_PAYMENT_GATEWAY."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            if PAYMENT_GATEWAY == "terminal":
+                _gateway = TerminalGateway(*parse_address(TERMINAL_ADDR))
+            else:
+                _gateway = ApprovingGateway()
+        return _gateway
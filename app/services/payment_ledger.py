@@ -0,0 +1,214 @@
+import atexit
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+
+from app.services.storage import DuplicatePaymentError, PaymentStore, ReservationStore
+from app.utils.file_lock import append_bytes, file_lock
+
+# Payments written before the ledger file is fsynced (1 = every payment)
+PAYMENT_FSYNC_BATCH = int(os.getenv("KIOSK_PAYMENT_FSYNC_BATCH", "32"))
+# Longest time a written payment waits for its fsync
+PAYMENT_FSYNC_INTERVAL = float(os.getenv("KIOSK_PAYMENT_FSYNC_INTERVAL", "1.0"))
+
+
+class PaymentLedger(PaymentStore):
+    """
+    Append-only payment ledger: one JSON record per line in `path`, indexed
+    in memory by payment_id (dict), by patient_id (ids in time order), by
+    idempotency_key and by timestamp (sorted (timestamp, payment_id) list for
+    range queries).
+
+    Appends hold an fcntl lock on `<ledger>.lock` and first read whatever
+    other worker processes appended, so every process ends up with the same
+    indexes; reads catch up the same way, without the lock. A record whose
+    idempotency_key is already in the ledger is refused under that lock, so
+    one key is charged once across all processes. Nothing is
+    rewritten, so the file is also the history for reconciliation.
+
+    fsync is batched: a payment is written (and visible to other processes)
+    at once, and the file is flushed to disk after `fsync_batch` payments or
+    `fsync_interval` seconds, whichever comes first.
+
+    commit_payment() uses the ledger as a write-ahead log: the payment line
+    also carries the reservation update ("reservation": {"rrn", "fields"})
+    and is fsynced before the update is applied, so that line is the single
+    durable commit of both; a reservation update lost to a crash can be
+    re-applied from it (payment_service.recover_payment_commits, run at
+    every startup).
+    """
+
+    def __init__(self, path: str, fsync_batch: int = PAYMENT_FSYNC_BATCH,
+                 fsync_interval: float = PAYMENT_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_batch = max(1, fsync_batch)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_patient = {}
+        self._by_key = {}
+        self._timeline = []
+        self._offset = 0
+        self._unsynced = 0
+        self._flush_timer = None
+
+    def _index(self, record: dict) -> None:
+        payment_id = record["payment_id"]
+        if payment_id in self._by_id:
+            return
+        self._by_id[payment_id] = record
+        if record.get("idempotency_key"):
+            self._by_key.setdefault(record["idempotency_key"], payment_id)
+        key = (record.get("timestamp") or "", payment_id)
+        insort(self._by_patient.setdefault(record.get("patient_id"), []), key)
+        insort(self._timeline, key)
+
+    def _catch_up_locked(self, repair: bool = False) -> None:
+        try:
+            with open(self.path, mode="rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        if repair and end < len(data):
+            # Only called with the file lock held: a line without newline was
+            # left by a writer that died mid-append. Terminate it so it is skipped.
+            append_bytes(self.path, b"\n")
+            data += b"\n"
+            end = len(data)
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._index(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                print(f"Warning: Skipping malformed record in {self.path}")
+        self._offset += end
+
+    def _records(self, keys) -> list:
+        return [dict(self._by_id[payment_id]) for _, payment_id in keys]
+
+    # ── PaymentStore ────────────────────────────────────────
+    def add_payment(self, record: dict) -> None:
+        self._append(record)
+
+    def _append(self, record: dict, sync: bool = False) -> None:
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            with file_lock(self.path + ".lock"):
+                self._catch_up_locked(repair=True)
+                existing = self._by_key.get(record.get("idempotency_key"))
+                if existing is not None:
+                    raise DuplicatePaymentError(existing)
+                append_bytes(self.path, line)
+                self._offset += len(line)
+            self._index(dict(record))
+            self._unsynced += 1
+            if sync or self._unsynced >= self.fsync_batch:
+                self._sync_locked()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.fsync_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def commit_payment(self, record: dict, reservations: ReservationStore, rrn: str, fields: dict,
+                       on_commit=None) -> bool:
+        if reservations.get_by_rrn(rrn) is None:
+            return False
+        self._append(dict(record, reservation={"rrn": rrn, "fields": fields}), sync=True)
+        # The fsynced line is the commit: from here on the payment stands, and a
+        # reservation update that fails is re-applied at the next startup
+        # (payment_service.recover_payment_commits_on_startup)
+        try:
+            updated = reservations.update(rrn, fields, on_commit)
+        except Exception as e:
+            print(f"Warning: Payment {record['payment_id']} committed but reservation {rrn} not updated "
+                  f"(re-applied at the next startup): {e!r}")
+            return True
+        if not updated:
+            print(f"Warning: Payment {record['payment_id']} committed but reservation {rrn} not updated "
+                  f"(re-applied at the next startup)")
+        return True
+
+    def get_payment(self, payment_id: str) -> dict | None:
+        with self._lock:
+            record = self._by_id.get(payment_id)
+            if record is None:
+                # Possibly written by another worker since we last looked
+                self._catch_up_locked()
+                record = self._by_id.get(payment_id)
+            return dict(record) if record is not None else None
+
+    def payment_for_key(self, idempotency_key: str) -> dict | None:
+        with self._lock:
+            self._catch_up_locked()
+            payment_id = self._by_key.get(idempotency_key)
+            return dict(self._by_id[payment_id]) if payment_id is not None else None
+
+    def payments_for_patient(self, patient_id: str) -> list:
+        with self._lock:
+            self._catch_up_locked()
+            return self._records(self._by_patient.get(patient_id, ()))
+
+    def payments_between(self, start: str, end: str) -> list:
+        with self._lock:
+            self._catch_up_locked()
+            first = bisect_left(self._timeline, (start,))
+            last = bisect_left(self._timeline, (end,))
+            return self._records(self._timeline[first:last])
+
+    def iter_payments_between(self, start: str, end: str):
+        """Yields the payments of payments_between one copy at a time; only their keys are collected up front."""
+        with self._lock:
+            self._catch_up_locked()
+            first = bisect_left(self._timeline, (start,))
+            last = bisect_left(self._timeline, (end,))
+            keys = self._timeline[first:last]
+        for _, payment_id in keys:
+            # Indexed records are never changed or removed, so no lock is needed to copy one
+            yield dict(self._by_id[payment_id])
+
+    # ── durability ──────────────────────────────────────────
+    def _sync_locked(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._unsynced:
+            return
+        self._unsynced = 0
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return  # Removed since (tests, manual cleanup): nothing left to flush
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def flush(self) -> None:
+        """fsyncs payments written since the last flush."""
+        with self._lock:
+            self._sync_locked()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._catch_up_locked()
+            return len(self._by_id)
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_payment_ledger(path: str) -> PaymentLedger:
+    """Returns the process-wide ledger for `path`; it is flushed at exit."""
+    with _ledgers_lock:
+        ledger = _ledgers.get(path)
+        if ledger is None:
+            ledger = PaymentLedger(path)
+            _ledgers[path] = ledger
+            atexit.register(ledger.flush)
+        return ledger
@@ -1,37 +1,223 @@
 import uuid
 import random
-import csv
 import os
 import sys # Added for logging
+import hashlib
+import json
+from datetime import date, datetime, timedelta
 
-# In-memory "database" for payments
-_payments_db = []
+from app.services.change_log import change_recorder
+from app.services.event_bus import publish_status_change
+from app.services.fee_catalog import TREATMENT_FEES_CSV, get_fee_catalog
+from app.services.payment_gateway import get_payment_gateway
+from app.services.quote_store import get_quote_store
+from app.services import storage
+from app.services.storage import DuplicatePaymentError, get_payment_store, get_reservation_store
+from app.utils.file_lock import atomic_write_bytes, file_lock
 
-# Define BASE_DIR and TREATMENT_FEES_CSV path
-# Assuming the structure is app/services/payment_service.py
-# and data/treatment_fees.csv is relative to the project root.
+# Define BASE_DIR; the fee table (data/treatment_fees.csv) is read through the shared FeeCatalog
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
-TREATMENT_FEES_CSV = os.path.join(BASE_DIR, "data", "treatment_fees.csv")
+# Days of payments re-checked at startup when no earlier startup recorded where it got to
+PAYMENT_RECOVERY_DAYS = int(os.getenv("KIOSK_PAYMENT_RECOVERY_DAYS", "7"))
 
 
-def process_new_payment(patient_id: str, amount: int, method: str) -> str:
+def process_new_payment(patient_id: str, amount: int, method: str) -> str | None:
     """
     Processes a new payment, stores it, and returns a unique payment ID.
+    Returns None, with nothing stored, if the payment gateway did not approve it
+    or the approved payment could not be stored (the approval is then voided).
     """
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.process_new_payment(args={{_func_args}})")
-    payment_id = str(uuid.uuid4())
-    payment_record = {
-        "payment_id": payment_id,
+    payment_record = _new_payment_record(patient_id, amount, method)
+    if not _authorize(payment_record):
+        return None
+    try:
+        get_payment_store().add_payment(payment_record)
+    except Exception as e:
+        print(f"Warning: Payment {payment_record['payment_id']} authorized but not stored: {e!r}")
+        _void(payment_record)
+        return None
+    return payment_record["payment_id"]
+
+
+def _authorize(payment_record: dict) -> bool:
+    """Asks the payment gateway (card terminal) to approve a payment record."""
+    result = get_payment_gateway().authorize(payment_record["payment_id"], payment_record["amount"],
+                                             payment_record["method"])
+    if not result.get("approved"):
+        print(f"Warning: Payment {payment_record['payment_id']} not authorized: {result.get('reason')}")
+        return False
+    return True
+
+
+def _void(payment_record: dict) -> None:
+    """Cancels the approval of a payment that could not be recorded, so no charge is left without a record."""
+    if get_payment_gateway().void(payment_record["payment_id"]):
+        print(f"Warning: Payment {payment_record['payment_id']} voided at the terminal")
+
+
+def _new_payment_record(patient_id: str, amount: int, method: str) -> dict:
+    return {
+        "payment_id": str(uuid.uuid4()),
         "patient_id": patient_id,
         "amount": amount,
         "method": method,
         "status": "completed",  # Assuming payment is always successful for now
-        "timestamp": uuid.uuid4().hex # Using hex for a simple timestamp-like string
+        "timestamp": datetime.now().isoformat(timespec="milliseconds")
     }
-    _payments_db.append(payment_record)
-    return payment_id
+
+
+def _paid_fields(prescription_names: list, total_fee: int) -> dict:
+    """Reservation fields of a paid visit: prescriptions (comma-separated), total and status."""
+    return {
+        'prescription_names': ",".join(prescription_names) if prescription_names and isinstance(prescription_names, list) else "",
+        'total_fee': str(total_fee), # Store total_fee as string
+        'status': "Paid",
+    }
+
+
+def commit_payment(patient_rrn: str, prescription_names: list, total_fee: int, method: str,
+                   idempotency_key: str | None = None) -> str | None:
+    """
+    Charges a patient's prescriptions: records the payment and marks the
+    reservation Paid with its prescriptions and total as one commit (one
+    SQLite transaction, or one fsynced ledger line with the file backends),
+    so the two cannot diverge. The payment gateway authorizes it first, and
+    an approval that cannot be committed (storage error) is voided.
+
+    `idempotency_key` is stored with the payment. A key that is already
+    stored returns that payment_id without charging again, in any worker
+    process; if another process commits the key first, this approval is
+    voided and its payment_id returned.
+    Returns the payment_id, or None if nothing was charged (no reservation,
+    declined or unreachable terminal, storage error).
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.commit_payment(args={{_func_args}})")
+    RESERVATIONS_CSV = os.path.join(BASE_DIR, "data", "reservations.csv")
+    repo = get_reservation_store(RESERVATIONS_CSV)
+
+    try:
+        if idempotency_key:
+            existing = get_payment_store().payment_for_key(idempotency_key)
+            if existing is not None:
+                return existing["payment_id"]
+        fieldnames = repo.fieldnames
+        if not fieldnames or not all(field in fieldnames for field in ['rrn', 'prescription_names', 'total_fee']):
+            return None
+        fields = _paid_fields(prescription_names, total_fee)
+        payment_record = _new_payment_record(patient_rrn, total_fee, method)
+        if idempotency_key:
+            payment_record["idempotency_key"] = idempotency_key
+        # Only authorize (charge the card) for a reservation that can be updated
+        if repo.get_by_rrn(patient_rrn) is None or not _authorize(payment_record):
+            return None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: Payment for RRN {patient_rrn} not authorized: {e}")
+        return None
+
+    # Authorized: from here on, anything but a commit must give the charge back
+    try:
+        committed = get_payment_store().commit_payment(payment_record, repo, patient_rrn, fields,
+                                                       on_commit=change_recorder("update"))
+    except DuplicatePaymentError as e:
+        # Another worker process committed this key first: that payment stands
+        print(f"Warning: Payment for RRN {patient_rrn} already committed as {e.payment_id}")
+        _void(payment_record)
+        return e.payment_id
+    except Exception as e:
+        print(f"Warning: Payment for RRN {patient_rrn} not committed: {e}")
+        committed = False
+    if not committed:
+        _void(payment_record)
+        return None
+
+    get_quote_store().pop(patient_rrn)  # Paid: the quote is used up
+    publish_status_change(repo.get_by_rrn(patient_rrn), "Paid")
+    return payment_record["payment_id"]
+
+
+def quote_idempotency_key(patient_rrn: str, reservation_time: str, quote: dict) -> str:
+    """
+    Idempotency key for charging `quote` for the reservation at
+    `reservation_time`: the same for every retry, in any worker process,
+    and different for another visit or another quote.
+    """
+    parts = [patient_rrn, reservation_time, quote.get("department"),
+             quote.get("prescription_names"), quote.get("total_fee")]
+    digest = hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f"quote:{digest[:32]}"
+
+
+def recover_payment_commits(since: str) -> int:
+    """
+    Re-applies reservation updates of payments committed at or after `since`
+    (ISO 8601) that never reached the reservation, e.g. because the process
+    died between the ledger fsync and the reservation write. A commit counts
+    as applied when the reservation carries its prescriptions and total.
+    Returns the number of reservations updated.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.recover_payment_commits(args={{_func_args}})")
+    RESERVATIONS_CSV = os.path.join(BASE_DIR, "data", "reservations.csv")
+    repo = get_reservation_store(RESERVATIONS_CSV)
+    changes = {}
+    # Only ledger records carry "reservation"; SQLite commits are atomic already
+    for payment in get_payment_store().payments_between(since, "9999"):
+        commit = payment.get("reservation")
+        if not commit:
+            continue
+        row = repo.get_by_rrn(commit["rrn"])
+        fields = commit["fields"]
+        if row is None or all(row.get(key) == value for key, value in fields.items() if key != "status"):
+            continue
+        changes[commit["rrn"]] = fields
+    if not changes:
+        return 0
+    results = repo.update_many(changes, on_commit=change_recorder("update"))
+    return sum(1 for ok in results.values() if ok)
+
+
+def recover_payment_commits_on_startup() -> int:
+    """
+    Runs recover_payment_commits when the app starts, over every payment
+    since the previous startup pass began (kept in `<ledger>.recovered`),
+    reaching back at least one day for commits that other worker processes
+    were still applying then; the first pass covers PAYMENT_RECOVERY_DAYS.
+    Worker processes starting together take turns under a file lock.
+    Returns the number of reservations updated.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.recover_payment_commits_on_startup(args={{_func_args}})")
+    mark_path = storage.PAYMENT_LEDGER + ".recovered"
+    os.makedirs(os.path.dirname(os.path.abspath(mark_path)), exist_ok=True)
+    with file_lock(mark_path + ".lock"):
+        started = datetime.now()
+        since = (started - timedelta(days=PAYMENT_RECOVERY_DAYS)).isoformat(timespec="milliseconds")
+        try:
+            with open(mark_path, encoding="utf-8") as f:
+                previous = f.read().strip()
+            if previous:
+                since = min(previous, (started - timedelta(days=1)).isoformat(timespec="milliseconds"))
+        except FileNotFoundError:
+            pass
+        try:
+            count = recover_payment_commits(since)
+        except Exception as e:
+            # Not marked as done: the next startup tries the same window again
+            print(f"Warning: Payment recovery since {since} failed: {e!r}")
+            return 0
+        atomic_write_bytes(mark_path, started.isoformat(timespec="milliseconds").encode("utf-8"))
+    if count:
+        print(f"Warning: Re-applied {count} committed payments to their reservations at startup")
+    return count
 
 
 def get_payment_details(payment_id: str) -> dict | None:
@@ -42,10 +228,28 @@ def get_payment_details(payment_id: str) -> dict | None:
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.get_payment_details(args={{_func_args}})")
-    for payment in _payments_db:
-        if payment["payment_id"] == payment_id:
-            return payment
-    return None
+    return get_payment_store().get_payment(payment_id)
+
+
+def get_patient_payments(patient_id: str) -> list:
+    """
+    Returns every payment of a patient, oldest first.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.get_patient_payments(args={{_func_args}})")
+    return get_payment_store().payments_for_patient(patient_id)
+
+
+def get_payments_between(start: str, end: str) -> list:
+    """
+    Returns payments with start <= timestamp < end, oldest first.
+    `start` and `end` are ISO 8601 strings, e.g. "2025-06-19" and "2025-06-20" for one day.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.get_payments_between(args={{_func_args}})")
+    return get_payment_store().payments_between(start, end)
 
 
 def update_reservation_with_payment_details(patient_rrn: str, prescription_names: list, total_fee: int) -> bool:
@@ -56,84 +260,50 @@ def update_reservation_with_payment_details(patient_rrn: str, prescription_names
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.update_reservation_with_payment_details(args={{_func_args}})")
     RESERVATIONS_CSV = os.path.join(BASE_DIR, "data", "reservations.csv")
-
-    if not os.path.exists(RESERVATIONS_CSV):
-        # Consider logging this error: print(f"Error: {RESERVATIONS_CSV} not found.")
-        return False
-
-    rows = []
-    original_fieldnames = None # To store the original fieldnames
+    repo = get_reservation_store(RESERVATIONS_CSV)
 
     try:
-        with open(RESERVATIONS_CSV, mode='r', newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            original_fieldnames = reader.fieldnames
-            if not original_fieldnames or not all(field in original_fieldnames for field in ['rrn', 'prescription_names', 'total_fee']):
-                # Log error: print("Error: CSV headers are missing or incorrect.")
-                return False
-            rows.extend(list(reader)) # Read all rows into memory
-
-        updated = False
-        # Find and update the specific row
-        for row_idx, row in enumerate(rows):
-            if row.get('rrn') == patient_rrn:
-                # Convert prescription_names list to a comma-separated string
-                if prescription_names and isinstance(prescription_names, list):
-                    rows[row_idx]['prescription_names'] = ",".join(prescription_names)
-                else:
-                    rows[row_idx]['prescription_names'] = "" # Empty string if list is empty or None
-
-                rows[row_idx]['total_fee'] = str(total_fee) # Store total_fee as string
-                rows[row_idx]['status'] = "Paid" # <--- ADDED THIS LINE
-                updated = True
-                break
-
-        if updated:
-            # Write all rows back (including the updated one)
-            with open(RESERVATIONS_CSV, mode='w', newline='', encoding='utf-8') as csvfile:
-                if not original_fieldnames:
-                     # This should ideally not be reached if reading was successful
-                     # print("Error: Original fieldnames not available for writing.")
-                     return False
-
-                writer = csv.DictWriter(csvfile, fieldnames=original_fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
-            return True
-        else:
-            # Patient RRN not found
-            # print(f"Info: Patient RRN {patient_rrn} not found in reservations.")
+        fieldnames = repo.fieldnames
+        if not fieldnames or not all(field in fieldnames for field in ['rrn', 'prescription_names', 'total_fee']):
+            # Log error: print("Error: CSV headers are missing or incorrect.")
+            return False
+
+        fields = _paid_fields(prescription_names, total_fee)
+        # Returns False if the patient RRN is not found in reservations
+        if not repo.update(patient_rrn, fields, on_commit=change_recorder("update")):
             return False
+        get_quote_store().pop(patient_rrn)  # Paid: the quote is used up
+        publish_status_change(repo.get_by_rrn(patient_rrn), "Paid")
+        return True
 
     except FileNotFoundError:
         # print(f"Error: File {RESERVATIONS_CSV} not found during update.")
         return False
     except Exception as e:
-        # print(f"Error updating reservation for RRN {patient_rrn}: {e}")
+        print(f"Error updating reservation for RRN {patient_rrn}: {e}")
         return False
 
 
-def load_department_prescriptions(department: str) -> dict:
-    random.seed(42)
+def load_department_prescriptions(department: str, rng: random.Random | None = None) -> dict:
+    """
+    Picks 2-3 prescriptions of a department from the fee table and totals them.
+    Selection uses `rng` (a fresh random.Random if omitted), never the global
+    random state.
+    """
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.load_department_prescriptions(args={{_func_args}})")
+    rng = rng or random.Random()
     if not os.path.exists(TREATMENT_FEES_CSV):
         return {"error": f"Data file not found: {TREATMENT_FEES_CSV}", "prescriptions": [], "total_fee": 0}
 
     try: # New top-level try block
-        department_prescriptions_details = []
         try: # Inner try for CSV processing (can be kept or simplified)
-            with open(TREATMENT_FEES_CSV, newline="", encoding="utf-8-sig") as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    if row["Department"].strip().lower() == department.lower():
-                        try:
-                            department_prescriptions_details.append(
-                                {"name": row["Prescription"], "fee": int(row["Fee"])}
-                            )
-                        except ValueError:
-                             return {"error": f"Invalid fee format for {row['Prescription']} in {department}.", "prescriptions": [], "total_fee": 0}
+            catalog = get_fee_catalog(TREATMENT_FEES_CSV)
+            invalid_prescription = catalog.invalid_item(department)
+            if invalid_prescription is not None:
+                return {"error": f"Invalid fee format for {invalid_prescription} in {department}.", "prescriptions": [], "total_fee": 0}
+            department_prescriptions_details = catalog.items_for(department)
         except Exception as csv_e: # Catch errors during CSV read/parse specifically
             # It's good practice to log csv_e here for debugging
             return {"error": f"Error reading or parsing CSV: {str(csv_e)}", "prescriptions": [], "total_fee": 0}
@@ -149,12 +319,11 @@ def load_department_prescriptions(department: str) -> dict:
         elif len(department_prescriptions_details) == 1:
             num_to_select = 1
         else: # len is 2 or more
-            num_to_select = random.randint(min(2, len(department_prescriptions_details)), min(3, len(department_prescriptions_details)))
+            num_to_select = rng.randint(min(2, len(department_prescriptions_details)), min(3, len(department_prescriptions_details)))
 
         selected_prescriptions_objects = [] # Initialize to handle num_to_select = 0
         if num_to_select > 0 :
-             random.seed(42)
-             selected_prescriptions_objects = random.sample(department_prescriptions_details, num_to_select)
+             selected_prescriptions_objects = rng.sample(department_prescriptions_details, num_to_select)
 
         total_fee = sum(item["fee"] for item in selected_prescriptions_objects)
         prescriptions_for_display = [
@@ -171,3 +340,32 @@ def load_department_prescriptions(department: str) -> dict:
         # It's good practice to log 'e' here for debugging (e.g., print to console or use logging module)
         # print(f"Unexpected error in load_department_prescriptions for department '{department}': {type(e).__name__} - {str(e)}")
         return {"error": f"An unexpected server error occurred while loading prescriptions. Details: {str(e)}", "prescriptions": [], "total_fee": 0}
+
+
+def get_prescription_quote(patient_rrn: str, department: str | None = None) -> dict | None:
+    """
+    Returns the patient's live prescription quote (same keys as
+    load_department_prescriptions, plus "department"), so the quoted
+    prescriptions are exactly what is later charged. Without a live quote
+    for `department`, a new one is drawn and stored; with `department=None`
+    only an existing quote is returned (None if there is none).
+
+    The draw is seeded by RRN, department and date, so a quote that expired
+    or lives in another worker process is drawn again identically.
+    Errors from load_department_prescriptions are returned and not stored.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.get_prescription_quote(args={{_func_args}})")
+    store = get_quote_store()
+    quote = store.get(patient_rrn)
+    if quote is not None and (department is None or quote["department"] == department):
+        return quote
+    if department is None:
+        return None
+    rng = random.Random(f"{patient_rrn}|{department}|{date.today().isoformat()}")
+    result = load_department_prescriptions(department, rng=rng)
+    if result.get("error"):
+        return result
+    return store.put(patient_rrn, {**result, "department": department})
+
@@ -0,0 +1,289 @@
+import heapq
+import math
+import os
+import threading
+import time
+from datetime import date
+
+from app.services.ticket_allocator import format_ticket, parse_ticket
+from app.utils.daily_log import DailyEventLog
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+QUEUE_DIR = os.getenv("KIOSK_QUEUE_DIR", os.path.join(BASE_DIR, "data", "queue"))
+# Staff desks serving each department in parallel
+QUEUE_DESKS = int(os.getenv("KIOSK_QUEUE_DESKS", "1"))
+# Service time assumed before the first completed visit of the day
+DEFAULT_SERVICE_SECONDS = 300.0
+# Weight of the newest visit in the service-time average
+SERVICE_TIME_ALPHA = 0.3
+# A call older than this many average visits is taken as finished for ETAs,
+# even if the desk never marked it complete
+STALE_CALL_FACTOR = 3
+
+
+class _Fenwick:
+    """Counts of waiting tickets by number; prefix sums give queue positions in O(log n)."""
+
+    __slots__ = ("_size", "_tree")
+
+    def __init__(self, size: int = 64):
+        self._size = size
+        self._tree = [0] * (size + 1)
+
+    def _grow(self, index: int) -> None:
+        # Doubling keeps every old node valid; only the new root covers the old range
+        while index > self._size:
+            total = self.prefix(self._size)
+            self._tree.extend([0] * self._size)
+            self._size *= 2
+            self._tree[self._size] = total
+
+    def add(self, index: int, delta: int) -> None:
+        self._grow(index)
+        while index <= self._size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        index = min(index, self._size)
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+
+class DepartmentQueue:
+    """
+    Waiting and in-service tickets of one department.
+
+    Waiting numbers sit in a min-heap (next to call) and a Fenwick tree
+    (how many wait ahead of a number); cancelled entries are dropped from
+    the heap lazily. Every operation is O(log n).
+    """
+
+    __slots__ = ("_heap", "_waiting", "_counts", "serving", "service_seconds", "completed")
+
+    def __init__(self, service_seconds: float = DEFAULT_SERVICE_SECONDS):
+        self._heap = []
+        self._waiting = set()
+        self._counts = _Fenwick()
+        self.serving = {}  # number -> call timestamp
+        self.service_seconds = service_seconds
+        self.completed = 0
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def join(self, number: int) -> None:
+        if number in self._waiting or number in self.serving:
+            return
+        self._waiting.add(number)
+        heapq.heappush(self._heap, number)
+        self._counts.add(number, 1)
+
+    def remove(self, number: int) -> bool:
+        if number not in self._waiting:
+            return False
+        self._waiting.discard(number)
+        self._counts.add(number, -1)
+        return True
+
+    def next_number(self) -> int | None:
+        while self._heap and self._heap[0] not in self._waiting:
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+    def call(self, number: int, now: float) -> None:
+        if self.remove(number):
+            self.serving[number] = now
+
+    def complete(self, number: int, now: float, alpha: float = SERVICE_TIME_ALPHA) -> None:
+        started = self.serving.pop(number, None)
+        if started is None:
+            self.remove(number)
+            return
+        # Exponentially weighted average of call -> complete durations
+        self.service_seconds += alpha * (max(now - started, 0.0) - self.service_seconds)
+        self.completed += 1
+
+    def position(self, number: int) -> int:
+        """1-based place in line, or 0 if the number is not waiting."""
+        return self._counts.prefix(number) if number in self._waiting else 0
+
+    def in_service(self, desks: int = 1, now: float | None = None) -> int:
+        """
+        Visits still taking up a desk: calls made within STALE_CALL_FACTOR
+        average visits before `now` (every call if `now` is None), and never
+        more than `desks`. A called ticket the desk never completed stops
+        counting once it is that old.
+        """
+        desks = max(desks, 1)
+        if now is None:
+            return min(len(self.serving), desks)
+        cutoff = now - STALE_CALL_FACTOR * self.service_seconds
+        active = 0
+        for called_at in self.serving.values():
+            if called_at >= cutoff:
+                active += 1
+                if active == desks:
+                    break
+        return active
+
+    def eta_seconds(self, number: int, desks: int = 1, now: float | None = None) -> float:
+        """Expected wait: everyone ahead plus the visits in progress, spread over the desks."""
+        position = self.position(number)
+        if not position:
+            return 0.0
+        return (position - 1 + self.in_service(desks, now)) * self.service_seconds / max(desks, 1)
+
+
+class QueueEngine:
+    """
+    Department queues shared by every kiosk and staff worker.
+
+    Operations are recorded as `event<TAB>department<TAB>number<TAB>timestamp`
+    lines in a DailyEventLog, so all processes replay the same sequence
+    (service times included, since they come from the logged timestamps),
+    a restart rebuilds the day's queues, and a new day starts empty.
+    """
+
+    def __init__(self, directory: str, desks: int = 1, alpha: float = SERVICE_TIME_ALPHA,
+                 default_service_seconds: float = DEFAULT_SERVICE_SECONDS,
+                 today=date.today, clock=time.time, fsync: bool = False):
+        self.directory = directory
+        self.desks = desks
+        self.alpha = alpha
+        self.default_service_seconds = default_service_seconds
+        self._clock = clock
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._log = DailyEventLog(directory, self._apply, self._queues.clear, today=today, fsync=fsync)
+
+    def _queue(self, department: str) -> DepartmentQueue:
+        queue = self._queues.get(department)
+        if queue is None:
+            queue = DepartmentQueue(self.default_service_seconds)
+            self._queues[department] = queue
+        return queue
+
+    def _apply(self, fields: list) -> None:
+        if len(fields) != 4 or not fields[2].isdigit():
+            return
+        event, department, number = fields[0], fields[1], int(fields[2])
+        try:
+            timestamp = float(fields[3])
+        except ValueError:
+            return
+        queue = self._queue(department)
+        if event == "join":
+            queue.join(number)
+        elif event == "call":
+            queue.call(number, timestamp)
+        elif event == "complete":
+            queue.complete(number, timestamp, self.alpha)
+        elif event == "cancel":
+            queue.remove(number)
+
+    def _status(self, department: str, number: int) -> dict:
+        queue = self._queue(department)
+        if number in queue.serving:
+            state, position, eta = "serving", 0, 0.0
+        else:
+            position = queue.position(number)
+            state = "waiting" if position else "done"
+            eta = queue.eta_seconds(number, self.desks, self._clock())
+        return {
+            "ticket": format_ticket(department, number),
+            "department": department,
+            "state": state,
+            "position": position,
+            "eta_seconds": round(eta),
+            "eta_minutes": math.ceil(eta / 60),
+        }
+
+    # ── operations ──────────────────────────────────────────
+    def join(self, ticket: str) -> dict:
+        """Puts a ticket (e.g. 내과-007) in its department's line. Returns its status."""
+        department, number = parse_ticket(ticket)
+        with self._lock:
+            def build():
+                queue = self._queue(department)
+                if queue.position(number) or number in queue.serving:
+                    return [], None  # Already in line
+                return [["join", department, number, self._clock()]], None
+            self._log.record(build)
+            return self._status(department, number)
+
+    def call_next(self, department: str) -> str | None:
+        """Moves the lowest waiting number to service. Returns its ticket, or None if nobody waits."""
+        with self._lock:
+            def build():
+                number = self._queue(department).next_number()
+                if number is None:
+                    return [], None
+                return [["call", department, number, self._clock()]], format_ticket(department, number)
+            return self._log.record(build)
+
+    def complete(self, ticket: str) -> bool:
+        """Ends the visit of a called ticket and feeds its duration to the service-time average."""
+        department, number = parse_ticket(ticket)
+        with self._lock:
+            def build():
+                queue = self._queue(department)
+                if number not in queue.serving and not queue.position(number):
+                    return [], False
+                return [["complete", department, number, self._clock()]], True
+            return self._log.record(build)
+
+    def cancel(self, ticket: str) -> bool:
+        """Takes a waiting ticket out of line."""
+        department, number = parse_ticket(ticket)
+        with self._lock:
+            def build():
+                if not self._queue(department).position(number):
+                    return [], False
+                return [["cancel", department, number, self._clock()]], True
+            return self._log.record(build)
+
+    # ── queries ─────────────────────────────────────────────
+    def status(self, ticket: str) -> dict:
+        """{ticket, department, state, position, eta_seconds, eta_minutes} for a ticket."""
+        department, number = parse_ticket(ticket)
+        with self._lock:
+            self._log.refresh()
+            return self._status(department, number)
+
+    def _summary(self, department: str) -> dict:
+        queue = self._queue(department)
+        return {
+            "department": department,
+            "waiting": len(queue),
+            "serving": [format_ticket(department, number) for number in sorted(queue.serving)],
+            "service_seconds": round(queue.service_seconds),
+        }
+
+    def summary(self, department: str) -> dict:
+        """Line length, tickets in service and current average service time of a department."""
+        with self._lock:
+            self._log.refresh()
+            return self._summary(department)
+
+    def summaries(self) -> list:
+        """summary() of every department that had a ticket today, by department name."""
+        with self._lock:
+            self._log.refresh()
+            return [self._summary(department) for department in sorted(self._queues)]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_queue_engine() -> QueueEngine:
+    """Returns the process-wide queue engine for QUEUE_DIR."""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.directory != QUEUE_DIR:
+            _engine = QueueEngine(QUEUE_DIR, desks=QUEUE_DESKS)
+        return _engine
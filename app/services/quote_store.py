@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# How long a prescription quote stays valid after it was shown to the patient
+QUOTE_TTL_SECONDS = float(os.getenv("KIOSK_QUOTE_TTL", "900"))
+
+
+class QuoteStore:
+    """
+    Server-side prescription quotes keyed by patient RRN, each valid for
+    `ttl` seconds. Entries are kept in expiry order (all share one TTL and
+    a re-quote moves to the end), so expired ones are dropped from the front
+    in amortised O(1) on every access.
+    """
+
+    def __init__(self, ttl: float = QUOTE_TTL_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._quotes = OrderedDict()  # rrn -> (expires_at, quote)
+        self._lock = threading.Lock()
+
+    def _purge_locked(self, now: float) -> None:
+        while self._quotes:
+            rrn, (expires_at, _) = next(iter(self._quotes.items()))
+            if expires_at > now:
+                break
+            del self._quotes[rrn]
+
+    def get(self, rrn: str) -> dict | None:
+        """The live quote for `rrn`, or None if there is none or it expired."""
+        with self._lock:
+            self._purge_locked(self._clock())
+            entry = self._quotes.get(rrn)
+            return dict(entry[1]) if entry is not None else None
+
+    def put(self, rrn: str, quote: dict) -> dict:
+        """Stores (or replaces) the quote for `rrn` and restarts its TTL."""
+        with self._lock:
+            now = self._clock()
+            self._purge_locked(now)
+            self._quotes.pop(rrn, None)
+            self._quotes[rrn] = (now + self.ttl, dict(quote))
+            return dict(quote)
+
+    def pop(self, rrn: str) -> dict | None:
+        """Removes and returns the live quote for `rrn` (e.g. once it is paid)."""
+        with self._lock:
+            self._purge_locked(self._clock())
+            entry = self._quotes.pop(rrn, None)
+            return dict(entry[1]) if entry is not None else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_locked(self._clock())
+            return len(self._quotes)
+
+
+_quote_store = QuoteStore()
+
+
+def get_quote_store() -> QuoteStore:
+    """Returns the process-wide quote store."""
+    return _quote_store
@@ -1,13 +1,22 @@
-import csv
 import os
 import random
 import sys # Added for logging
 from datetime import datetime
 
+from app.services.change_log import change_recorder
+from app.services.event_bus import publish, publish_status_change
+from app.services.storage import DEFAULT_FIELDNAMES, Reservation, get_reservation_reader, get_reservation_store
+from app.services.queue_engine import get_queue_engine
+from app.services.ticket_allocator import get_ticket_allocator
+
 # Path constants
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
 RESV_CSV = os.path.join(BASE_DIR, "data", "reservations.csv")
 
+# Simulated ID scans pick only today's Pending reservations when set (falls
+# back to any reservation if there are none)
+SCAN_PENDING_TODAY = os.getenv("KIOSK_SCAN_PENDING_TODAY", "0").strip().lower() in ("1", "true", "yes")
+
 # Symptoms and department mapping (structure matching original route for template compatibility)
 SYMPTOMS = [
     ("fever",   "발열‧오한"), ("cough",  "기침‧가래"), ("soreth",  "인후통"),
@@ -35,22 +44,31 @@ SYM_TO_DEPT = {
 
 # Helper functions (moved from routes)
 
-def fake_scan_rrn() -> tuple[str, str]:
+def fake_scan_rrn(pending_today: bool | None = None) -> tuple[str, str]:
     """
     주민등록번호 스캔 흉내 (실제 스캐너 대신 임의의 데이터를 생성)
+    Picks a random reservation through the store's sample(), which uses the
+    cached index when there is one instead of copying every row.
+    `pending_today` (default: SCAN_PENDING_TODAY) restricts the pick to
+    today's Pending reservations.
     """
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.fake_scan_rrn(args={{_func_args}})")
     # CSV 파일에서 임의의 환자 정보 읽기 (데모용)
     try:
-        with open(RESV_CSV, mode="r", encoding="utf-8-sig") as f:
-            reservations = list(csv.DictReader(f))
-        if not reservations:
-            # Fallback if CSV is empty or not found
+        if pending_today is None:
+            pending_today = SCAN_PENDING_TODAY
+        store = get_reservation_reader(RESV_CSV)
+        random_patient = None
+        if pending_today:
+            random_patient = store.sample(random, status="Pending", day=datetime.now().strftime("%Y-%m-%d"))
+        if random_patient is None:
+            random_patient = store.sample(random)
+        if random_patient is None:
+            # Fallback if CSV is empty
             return "김민준", "900101-1234567"
 
-        random_patient = random.choice(reservations)
         return random_patient["name"], random_patient["rrn"]
     except FileNotFoundError:
         # Fallback if CSV is not found
@@ -61,21 +79,17 @@ def fake_scan_rrn() -> tuple[str, str]:
         return "박도윤", "950505-1010101"
 
 
-def lookup_reservation(name: str, rrn: str) -> dict | None:
+def lookup_reservation(name: str, rrn: str) -> Reservation | None:
     """
     예약 내역 조회 (이름과 주민번호로 조회)
+    Returns a read-only Reservation record (use .get() / .to_dict()).
     """
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.lookup_reservation(args={{_func_args}})")
     try:
-        with open(RESV_CSV, mode="r", encoding="utf-8-sig") as f:
-            reservations = list(csv.DictReader(f))
-
-        for res in reservations:
-            if res["name"] == name and res["rrn"] == rrn:
-                return res # Return the entire reservation dict
-        return None
+        # O(1) lookup on the repository's (name, rrn) index
+        return get_reservation_reader(RESV_CSV).find(name, rrn)
     except FileNotFoundError:
         print(f"Warning: {RESV_CSV} not found in lookup_reservation.")
         return None
@@ -85,15 +99,100 @@ def lookup_reservation(name: str, rrn: str) -> dict | None:
 
 def new_ticket(department: str) -> str:
     """
-    새로운 대기표 발급 (간단한 규칙으로 생성)
+    새로운 대기표 발급 (진료과별 당일 순번, 예: 내과-007)
+    Numbers come from the shared TicketAllocator, so they never collide
+    between kiosks and count up per department, starting over each day.
     """
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.new_ticket(args={{_func_args}})")
-    now = datetime.now()
-    dept_code = department[0] if department else "X" # Use first letter of department
-    ticket_num = f"{dept_code}{now.strftime('%H%M%S')}{random.randint(10,99)}"
-    return ticket_num
+    return get_ticket_allocator().issue(department or "X")
+
+
+def join_queue(ticket: str) -> dict | None:
+    """
+    Puts a freshly issued ticket in its department's waiting line.
+    Returns {ticket, department, state, position, eta_seconds, eta_minutes},
+    or None if the ticket could not be queued.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.join_queue(args={{_func_args}})")
+    try:
+        engine = get_queue_engine()
+        queue_status = engine.join(ticket)
+        publish("queue_changed", engine.summary(queue_status["department"]))
+        return queue_status
+    except Exception as e:
+        print(f"Warning: Could not queue ticket {ticket}: {e}")
+        return None
+
+
+def get_queue_status(ticket: str) -> dict | None:
+    """
+    Current place in line and estimated wait for a ticket, or None if unknown.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.get_queue_status(args={{_func_args}})")
+    try:
+        return get_queue_engine().status(ticket)
+    except Exception as e:
+        print(f"Warning: Could not read queue status for ticket {ticket}: {e}")
+        return None
+
+
+def call_next_ticket(department: str, desk: str = "") -> str | None:
+    """
+    Calls the next waiting ticket of a department to a desk and announces it
+    on the queue board. Returns the ticket, or None if nobody is waiting.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.call_next_ticket(args={{_func_args}})")
+    try:
+        engine = get_queue_engine()
+        ticket = engine.call_next(department)
+        if ticket:
+            publish("ticket_called", {"ticket": ticket, "department": department, "desk": desk})
+            publish("queue_changed", engine.summary(department))
+        return ticket
+    except Exception as e:
+        print(f"Warning: Could not call next ticket for {department}: {e}")
+        return None
+
+
+def complete_ticket(ticket: str) -> bool:
+    """
+    Ends the visit of a called ticket (or drops a waiting one) and updates the board.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.complete_ticket(args={{_func_args}})")
+    try:
+        engine = get_queue_engine()
+        if not engine.complete(ticket):
+            return False
+        publish("queue_changed", engine.summary(engine.status(ticket)["department"]))
+        return True
+    except Exception as e:
+        print(f"Warning: Could not complete ticket {ticket}: {e}")
+        return False
+
+
+def get_queue_board() -> list:
+    """
+    Waiting count, tickets in service and average service time of every
+    department with tickets today (the queue board's snapshot).
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.get_queue_board(args={{_func_args}})")
+    try:
+        return get_queue_engine().summaries()
+    except Exception as e:
+        print(f"Warning: Could not read the queue board: {e}")
+        return []
 
 
 def update_reservation_status(patient_rrn: str, new_status: str, **kwargs) -> bool:
@@ -106,58 +205,80 @@ def update_reservation_status(patient_rrn: str, new_status: str, **kwargs) -> bo
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.update_reservation_status(args={{_func_args}})")
 
-    if not os.path.exists(RESV_CSV):
-        # print(f"Error: {RESV_CSV} not found.") # Optional: for server-side logging
+    repo = get_reservation_store(RESV_CSV)
+    try:
+        fieldnames = repo.fieldnames
+        # Ensure 'rrn' and 'status' are valid fieldnames
+        if not fieldnames or not all(field in fieldnames for field in ['rrn', 'status']):
+            # print("Error: CSV headers are missing 'rrn' or 'status'.") # Optional
+            return False
+
+        fields = {'status': str(new_status)} # Ensure status is also a string
+        # Update other fields from kwargs if they are valid column names
+        for key, value in kwargs.items():
+            if key in fieldnames: # Ensure the key is a valid column
+                fields[key] = str(value) # Store all CSV data as strings
+            else:
+                # Optional: Log a warning if a kwarg key is not a valid fieldname
+                print(f"Warning: In update_reservation_status, '{key}' is not a valid field in reservations.csv. Cannot update.")
+
+        # Returns False if the patient RRN is not found; the change is logged under the store's write lock
+        if not repo.update(patient_rrn, fields, on_commit=change_recorder("update")):
+            return False
+        publish_status_change(repo.get_by_rrn(patient_rrn), fields['status'])
+        return True
+
+    except FileNotFoundError:
+        # print(f"Error: File {RESV_CSV} not found.") # Optional: for server-side logging
         return False
+    except Exception as e:
+        print(f"Error updating reservation status for RRN {patient_rrn}: {e}")
+        return False
+
 
-    rows = []
-    original_fieldnames = None
-    updated = False
+def update_reservations_bulk(changes: dict) -> dict:
+    """
+    Applies a batch of reservation changes in a single read-modify-write pass.
+    `changes` maps patient RRN -> {field: value}, e.g. {"900101-1234567": {"status": "Cancelled"}}.
+    Fields that are not columns of reservations.csv are skipped with a warning.
+    Returns a dict mapping each RRN to True (updated) or False (not found / error).
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.update_reservations_bulk(args={{_func_args}})")
 
+    if not changes:
+        return {}
+
+    repo = get_reservation_store(RESV_CSV)
     try:
-        with open(RESV_CSV, mode='r', newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            original_fieldnames = reader.fieldnames
-            # Ensure 'rrn' and 'status' are valid fieldnames
-            if not original_fieldnames or not all(field in original_fieldnames for field in ['rrn', 'status']):
-                # print("Error: CSV headers are missing 'rrn' or 'status'.") # Optional
-                return False
-            rows = list(reader)
-
-        for i, row in enumerate(rows):
-            if row.get('rrn') == patient_rrn:
-                rows[i]['status'] = str(new_status) # Ensure status is also a string
-
-                # Update other fields from kwargs if they are valid column names
-                for key, value in kwargs.items():
-                    if key in original_fieldnames: # Ensure the key is a valid column
-                        rows[i][key] = str(value) # Store all CSV data as strings
-                    else:
-                        # Optional: Log a warning if a kwarg key is not a valid fieldname
-                        print(f"Warning: In update_reservation_status, '{key}' is not a valid field in reservations.csv. Cannot update.")
-
-                updated = True
-                # RRN should be unique, so we can break after finding and updating.
-                break
-
-        if updated:
-            with open(RESV_CSV, mode='w', newline='', encoding='utf-8') as csvfile:
-                if not original_fieldnames: # Should have been caught earlier
-                    return False
-                writer = csv.DictWriter(csvfile, fieldnames=original_fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
-            return True
-        else:
-            # print(f"Info: Patient RRN {patient_rrn} not found for status update.") # Optional
-            return False # Patient not found
-
-    except FileNotFoundError: # Should be caught by os.path.exists, but as a safeguard
-        # print(f"Error: File {RESV_CSV} disappeared during update operation.") # Optional
-        return False
+        fieldnames = repo.fieldnames
+        if not fieldnames or 'rrn' not in fieldnames:
+            return {rrn: False for rrn in changes}
+
+        valid_changes = {}
+        for rrn, fields in changes.items():
+            valid_fields = {}
+            for key, value in fields.items():
+                if key in fieldnames and key != 'rrn':
+                    valid_fields[key] = str(value) # Store all CSV data as strings
+                else:
+                    print(f"Warning: In update_reservations_bulk, '{key}' is not a valid field in reservations.csv. Cannot update.")
+            valid_changes[rrn] = valid_fields
+
+        results = repo.update_many(valid_changes, on_commit=change_recorder("update"))
+        updated = [rrn for rrn, ok in results.items() if ok]
+        for rrn in updated:
+            if 'status' in valid_changes[rrn]:
+                publish_status_change(repo.get_by_rrn(rrn), valid_changes[rrn]['status'])
+        return results
+
+    except FileNotFoundError:
+        # print(f"Error: File {RESV_CSV} not found.") # Optional: for server-side logging
+        return {rrn: False for rrn in changes}
     except Exception as e:
-        # print(f"Error updating reservation status for RRN {patient_rrn}: {e}") # Optional
-        return False
+        print(f"Error in bulk reservation update: {e}")
+        return {rrn: False for rrn in changes}
 
 
 # Service action functions
@@ -178,10 +299,10 @@ def handle_scan_action() -> dict:
         "reservation_details": reservation_details
     }
 
-def handle_manual_action(name: str, rrn: str) -> dict | None:
+def handle_manual_action(name: str, rrn: str) -> Reservation | None:
     """
     Handles the 'manual' input action: looks up reservation.
-    Returns reservation_details dictionary or None.
+    Returns the reservation record or None.
     """
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
@@ -195,24 +316,24 @@ def handle_manual_action(name: str, rrn: str) -> dict | None:
 
 def handle_choose_symptom_action(symptom: str) -> dict:
     """
-    Handles the 'choose_symptom' action: determines department and issues a new ticket.
-    Returns a dictionary with department and ticket number.
+    Handles the 'choose_symptom' action: determines department, issues a new
+    ticket and puts it in the department's line.
+    Returns a dictionary with department, ticket number, place in line and
+    estimated wait in minutes (both None if the ticket could not be queued).
     """
     _func_args = locals()
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.handle_choose_symptom_action(args={{_func_args}})")
     department = SYM_TO_DEPT.get(symptom, SYM_TO_DEPT.get("etc", "가정의학과")) # Default to "가정의학과" if symptom not in map
     ticket = new_ticket(department)
+    queue_status = join_queue(ticket)
     return {
         "department": department,
-        "ticket": ticket
+        "ticket": ticket,
+        "position": queue_status["position"] if queue_status else None,
+        "eta_minutes": queue_status["eta_minutes"] if queue_status else None
     }
 
-DEFAULT_FIELDNAMES = [
-    "name", "rrn", "time", "department", "ticket_number",
-    "location", "doctor", "status", "prescription_names", "total_fee"
-]
-
 def add_new_patient_reception(name: str, rrn: str, department: str, ticket_number: str, initial_status: str = "Registered") -> bool:
     """
     Appends a new patient reception record to reservations.csv.
@@ -222,32 +343,25 @@ def add_new_patient_reception(name: str, rrn: str, department: str, ticket_numbe
     _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
     print(f"ENTERING: {_module_path}.add_new_patient_reception(args={{_func_args}})")
 
-    file_exists = os.path.exists(RESV_CSV)
-    if not file_exists:
+    if not os.path.exists(RESV_CSV):
         print(f"Info: {RESV_CSV} not found, will be created with headers.")
 
     try:
-        with open(RESV_CSV, mode='a', newline='', encoding='utf-8') as csvfile:
-            # Use DEFAULT_FIELDNAMES consistently
-            writer = csv.DictWriter(csvfile, fieldnames=DEFAULT_FIELDNAMES)
-
-            if not file_exists or os.path.getsize(RESV_CSV) == 0:
-                writer.writeheader()
-
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            new_row = {
-                "name": name,
-                "rrn": rrn,
-                "time": current_time,
-                "department": department,
-                "ticket_number": ticket_number,
-                "location": "",  # Default empty
-                "doctor": "",    # Default empty
-                "status": initial_status,
-                "prescription_names": "", # Default empty
-                "total_fee": "0"          # Default 0
-            }
-            writer.writerow(new_row)
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        new_row = {
+            "name": name,
+            "rrn": rrn,
+            "time": current_time,
+            "department": department,
+            "ticket_number": ticket_number,
+            "location": "",  # Default empty
+            "doctor": "",    # Default empty
+            "status": initial_status,
+            "prescription_names": "", # Default empty
+            "total_fee": "0"          # Default 0
+        }
+        # Use DEFAULT_FIELDNAMES consistently when the file has to be created
+        get_reservation_store(RESV_CSV).append(new_row, DEFAULT_FIELDNAMES, on_commit=change_recorder("insert"))
         return True
     except Exception as e:
         print(f"Error adding new patient reception for RRN {rrn}: {e}")
@@ -0,0 +1,132 @@
+"""
+Certificate PDF rendering in worker processes.
+
+  • get_render_pool() → RenderPool; pool.run(fn, **kwargs) → fn(**kwargs)
+
+fpdf2 layout and font subsetting are pure Python, so a PDF rendered in a
+request thread holds the GIL for its whole ~100 ms and stalls every other
+request of the process. The pool renders in separate processes instead;
+the request thread only waits on the result, which does not hold the GIL.
+
+  KIOSK_PDF_WORKERS      worker processes (0: render in the calling thread)
+  KIOSK_PDF_QUEUE_DEPTH  renders queued or running at once; more are refused
+  KIOSK_PDF_TIMEOUT      seconds a caller waits for its PDF
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.utils.pdf_generator import warm_up_fonts
+
+PDF_WORKERS = int(os.getenv("KIOSK_PDF_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_QUEUE_DEPTH = int(os.getenv("KIOSK_PDF_QUEUE_DEPTH", "8"))
+PDF_TIMEOUT = float(os.getenv("KIOSK_PDF_TIMEOUT", "15.0"))
+
+
+class RenderPoolBusyError(RuntimeError):
+    """Raised when a PDF cannot be rendered now (queue full, timed out, or a worker died); retry later."""
+
+
+class RenderPool:
+    """
+    Bounded ProcessPoolExecutor for PDF builds.
+
+    Workers are started with "spawn" (forking a threaded web server can
+    copy a held lock into the child) and each loads the Korean font once,
+    in its initializer. At most `max_pending` renders are queued or running;
+    run() refuses more with RenderPoolBusyError instead of letting the queue
+    grow, and gives up after `timeout` seconds. A pool whose worker died is
+    replaced on the next call.
+
+    Spawned workers re-import the main module (run.py skips create_app()
+    there); should another entry point build a pool anyway, the pool of a
+    worker process renders in-process, so workers never start pools of
+    their own.
+    """
+
+    def __init__(self, workers: int = PDF_WORKERS, max_pending: int = PDF_QUEUE_DEPTH,
+                 timeout: float = PDF_TIMEOUT):
+        # Spawned children are named before they re-import the main module
+        in_worker = multiprocessing.current_process().name != "MainProcess"
+        self.workers = 0 if in_worker else max(0, workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=warm_up_fonts
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args, **kwargs):
+        """
+        fn(*args, **kwargs) in a worker process; `fn` and its arguments must be
+        picklable (a module-level function). Exceptions raised by `fn` are
+        re-raised here.
+        """
+        if not self.workers:
+            return fn(*args, **kwargs)
+        if not self._slots.acquire(blocking=False):
+            raise RenderPoolBusyError(f"{self.max_pending} PDFs are already being rendered")
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._slots.release()
+            self._discard(executor)
+            raise RenderPoolBusyError(f"PDF pool unavailable: {e!r}") from e
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # Still queued: dropped; already running: its slot frees when it ends
+            raise RenderPoolBusyError(f"PDF not rendered within {self.timeout}s") from None
+        except BrokenProcessPool as e:
+            print(f"Warning: PDF worker process died: {e!r}")
+            self._discard(executor)
+            raise RenderPoolBusyError("PDF worker process died") from e
+
+    def warm_up(self) -> bool:
+        """
+        Starts the worker processes now (each loads the fonts) rather than on
+        the first certificate; without workers, loads the fonts in this process.
+        """
+        if not self.workers:
+            return warm_up_fonts()
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(warm_up_fonts)
+        return True
+
+    def close(self) -> None:
+        """Stops the worker processes; a later run() starts new ones."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> RenderPool:
+    """Returns the process-wide render pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+        return _pool
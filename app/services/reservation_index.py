@@ -0,0 +1,225 @@
+import csv
+import io
+import mmap
+import os
+import threading
+from array import array
+
+from app.services.reservation_repository import read_journal
+from app.services.storage import Reservation, reservoir_sample, sample_filter
+
+_BOM = b"\xef\xbb\xbf"
+
+
+class _Mapping:
+    """The mapped file plus the line index built over it."""
+
+    __slots__ = ("inode", "size", "mm", "columns", "rrn_col", "indexed_end",
+                 "first", "more", "offsets", "lengths")
+
+    def __init__(self, inode: int | None = None):
+        self.inode = inode
+        self.size = 0
+        self.mm = None
+        self.columns = ()
+        self.rrn_col = -1
+        self.indexed_end = 0
+        self.first = {}             # rrn -> slot of its first line
+        self.more = {}              # rrn -> slots of later lines (duplicates are rare)
+        self.offsets = array("q")   # slot -> byte offset of the line
+        self.lengths = array("l")   # slot -> byte length of the line, without the newline
+
+
+class MmapReservationIndex:
+    """
+    Read-only lookups on reservations.csv without parsing the whole file.
+
+    The file is memory-mapped and scanned once to build an
+    rrn -> (offset, length) index; only the RRN column of each line is
+    decoded. A lookup slices the matching line out of the mapping and parses
+    just that line, so memory use stays flat no matter how many rows the day's
+    file holds.
+
+    When the file grows in place (new rows are appended with O_APPEND by
+    ReservationRepository.append) only the new tail is scanned. If the file is
+    replaced (compaction writes a new file via os.replace) or shrinks, the
+    index is rebuilt from scratch.
+
+    Updates live in `<csv>.journal` until compaction, so journal records are
+    read incrementally and overlaid on the parsed line, exactly like the
+    repository applies them: to the first row of the RRN, known columns only.
+    Compaction replaces the CSV and then the journal; the CSV is checked
+    again after each journal read, and if it was replaced meanwhile the
+    index is rebuilt and the new journal read from the start.
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self.journal_path = csv_path + ".journal"
+        self._lock = threading.Lock()
+        self._mapping = _Mapping()
+        self._overlay = {}
+        self._journal_inode = None
+        self._journal_offset = 0
+
+    # ── index maintenance ───────────────────────────────────
+    def _refresh_locked(self) -> None:
+        st = os.stat(self.csv_path)  # Raises FileNotFoundError if missing
+        for _ in range(5):
+            mapping = self._mapping
+            if st.st_ino != mapping.inode or st.st_size < mapping.size:
+                mapping = _Mapping(st.st_ino)
+                self._overlay = {}
+                self._journal_inode = None
+                self._journal_offset = 0
+            if st.st_size != mapping.size or mapping.mm is None and st.st_size:
+                self._extend(mapping, st.st_size)
+            self._mapping = mapping
+
+            records, offset, inode = read_journal(self.journal_path, self._journal_offset, self._journal_inode)
+            if inode != self._journal_inode:
+                # A new journal: the old one's records are in the CSV now
+                self._overlay = {}
+            self._journal_inode = inode
+            self._journal_offset = offset
+            for record in records:
+                fields = {key: str(value) for key, value in record.get("fields", {}).items()
+                          if key in mapping.columns}
+                self._overlay.setdefault(record.get("rrn"), {}).update(fields)
+
+            # If the CSV was replaced while the journal was read, the records
+            # may belong to the new CSV: rebuild against it
+            st = os.stat(self.csv_path)
+            if st.st_ino == mapping.inode:
+                break
+
+    def _extend(self, mapping: _Mapping, size: int) -> None:
+        """Maps the file at its current `size` and indexes lines past `indexed_end`."""
+        mapping.size = size
+        if size == 0:
+            mapping.mm = None
+            return
+        with open(self.csv_path, mode="rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mapping.mm = mm
+
+        pos = mapping.indexed_end
+        if not mapping.columns:
+            start = len(_BOM) if mm[:len(_BOM)] == _BOM else 0
+            header_end = self._record_end(mm, start, size)
+            if header_end is None:
+                return
+            text = mm[start:header_end].decode("utf-8")
+            mapping.columns = tuple(next(csv.reader(io.StringIO(text, newline="")), ()))
+            mapping.rrn_col = mapping.columns.index("rrn") if "rrn" in mapping.columns else -1
+            pos = header_end + 1
+
+        rrn_col = mapping.rrn_col
+        while pos < size:
+            end = self._record_end(mm, pos, size)
+            if end is None:
+                break  # Partial line: an append is still being written
+            length = end - pos
+            if mm[end - 1:end] == b"\r":
+                length -= 1
+            if length and rrn_col >= 0:
+                line = mm[pos:pos + length]
+                if b'"' in line:
+                    values = next(csv.reader(io.StringIO(line.decode("utf-8"), newline="")), [])
+                    rrn = values[rrn_col] if rrn_col < len(values) else None
+                else:
+                    values = line.split(b",")
+                    rrn = values[rrn_col].decode("utf-8") if rrn_col < len(values) else None
+                slot = len(mapping.offsets)
+                mapping.offsets.append(pos)
+                mapping.lengths.append(length)
+                if rrn in mapping.first:
+                    mapping.more.setdefault(rrn, []).append(slot)
+                else:
+                    mapping.first[rrn] = slot
+            pos = end + 1
+        mapping.indexed_end = pos
+
+    @staticmethod
+    def _record_end(mm, pos: int, size: int) -> int | None:
+        """Offset of the newline ending the CSV record at `pos` (quoted newlines included)."""
+        end = mm.find(b"\n", pos, size)
+        while end != -1 and mm[pos:end].count(b'"') % 2:
+            end = mm.find(b"\n", end + 1, size)
+        return None if end == -1 else end
+
+    def _parse(self, mapping: _Mapping, slot: int) -> Reservation:
+        offset = mapping.offsets[slot]
+        text = mapping.mm[offset:offset + mapping.lengths[slot]].decode("utf-8")
+        return Reservation(mapping.columns, next(csv.reader(io.StringIO(text, newline="")), []))
+
+    def _rows_for(self, rrn: str):
+        """Yields parsed rows for `rrn` in file order, journal applied to the first one."""
+        mapping = self._mapping
+        slot = mapping.first.get(rrn)
+        if slot is None:
+            return
+        row = self._parse(mapping, slot)
+        overlay = self._overlay.get(rrn)
+        yield row.with_fields(overlay) if overlay else row
+        for slot in mapping.more.get(rrn, ()):
+            yield self._parse(mapping, slot)
+
+    # ── reads ───────────────────────────────────────────────
+    @property
+    def fieldnames(self) -> list:
+        with self._lock:
+            self._refresh_locked()
+            return list(self._mapping.columns)
+
+    def get_by_rrn(self, rrn: str) -> Reservation | None:
+        with self._lock:
+            self._refresh_locked()
+            return next(self._rows_for(rrn), None)
+
+    def find(self, name: str, rrn: str) -> Reservation | None:
+        with self._lock:
+            self._refresh_locked()
+            for row in self._rows_for(rrn):
+                if row.get("name") == name:
+                    return row
+            return None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh_locked()
+            return len(self._mapping.offsets)
+
+    def _row_at(self, mapping: _Mapping, slot: int) -> Reservation:
+        row = self._parse(mapping, slot)
+        rrn = row.get("rrn")
+        overlay = self._overlay.get(rrn)
+        if overlay and mapping.first.get(rrn) == slot:
+            row = row.with_fields(overlay)
+        return row
+
+    def sample(self, rng, status: str | None = None, day: str | None = None) -> Reservation | None:
+        """Random reservation: without a filter, one random line is parsed; with one, a reservoir pass."""
+        with self._lock:
+            self._refresh_locked()
+            mapping = self._mapping
+            count = len(mapping.offsets)
+            predicate = sample_filter(status, day)
+            if predicate is None:
+                return self._row_at(mapping, rng.randrange(count)) if count else None
+            return reservoir_sample((self._row_at(mapping, slot) for slot in range(count)), rng, predicate)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_mmap_index(csv_path: str) -> MmapReservationIndex:
+    """Returns the shared mmap index for `csv_path`, creating it on first use."""
+    csv_path = os.path.abspath(csv_path)
+    with _indexes_lock:
+        index = _indexes.get(csv_path)
+        if index is None:
+            index = MmapReservationIndex(csv_path)
+            _indexes[csv_path] = index
+        return index
@@ -0,0 +1,432 @@
+import csv
+import io
+import json
+import os
+import threading
+
+from app.services.storage import Reservation, ReservationStore, reservoir_sample, sample_filter
+from app.utils.file_lock import append_bytes, atomic_write_bytes, file_lock
+
+# Path constants
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+RESV_CSV = os.path.join(BASE_DIR, "data", "reservations.csv")
+
+# Number of journal records after which the journal is folded back into the CSV
+JOURNAL_COMPACT_THRESHOLD = 500
+
+
+def read_journal(journal_path: str, offset: int, inode: int | None = None) -> tuple:
+    """
+    Reads the journal records written after byte `offset`.
+    Returns (records, new_offset, inode of the file read, None if there is
+    none). Compaction replaces the journal with a new file, so if it is no
+    longer the file `inode` the new one is read from the start instead.
+    Only complete lines are consumed; a trailing partial line is a write
+    still in progress and is left for the next call.
+    """
+    try:
+        with open(journal_path, mode="rb") as f:
+            file_inode = os.fstat(f.fileno()).st_ino
+            if file_inode != inode:
+                offset = 0
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0, None
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            print(f"Warning: Skipping malformed record in {journal_path}")
+    return records, offset + end, file_inode
+
+
+class _Snapshot:
+    """
+    One consistent, loaded state of the CSV plus the journal records applied on top.
+    The indexes map to positions in `rows`, so a journal record can swap in
+    an updated record without touching the indexes.
+    """
+
+    __slots__ = ("signature", "columns", "rows", "by_rrn", "by_name_rrn")
+
+    def __init__(self, signature: tuple | None, columns: tuple, rows: list):
+        self.signature = signature
+        self.columns = columns
+        self.rows = rows
+        self.by_rrn = {}
+        self.by_name_rrn = {}
+        for position, row in enumerate(rows):
+            self.index(row, position)
+
+    @property
+    def fieldnames(self) -> list:
+        return list(self.columns)
+
+    def index(self, row: Reservation, position: int) -> None:
+        # The first row for an RRN wins, matching the old linear scans.
+        self.by_rrn.setdefault(row.get("rrn"), position)
+        self.by_name_rrn.setdefault((row.get("name"), row.get("rrn")), position)
+
+    def row_for(self, rrn: str) -> Reservation | None:
+        position = self.by_rrn.get(rrn)
+        return self.rows[position] if position is not None else None
+
+
+def parse_reservations(f) -> tuple:
+    """
+    Parses an open CSV file into (columns, [Reservation, ...]).
+
+    Rows share one header tuple, and equal cell values (departments,
+    doctors, statuses, dates...) share one string object, so memory grows
+    with the distinct values rather than with rows x columns.
+    """
+    reader = csv.reader(f)
+    columns = tuple(next(reader, None) or ())
+    width = len(columns)
+    intern = {}.setdefault
+    new = tuple.__new__
+    # Well-formed lines skip Reservation.__new__'s padding and go straight to
+    # the C tuple constructor; csv.DictReader also skips blank lines.
+    rows = [new(Reservation, [*map(intern, values, values), columns]) if len(values) == width
+            else Reservation(columns, values)
+            for values in reader if values]
+    return columns, rows
+
+
+_EMPTY = _Snapshot(None, (), [])
+
+
+class ReservationRepository(ReservationStore):
+    """
+    In-memory view of reservations.csv with hash indexes.
+
+    The file is parsed once and kept in memory together with two indexes:
+    rrn -> row and (name, rrn) -> row. Every access compares the file's
+    (inode, mtime, size) signature with the one that was loaded and re-reads
+    the file only when it changed, so lookups are O(1) instead of a full scan.
+
+    Field updates are not written into the CSV. They are appended as one
+    JSON line each to `<csv>.journal` and replayed on top of the CSV when it
+    is loaded, so an update costs one small append however many rows the
+    file holds. Once the journal grows past `compact_threshold` records it
+    is folded back into a fresh CSV and replaced by a new, empty journal
+    file. Readers track the journal's inode as well as their offset in it,
+    so one that read the old CSV never applies the new journal from the
+    old offset: a new inode means a reload.
+
+    Writers in every thread and process coordinate through an fcntl lock on
+    `<csv>.lock`, and the CSV is only ever replaced via temp file +
+    os.replace, so a crash cannot leave it half-written. Readers never take
+    that lock: they keep serving the snapshot they already hold while a
+    write or reload is in flight.
+
+    Rows are read-only Reservation records. An update swaps in a new record
+    instead of modifying the old one, so rows can be handed out without
+    copying and a caller never sees a row change underneath it.
+    """
+
+    def __init__(self, csv_path: str, compact_threshold: int = JOURNAL_COMPACT_THRESHOLD):
+        self.csv_path = csv_path
+        self.journal_path = csv_path + ".journal"
+        self.lock_path = csv_path + ".lock"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._snapshot = _EMPTY
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    # ── loading ─────────────────────────────────────────────
+    def _file_signature(self) -> tuple:
+        st = os.stat(self.csv_path)  # Raises FileNotFoundError if missing
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _journal_stat(self) -> tuple:
+        """The journal's (inode, size), or (None, 0) if there is none."""
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def _load(self) -> None:
+        # A writer may replace the CSV and the journal between our two reads
+        # (the CSV first); if the CSV changed underneath us, read both again.
+        # Journal records replayed onto a CSV that already holds them are
+        # harmless, and the journal's new inode triggers the next reload.
+        for _ in range(5):
+            signature = self._file_signature()
+            with open(self.csv_path, mode="r", newline="", encoding="utf-8-sig") as f:
+                columns, rows = parse_reservations(f)
+            snapshot = _Snapshot(signature, columns, rows)
+            records, offset, inode = read_journal(self.journal_path, 0)
+            if self._file_signature() == signature:
+                break
+        self._apply(snapshot, records)
+        self._snapshot = snapshot
+        self._journal_inode = inode
+        self._journal_offset = offset
+        self._journal_records = len(records)
+
+    @staticmethod
+    def _apply(snapshot: _Snapshot, records: list) -> None:
+        """Applies journal records to `snapshot`."""
+        for record in records:
+            position = snapshot.by_rrn.get(record.get("rrn"))
+            if position is not None:
+                fields = {key: str(value) for key, value in record.get("fields", {}).items()}
+                snapshot.rows[position] = snapshot.rows[position].with_fields(fields)
+
+    def _is_current(self) -> bool:
+        return (self._snapshot.signature == self._file_signature()
+                and self._journal_stat() == (self._journal_inode, self._journal_offset))
+
+    def _refresh_locked(self) -> None:
+        """Brings the snapshot up to date. Caller holds self._lock."""
+        if self._file_signature() != self._snapshot.signature:
+            self._load()
+            return
+        records, offset, inode = read_journal(self.journal_path, self._journal_offset, self._journal_inode)
+        if inode != self._journal_inode:
+            # Compaction replaced the journal (and the CSV) since this snapshot
+            # was loaded: its records belong to the new CSV, not this one
+            self._load()
+            return
+        self._apply(self._snapshot, records)
+        self._journal_offset = offset
+        self._journal_records += len(records)
+
+    def _ensure_fresh(self) -> None:
+        """Reloads the CSV if it changed on disk and replays new journal records."""
+        if self._is_current():
+            return
+        # Block only when there is nothing to serve yet. Otherwise, if another
+        # thread is writing or reloading, keep serving the current snapshot.
+        if not self._lock.acquire(blocking=self._snapshot is _EMPTY):
+            return
+        try:
+            self._refresh_locked()
+        finally:
+            self._lock.release()
+
+    def invalidate(self) -> None:
+        """Forces the next access to re-read the file."""
+        with self._lock:
+            self._snapshot = _EMPTY
+            self._journal_inode = None
+            self._journal_offset = 0
+            self._journal_records = 0
+
+    # ── reads ───────────────────────────────────────────────
+    @property
+    def fieldnames(self) -> list:
+        self._ensure_fresh()
+        return self._snapshot.fieldnames
+
+    def get_by_rrn(self, rrn: str) -> Reservation | None:
+        self._ensure_fresh()
+        return self._snapshot.row_for(rrn)
+
+    def find(self, name: str, rrn: str) -> Reservation | None:
+        self._ensure_fresh()
+        snapshot = self._snapshot
+        position = snapshot.by_name_rrn.get((name, rrn))
+        return snapshot.rows[position] if position is not None else None
+
+    def all(self) -> list:
+        self._ensure_fresh()
+        return list(self._snapshot.rows)
+
+    def __len__(self) -> int:
+        self._ensure_fresh()
+        return len(self._snapshot.rows)
+
+    def signature(self) -> tuple:
+        """The CSV's (inode, mtime, size) and the journal inode and offset of the snapshot all() now serves."""
+        self._ensure_fresh()
+        with self._lock:
+            return self._snapshot.signature + (self._journal_inode, self._journal_offset)
+
+    def sample(self, rng, status: str | None = None, day: str | None = None) -> Reservation | None:
+        """
+        Random reservation. Once the file is loaded this picks from the cached
+        rows (O(1) without a filter). Before that, the file is streamed once
+        with a reservoir sample instead of being loaded just for this.
+        """
+        predicate = sample_filter(status, day)
+        if self._snapshot is _EMPTY:
+            return reservoir_sample(self._stream(), rng, predicate)
+        self._ensure_fresh()
+        rows = self._snapshot.rows
+        if predicate is None:
+            return rows[rng.randrange(len(rows))] if rows else None
+        return reservoir_sample(rows, rng, predicate)
+
+    def _stream(self):
+        """Yields rows straight from the file with pending journal records applied, without indexing."""
+        records, _, _ = read_journal(self.journal_path, 0)
+        pending = {}
+        for record in records:
+            pending.setdefault(record.get("rrn"), {}).update(
+                {key: str(value) for key, value in record.get("fields", {}).items()})
+        seen = set()
+        with open(self.csv_path, mode="r", newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            columns = tuple(next(reader, None) or ())
+            for values in reader:
+                if not values:
+                    continue
+                row = Reservation(columns, values)
+                rrn = row.get("rrn")
+                # Journal records apply to the first row of an RRN only
+                if rrn in pending and rrn not in seen:
+                    seen.add(rrn)
+                    row = row.with_fields(pending[rrn])
+                yield row
+
+    # ── writes ──────────────────────────────────────────────
+    def update(self, rrn: str, fields: dict, on_commit=None) -> bool:
+        """
+        Updates the first row with the given RRN by appending one record to
+        the journal. Keys that are not columns of the file are ignored.
+        Returns False if the RRN is not present.
+        """
+        return self.update_many({rrn: fields}, on_commit)[rrn]
+
+    def update_many(self, changes: dict, on_commit=None) -> dict:
+        """
+        Applies {rrn: fields} with a single journal append under one lock,
+        so a batch costs one write regardless of its size (plus at most one
+        compaction). Returns {rrn: True/False}. `on_commit` runs after the
+        append, still under the lock (see ReservationStore).
+        """
+        with self._lock, file_lock(self.lock_path):
+            self._refresh_locked()
+            snapshot = self._snapshot
+            results = {}
+            lines = []
+            applied = []
+            for rrn, fields in changes.items():
+                if rrn not in snapshot.by_rrn:
+                    results[rrn] = False
+                    continue
+                fields = {key: str(value) for key, value in fields.items() if key in snapshot.columns}
+                lines.append(json.dumps({"rrn": rrn, "fields": fields}, ensure_ascii=False) + "\n")
+                applied.append((rrn, fields, snapshot.row_for(rrn)))
+                results[rrn] = True
+            if lines:
+                append_bytes(self.journal_path, "".join(lines).encode("utf-8"))
+                # Pick up our own records (and any appended by other processes)
+                self._refresh_locked()
+                if on_commit is not None:
+                    on_commit(applied)
+                if self._journal_records >= self.compact_threshold:
+                    self._compact_locked()
+            return results
+
+    def append(self, row: dict, default_fieldnames: list, on_commit=None) -> None:
+        """
+        Appends a row to the file, creating it with `default_fieldnames`
+        as header if it does not exist yet. Existing files keep their own
+        header; values for unknown columns are dropped. `on_commit` runs
+        after the write, still under the lock (see ReservationStore).
+        """
+        with self._lock, file_lock(self.lock_path):
+            try:
+                self._refresh_locked()
+                fieldnames = self._snapshot.fieldnames
+                needs_header = os.path.getsize(self.csv_path) == 0
+            except FileNotFoundError:
+                fieldnames = []
+                needs_header = True
+            if needs_header or not fieldnames:
+                fieldnames = list(default_fieldnames)
+
+            buffer = io.StringIO(newline="")
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+            if needs_header:
+                writer.writeheader()
+            writer.writerow(row)
+            data = buffer.getvalue().encode("utf-8")
+
+            if needs_header:
+                atomic_write_bytes(self.csv_path, data)
+                self._load()
+            else:
+                # One O_APPEND write, then extend the snapshot in place
+                # instead of re-parsing the whole file
+                append_bytes(self.csv_path, data)
+                snapshot = self._snapshot
+                stored = Reservation(snapshot.columns, [str(row.get(key, "")) for key in snapshot.columns])
+                snapshot.rows.append(stored)
+                snapshot.index(stored, len(snapshot.rows) - 1)
+                self._snapshot.signature = self._file_signature()
+            if on_commit is not None:
+                on_commit([(row.get("rrn"), dict(row), None)])
+
+    def compact(self) -> None:
+        """Folds the journal into a new base CSV and starts a new, empty journal."""
+        with self._lock, file_lock(self.lock_path):
+            self._refresh_locked()
+            self._compact_locked()
+
+    def seal(self, finish=None) -> None:
+        """
+        Folds the journal into the CSV and deletes it, for a file that takes
+        no more writes. `finish()` (e.g. compressing the CSV) runs under the
+        same lock, so a writer in another process either commits before the
+        seal (and its change is folded in) or waits until the seal is done.
+        The lock file stays: other processes may be waiting on it.
+        """
+        with self._lock, file_lock(self.lock_path):
+            self._refresh_locked()
+            self._compact_locked()
+            try:
+                os.remove(self.journal_path)
+            except FileNotFoundError:
+                pass
+            self._journal_inode = None
+            if finish is not None:
+                finish()
+
+    def _compact_locked(self) -> None:
+        # The new CSV is swapped in atomically before the journal is
+        # replaced. Replaying a record twice is harmless, so a crash
+        # between the two steps loses nothing. The journal is replaced
+        # rather than truncated so that its inode changes: a reader still
+        # holding the old CSV and offset sees that and reloads, instead of
+        # reading the new journal from the middle.
+        snapshot = self._snapshot
+        buffer = io.StringIO(newline="")
+        writer = csv.writer(buffer)
+        writer.writerow(snapshot.columns)
+        writer.writerows([row[key] for key in snapshot.columns] for row in snapshot.rows)
+        atomic_write_bytes(self.csv_path, buffer.getvalue().encode("utf-8"))
+        atomic_write_bytes(self.journal_path, b"")
+        snapshot.signature = self._file_signature()
+        self._journal_inode = self._journal_stat()[0]
+        self._journal_offset = 0
+        self._journal_records = 0
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_reservation_repository(csv_path: str = RESV_CSV) -> ReservationRepository:
+    """
+    Returns the shared repository for `csv_path`, creating it on first use.
+    One instance per path keeps every service on the same cached copy.
+    """
+    csv_path = os.path.abspath(csv_path)
+    with _repositories_lock:
+        repo = _repositories.get(csv_path)
+        if repo is None:
+            repo = ReservationRepository(csv_path)
+            _repositories[csv_path] = repo
+        return repo
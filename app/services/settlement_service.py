@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+import sys # Added for logging
+from datetime import date, timedelta
+
+from app.services.reservation_repository import RESV_CSV
+from app.services.storage import get_payment_store, get_reservation_reader
+from app.utils.privacy import mask_rrn
+
+# Columns of a settlement export. Every record has a "record" type:
+#   payment            – one payment, joined with its reservation
+#   department_total / method_total – subtotal of one department / payment method
+#   total              – the whole day
+SETTLEMENT_FIELDS = [
+    "record", "payment_id", "timestamp", "patient_id", "department",
+    "prescription_names", "method", "status", "count", "amount"
+]
+
+
+class SettlementTotals:
+    """Per-department, per-method and overall counts and amounts, added up one payment at a time."""
+
+    def __init__(self):
+        self.by_department = {}
+        self.by_method = {}
+        self.count = 0
+        self.amount = 0
+
+    def add(self, row: dict) -> None:
+        amount = row["amount"]
+        for totals, key in ((self.by_department, row["department"]), (self.by_method, row["method"])):
+            count, subtotal = totals.get(key, (0, 0))
+            totals[key] = (count + 1, subtotal + amount)
+        self.count += 1
+        self.amount += amount
+
+    def records(self):
+        """Yields the subtotal records (sorted by department, then method) and the total."""
+        for record_type, field, totals in (("department_total", "department", self.by_department),
+                                           ("method_total", "method", self.by_method)):
+            for key in sorted(totals):
+                count, amount = totals[key]
+                yield {"record": record_type, field: key, "count": count, "amount": amount}
+        yield {"record": "total", "count": self.count, "amount": self.amount}
+
+
+def settlement_rows(day: str, totals: SettlementTotals | None = None):
+    """
+    Yields the payments of `day` (YYYY-MM-DD) in time order, each joined with
+    the department and prescriptions of the patient's reservation. Payments
+    are streamed from the payment store and looked up one at a time, so the
+    day is never held in memory; if `totals` is given, every row is added to it.
+    The patient's RRN is masked (mask_rrn): an export leaves the kiosk.
+    """
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.settlement_rows(args={{_func_args}})")
+    start = date.fromisoformat(day)
+    reservations = get_reservation_reader(RESV_CSV)
+    for payment in get_payment_store().iter_payments_between(start.isoformat(),
+                                                             (start + timedelta(days=1)).isoformat()):
+        reservation = reservations.get_by_rrn(payment["patient_id"]) or {}
+        # The prescriptions charged are in the ledger commit; the reservation may have changed since
+        committed = (payment.get("reservation") or {}).get("fields", {})
+        row = {
+            "record": "payment",
+            "payment_id": payment["payment_id"],
+            "timestamp": payment["timestamp"],
+            "patient_id": mask_rrn(payment["patient_id"]),
+            "department": reservation.get("department") or "",
+            "prescription_names": committed.get("prescription_names", reservation.get("prescription_names") or ""),
+            "method": payment["method"],
+            "status": payment["status"],
+            "count": 1,
+            "amount": int(payment["amount"]),
+        }
+        if totals is not None:
+            totals.add(row)
+        yield row
+
+
+def settlement_records(day: str):
+    """Yields the payment rows of `day` followed by their subtotals and total, in one pass."""
+    _func_args = locals()
+    _module_path = sys.modules[__name__].__name__ if __name__ in sys.modules else __file__
+    print(f"ENTERING: {_module_path}.settlement_records(args={{_func_args}})")
+    totals = SettlementTotals()
+    yield from settlement_rows(day, totals)
+    yield from totals.records()
+
+
+def export_csv(records):
+    """Yields `records` as CSV text (header first), one line per chunk."""
+    buffer = io.StringIO(newline="")
+    writer = csv.DictWriter(buffer, fieldnames=SETTLEMENT_FIELDS, restval="", extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()  # Header of an export without records
+
+
+def export_jsonl(records):
+    """Yields `records` as JSON Lines."""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+# format -> (exporter, content type)
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv; charset=utf-8"),
+    "jsonl": (export_jsonl, "application/x-ndjson; charset=utf-8"),
+}
@@ -0,0 +1,306 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from app.services.reservation_repository import ReservationRepository
+from app.services.storage import (DEFAULT_FIELDNAMES, DuplicatePaymentError, PaymentStore, Reservation,
+                                  ReservationStore)
+
+PAYMENT_FIELDNAMES = ["payment_id", "patient_id", "amount", "method", "status", "timestamp"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+    name               TEXT NOT NULL DEFAULT '',
+    rrn                TEXT NOT NULL DEFAULT '',
+    time               TEXT NOT NULL DEFAULT '',
+    department         TEXT NOT NULL DEFAULT '',
+    ticket_number      TEXT NOT NULL DEFAULT '',
+    location           TEXT NOT NULL DEFAULT '',
+    doctor             TEXT NOT NULL DEFAULT '',
+    status             TEXT NOT NULL DEFAULT '',
+    prescription_names TEXT NOT NULL DEFAULT '',
+    total_fee          TEXT NOT NULL DEFAULT '0'
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_rrn        ON reservations (rrn);
+CREATE INDEX IF NOT EXISTS idx_reservations_department ON reservations (department);
+CREATE INDEX IF NOT EXISTS idx_reservations_status     ON reservations (status);
+CREATE INDEX IF NOT EXISTS idx_reservations_time       ON reservations (time);
+
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    amount     INTEGER NOT NULL,
+    method     TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    timestamp  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payments_patient_id ON payments (patient_id);
+CREATE INDEX IF NOT EXISTS idx_payments_timestamp  ON payments (timestamp);
+
+CREATE TABLE IF NOT EXISTS payment_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    payment_id      TEXT NOT NULL
+);
+"""
+
+_FIELDS = tuple(DEFAULT_FIELDNAMES)
+_COLUMNS = ", ".join(DEFAULT_FIELDNAMES)
+_SELECT_BY_RRN = f"SELECT {_COLUMNS} FROM reservations WHERE rrn = ? ORDER BY id LIMIT 1"
+_SELECT_BY_NAME_RRN = f"SELECT {_COLUMNS} FROM reservations WHERE rrn = ? AND name = ? ORDER BY id LIMIT 1"
+_SELECT_ALL = f"SELECT {_COLUMNS} FROM reservations ORDER BY id"
+_INSERT_RESERVATION = f"INSERT INTO reservations ({_COLUMNS}) VALUES ({', '.join('?' for _ in DEFAULT_FIELDNAMES)})"
+_INSERT_PAYMENT = (
+    f"INSERT INTO payments ({', '.join(PAYMENT_FIELDNAMES)}) "
+    f"VALUES ({', '.join('?' for _ in PAYMENT_FIELDNAMES)})"
+)
+_SELECT_PAYMENT = f"SELECT {', '.join(PAYMENT_FIELDNAMES)} FROM payments WHERE payment_id = ?"
+_SELECT_KEY_PAYMENT = (
+    f"SELECT {', '.join('p.' + field for field in PAYMENT_FIELDNAMES)} FROM payment_keys k "
+    f"JOIN payments p ON p.payment_id = k.payment_id WHERE k.idempotency_key = ?"
+)
+_SELECT_PATIENT_PAYMENTS = (
+    f"SELECT {', '.join(PAYMENT_FIELDNAMES)} FROM payments WHERE patient_id = ? ORDER BY timestamp, payment_id"
+)
+_SELECT_PAYMENTS_BETWEEN = (
+    f"SELECT {', '.join(PAYMENT_FIELDNAMES)} FROM payments "
+    f"WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, payment_id"
+)
+
+
+class SqliteStore(ReservationStore, PaymentStore):
+    """
+    Reservation and payment store backed by one SQLite file.
+
+    The database runs in WAL mode so any number of readers (threads or
+    worker processes) proceed while a single writer commits. Each thread
+    gets its own connection; all queries use `?` placeholders so sqlite3's
+    per-connection statement cache reuses the prepared statements.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, cached_statements=128)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write_transaction(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT: the write lock is taken up front, so rows
+        read inside (the previous state for on_commit) cannot change before
+        the update. Rolled back if the block raises.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    @contextmanager
+    def _read_transaction(self):
+        """BEGIN ... COMMIT around several reads, so they all see one snapshot of the database."""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            yield conn
+
+    def _previous(self, conn, rrn: str) -> Reservation | None:
+        return self._to_record(conn.execute(_SELECT_BY_RRN, (rrn,)).fetchone())
+
+    @staticmethod
+    def _to_record(row) -> Reservation | None:
+        return Reservation(_FIELDS, row) if row is not None else None
+
+    # ── ReservationStore ────────────────────────────────────
+    @property
+    def fieldnames(self) -> list:
+        return list(DEFAULT_FIELDNAMES)
+
+    def get_by_rrn(self, rrn: str) -> Reservation | None:
+        return self._to_record(self._connect().execute(_SELECT_BY_RRN, (rrn,)).fetchone())
+
+    def find(self, name: str, rrn: str) -> Reservation | None:
+        return self._to_record(self._connect().execute(_SELECT_BY_NAME_RRN, (rrn, name)).fetchone())
+
+    def all(self) -> list:
+        return [self._to_record(row) for row in self._connect().execute(_SELECT_ALL)]
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM reservations").fetchone()[0]
+
+    def signature(self) -> tuple:
+        """(mtime, size) of the database file and of its WAL, where every commit is written first."""
+        parts = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                parts.append(None)
+                continue
+            parts.append((st.st_mtime_ns, st.st_size))
+        return tuple(parts)
+
+    def sample(self, rng, status: str | None = None, day: str | None = None) -> Reservation | None:
+        """
+        Random reservation: a COUNT and one OFFSET query, filtered through the
+        status and time indexes, in one read transaction so a write between
+        the two cannot move the offset past the end.
+        """
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if day is not None:
+            # A range on `time` (prefix `day`) can use its index; LIKE cannot
+            conditions.append("time >= ? AND time < ?")
+            params.extend([day, day + "\uffff"])
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._read_transaction() as conn:
+            count = conn.execute(f"SELECT COUNT(*) FROM reservations{where}", params).fetchone()[0]
+            if not count:
+                return None
+            sql = f"SELECT {_COLUMNS} FROM reservations{where} ORDER BY id LIMIT 1 OFFSET ?"
+            return self._to_record(conn.execute(sql, params + [rng.randrange(count)]).fetchone())
+
+    def update(self, rrn: str, fields: dict, on_commit=None) -> bool:
+        return self.update_many({rrn: fields}, on_commit)[rrn]
+
+    def update_many(self, changes: dict, on_commit=None) -> dict:
+        """
+        Applies every change inside one transaction. Returns {rrn: True/False}.
+        `on_commit` runs inside the transaction; if it raises, nothing is written.
+        """
+        results = {}
+        applied = []
+        with self._write_transaction() as conn:
+            for rrn, fields in changes.items():
+                previous = self._previous(conn, rrn)
+                results[rrn] = previous is not None
+                if previous is None:
+                    continue
+                # Column names come from the fixed schema, never from user input
+                columns = [key for key in fields if key in DEFAULT_FIELDNAMES]
+                if columns:
+                    assignments = ", ".join(f"{column} = ?" for column in columns)
+                    sql = (
+                        f"UPDATE reservations SET {assignments} "
+                        "WHERE id = (SELECT id FROM reservations WHERE rrn = ? ORDER BY id LIMIT 1)"
+                    )
+                    conn.execute(sql, [str(fields[column]) for column in columns] + [rrn])
+                applied.append((rrn, {column: str(fields[column]) for column in columns}, previous))
+            if on_commit is not None and applied:
+                on_commit(applied)
+        return results
+
+    def append(self, row: dict, default_fieldnames: list = DEFAULT_FIELDNAMES, on_commit=None) -> None:
+        with self._write_transaction() as conn:
+            conn.execute(_INSERT_RESERVATION, [str(row.get(key, "")) for key in DEFAULT_FIELDNAMES])
+            if on_commit is not None:
+                on_commit([(row.get("rrn"), dict(row), None)])
+
+    # ── PaymentStore ────────────────────────────────────────
+    def _insert_payment(self, conn, record: dict) -> None:
+        """Inserts the payment and its idempotency key; the caller's transaction holds the write lock."""
+        key = record.get("idempotency_key")
+        if key:
+            row = conn.execute("SELECT payment_id FROM payment_keys WHERE idempotency_key = ?", (key,)).fetchone()
+            if row is not None:
+                raise DuplicatePaymentError(row[0])
+            conn.execute("INSERT INTO payment_keys (idempotency_key, payment_id) VALUES (?, ?)",
+                         (key, record["payment_id"]))
+        conn.execute(_INSERT_PAYMENT, [record[field] for field in PAYMENT_FIELDNAMES])
+
+    def add_payment(self, record: dict) -> None:
+        with self._write_transaction() as conn:
+            self._insert_payment(conn, record)
+
+    def commit_payment(self, record: dict, reservations: ReservationStore, rrn: str, fields: dict,
+                       on_commit=None) -> bool:
+        """Inserts the payment and updates the reservation in one transaction (one commit)."""
+        if reservations is not self:
+            return super().commit_payment(record, reservations, rrn, fields, on_commit)
+        columns = [key for key in fields if key in DEFAULT_FIELDNAMES]
+        with self._write_transaction() as conn:
+            row = conn.execute("SELECT id FROM reservations WHERE rrn = ? ORDER BY id LIMIT 1", (rrn,)).fetchone()
+            if row is None:
+                return False
+            previous = self._previous(conn, rrn)
+            if columns:
+                assignments = ", ".join(f"{column} = ?" for column in columns)
+                conn.execute(f"UPDATE reservations SET {assignments} WHERE id = ?",
+                             [str(fields[column]) for column in columns] + [row[0]])
+            self._insert_payment(conn, record)
+            if on_commit is not None:
+                on_commit([(rrn, {column: str(fields[column]) for column in columns}, previous)])
+        return True
+
+    def get_payment(self, payment_id: str) -> dict | None:
+        row = self._connect().execute(_SELECT_PAYMENT, (payment_id,)).fetchone()
+        return dict(zip(PAYMENT_FIELDNAMES, row)) if row is not None else None
+
+    def payment_for_key(self, idempotency_key: str) -> dict | None:
+        row = self._connect().execute(_SELECT_KEY_PAYMENT, (idempotency_key,)).fetchone()
+        return dict(zip(PAYMENT_FIELDNAMES, row)) if row is not None else None
+
+    def payments_for_patient(self, patient_id: str) -> list:
+        rows = self._connect().execute(_SELECT_PATIENT_PAYMENTS, (patient_id,))
+        return [dict(zip(PAYMENT_FIELDNAMES, row)) for row in rows]
+
+    def payments_between(self, start: str, end: str) -> list:
+        rows = self._connect().execute(_SELECT_PAYMENTS_BETWEEN, (start, end))
+        return [dict(zip(PAYMENT_FIELDNAMES, row)) for row in rows]
+
+    def iter_payments_between(self, start: str, end: str):
+        for row in self._connect().execute(_SELECT_PAYMENTS_BETWEEN, (start, end)):
+            yield dict(zip(PAYMENT_FIELDNAMES, row))
+
+    # ── maintenance ─────────────────────────────────────────
+    def import_rows(self, rows, replace: bool = False) -> int:
+        """Bulk-inserts reservation dicts in one transaction. Returns the row count."""
+        conn = self._connect()
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM reservations")
+            cursor = conn.executemany(
+                _INSERT_RESERVATION,
+                ([str(row.get(key) or "") for key in DEFAULT_FIELDNAMES] for row in rows),
+            )
+        return cursor.rowcount
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_sqlite_store(db_path: str) -> SqliteStore:
+    """Returns the shared store for `db_path`, creating the schema on first use."""
+    db_path = os.path.abspath(db_path)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = SqliteStore(db_path)
+            _stores[db_path] = store
+        return store
+
+
+def import_reservations_csv(csv_path: str, db_path: str, replace: bool = False) -> int:
+    """
+    One-shot import of reservations.csv (including any pending journal
+    records) into the SQLite database. With `replace=True` existing
+    reservations are deleted first. Returns the number of imported rows.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    rows = ReservationRepository(csv_path).all()
+    return get_sqlite_store(db_path).import_rows(rows, replace=replace)
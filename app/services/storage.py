@@ -0,0 +1,320 @@
+"""
+Storage backends for reservations and payments.
+
+Services never open data files directly; they ask this module for a store:
+
+  • get_reservation_store(csv_path) → object implementing ReservationStore
+  • get_payment_store()              → object implementing PaymentStore
+  • get_reservation_reader(csv_path) → read-only lookups (get_by_rrn / find)
+
+The backend is selected with the KIOSK_STORAGE_BACKEND environment variable:
+
+  • "csv"    (default) – data/reservations.csv through ReservationRepository,
+                         payments in the append-only ledger KIOSK_PAYMENT_LEDGER
+  • "sqlite"           – one SQLite database file (KIOSK_SQLITE_DB) in WAL
+                         mode, shared safely by several worker processes
+  • "partitioned"      – one CSV per appointment day under
+                         KIOSK_PARTITION_DIR; days before today are sealed
+                         read-only (gzipped if KIOSK_PARTITION_COMPRESS=1)
+
+With the CSV backend, KIOSK_RESERVATION_LOOKUP="mmap" makes the read-only
+lookup paths use a memory-mapped byte-offset index instead of the fully
+parsed in-memory copy (see reservation_index.py).
+"""
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+SQLITE_DB = os.getenv("KIOSK_SQLITE_DB", os.path.join(BASE_DIR, "data", "kiosk.sqlite3"))
+STORAGE_BACKEND = os.getenv("KIOSK_STORAGE_BACKEND", "csv").strip().lower()
+RESERVATION_LOOKUP = os.getenv("KIOSK_RESERVATION_LOOKUP", "memory").strip().lower()
+PARTITION_DIR = os.getenv("KIOSK_PARTITION_DIR", os.path.join(BASE_DIR, "data", "reservations"))
+PARTITION_COMPRESS = os.getenv("KIOSK_PARTITION_COMPRESS", "0").strip().lower() in ("1", "true", "yes")
+PARTITION_LOOKBACK_DAYS = int(os.getenv("KIOSK_PARTITION_LOOKBACK_DAYS", "30"))
+PAYMENT_LEDGER = os.getenv("KIOSK_PAYMENT_LEDGER", os.path.join(BASE_DIR, "data", "payments.jsonl"))
+
+# Columns of a reservation record, in file order for newly created files
+DEFAULT_FIELDNAMES = [
+    "name", "rrn", "time", "department", "ticket_number",
+    "location", "doctor", "status", "prescription_names", "total_fee"
+]
+
+_DEFAULT_COLUMNS = tuple(DEFAULT_FIELDNAMES)
+
+
+class Reservation(tuple, Mapping):
+    """
+    One reservation row, stored as a tuple.
+
+    The tuple holds the cell values in file column order followed by the
+    file's header tuple, which is one object shared by every row of that
+    file. Compared with a csv.DictReader dict per row, that drops the
+    per-row hash table and key references, and the row is built by
+    tuple.__new__ in C. Keys (and their order) are exactly the columns of
+    the file, like DictReader; columns beyond DEFAULT_FIELDNAMES are kept.
+
+    Records are read-only Mappings: `row["status"]`, `row.get("status")`,
+    `row.status` and `dict(row)` all work, and a record compares equal to a
+    dict with the same items. Use `with_fields()` to get a changed copy and
+    `to_dict()` where a real dict is needed (templates, JSON).
+    """
+
+    __slots__ = ()
+    __hash__ = None
+    __eq__ = Mapping.__eq__
+
+    def __new__(cls, columns: tuple = _DEFAULT_COLUMNS, values=()):
+        # Like csv.DictReader: missing trailing values are None, surplus values are dropped
+        values = list(values)
+        if len(values) != len(columns):
+            values = (values + [None] * len(columns))[:len(columns)]
+        values.append(columns)
+        return tuple.__new__(cls, values)
+
+    @classmethod
+    def from_mapping(cls, row, columns: tuple = _DEFAULT_COLUMNS, default=""):
+        """Builds a record with `columns` from any mapping; absent keys get `default`."""
+        return cls(columns, [row.get(key, default) for key in columns])
+
+    @property
+    def columns(self) -> tuple:
+        return tuple.__getitem__(self, -1)
+
+    def __getitem__(self, key):
+        try:
+            return tuple.__getitem__(self, tuple.__getitem__(self, -1).index(key))
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return iter(tuple.__getitem__(self, -1))
+
+    def __len__(self) -> int:
+        return len(tuple.__getitem__(self, -1))
+
+    def __contains__(self, key) -> bool:
+        return key in tuple.__getitem__(self, -1)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __reduce__(self):
+        return (Reservation, (self.columns, tuple.__getitem__(self, slice(0, -1))))
+
+    def __repr__(self) -> str:
+        return f"Reservation({self.to_dict()!r})"
+
+    def with_fields(self, fields: dict):
+        """Returns a copy with `fields` replaced. Keys that are not columns of this row are ignored."""
+        columns = self.columns
+        values = [fields[key] if key in fields else value
+                  for key, value in zip(columns, tuple.__getitem__(self, slice(0, -1)))]
+        return Reservation(columns, values)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self.columns, tuple.__getitem__(self, slice(0, -1))))
+
+
+def reservoir_sample(rows, rng, predicate=None):
+    """
+    One uniformly random item of `rows` (matching `predicate`, if given),
+    chosen in a single pass with O(1) extra memory. None if nothing matches.
+    """
+    chosen = None
+    seen = 0
+    for row in rows:
+        if predicate is not None and not predicate(row):
+            continue
+        seen += 1
+        if rng.randrange(seen) == 0:
+            chosen = row
+    return chosen
+
+
+def sample_filter(status: str | None = None, day: str | None = None):
+    """Predicate for sample(): optional exact `status` and `time` starting with `day` (YYYY-MM-DD)."""
+    if status is None and day is None:
+        return None
+
+    def matches(row) -> bool:
+        if status is not None and row.get("status") != status:
+            return False
+        return day is None or str(row.get("time") or "").startswith(day)
+    return matches
+
+
+class ReservationStore(ABC):
+    """
+    Interface shared by every reservation backend. Rows are Reservation records.
+
+    Write methods take an optional `on_commit(applied)` callback, called
+    with the store's write lock held (inside the transaction for SQLite)
+    right after the write, with one (rrn, fields written, previous row or
+    None) tuple per changed reservation. The change log is appended there,
+    so its order is the commit order; an exception from the callback
+    propagates to the caller.
+    """
+
+    @property
+    @abstractmethod
+    def fieldnames(self) -> list:
+        """Columns that can be read and updated."""
+
+    @abstractmethod
+    def get_by_rrn(self, rrn: str) -> Reservation | None:
+        """First reservation with this RRN, or None."""
+
+    @abstractmethod
+    def find(self, name: str, rrn: str) -> Reservation | None:
+        """First reservation matching both name and RRN, or None."""
+
+    @abstractmethod
+    def all(self) -> list:
+        """Every reservation, in insertion order."""
+
+    def update(self, rrn: str, fields: dict, on_commit=None) -> bool:
+        """Updates the first reservation with this RRN. False if not found."""
+        return self.update_many({rrn: fields}, on_commit)[rrn]
+
+    @abstractmethod
+    def update_many(self, changes: dict, on_commit=None) -> dict:
+        """
+        Applies {rrn: fields} in one write pass.
+        Returns {rrn: True/False} telling which RRNs were found and updated.
+        """
+
+    @abstractmethod
+    def append(self, row: dict, default_fieldnames: list, on_commit=None) -> None:
+        """Adds a new reservation."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of reservations."""
+
+    def signature(self) -> tuple | None:
+        """
+        Value that changes whenever the stored reservations change, whoever
+        wrote them, for caches built from all(). None if the backend cannot
+        tell; such a cache must then be rebuilt on every use.
+        """
+        return None
+
+    def sample(self, rng, status: str | None = None, day: str | None = None) -> Reservation | None:
+        """
+        One random reservation, optionally only those with `status` and an
+        appointment on `day` (YYYY-MM-DD). None if nothing matches.
+        Backends override this to avoid materialising every row.
+        """
+        return reservoir_sample(self.all(), rng, sample_filter(status, day))
+
+
+class DuplicatePaymentError(Exception):
+    """Raised when a payment with the record's idempotency_key is already stored; `payment_id` is that payment."""
+
+    def __init__(self, payment_id: str):
+        super().__init__(f"idempotency key already used by payment {payment_id}")
+        self.payment_id = payment_id
+
+
+class PaymentStore(ABC):
+    """
+    Interface shared by every payment backend.
+
+    A record may carry an "idempotency_key". It is stored in the same write
+    as the payment, so every worker process sees it: writing a second
+    payment with a stored key raises DuplicatePaymentError and stores nothing.
+    """
+
+    @abstractmethod
+    def add_payment(self, record: dict) -> None:
+        """
+        Stores a payment record (keys: payment_id, patient_id, amount, method,
+        status, timestamp; optionally idempotency_key).
+        """
+
+    @abstractmethod
+    def get_payment(self, payment_id: str) -> dict | None:
+        """Payment record for this id, or None."""
+
+    @abstractmethod
+    def payment_for_key(self, idempotency_key: str) -> dict | None:
+        """Payment stored with this idempotency_key, or None."""
+
+    @abstractmethod
+    def payments_for_patient(self, patient_id: str) -> list:
+        """Payments of one patient, oldest first."""
+
+    @abstractmethod
+    def payments_between(self, start: str, end: str) -> list:
+        """Payments with start <= timestamp < end (ISO 8601 strings), oldest first."""
+
+    def iter_payments_between(self, start: str, end: str):
+        """Like payments_between, but yields the records one at a time. Backends override this to stream."""
+        return iter(self.payments_between(start, end))
+
+    def commit_payment(self, record: dict, reservations: ReservationStore, rrn: str, fields: dict,
+                       on_commit=None) -> bool:
+        """
+        Stores a payment together with the update `fields` of the reservation
+        with this RRN. False, with nothing stored, if there is no such
+        reservation; DuplicatePaymentError if the record's idempotency_key is
+        taken. `on_commit` is passed to the reservation update.
+        Backends override this to make the two one write.
+        """
+        if reservations.get_by_rrn(rrn) is None:
+            return False
+        self.add_payment(record)
+        return reservations.update(rrn, fields, on_commit)
+
+
+def get_reservation_store(csv_path: str) -> ReservationStore:
+    """
+    Returns the reservation store for the configured backend.
+    `csv_path` is only used by the CSV backend.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from app.services.sqlite_store import get_sqlite_store
+        return get_sqlite_store(SQLITE_DB)
+    if STORAGE_BACKEND == "partitioned":
+        from app.services.partitioned_store import get_partitioned_store
+        return get_partitioned_store(PARTITION_DIR, compress=PARTITION_COMPRESS,
+                                     lookback_days=PARTITION_LOOKBACK_DAYS)
+    from app.services.reservation_repository import get_reservation_repository
+    return get_reservation_repository(csv_path)
+
+
+def get_reservation_reader(csv_path: str):
+    """
+    Returns an object with get_by_rrn / find for read-only lookups.
+    Same as get_reservation_store unless the mmap lookup mode is enabled.
+    """
+    if STORAGE_BACKEND == "csv" and RESERVATION_LOOKUP == "mmap":
+        from app.services.reservation_index import get_mmap_index
+        return get_mmap_index(csv_path)
+    return get_reservation_store(csv_path)
+
+
+def get_payment_store() -> PaymentStore:
+    """
+    Returns the payment store for the configured backend: the SQLite
+    database, or the payment ledger file for the file-based backends.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from app.services.sqlite_store import get_sqlite_store
+        return get_sqlite_store(SQLITE_DB)
+    from app.services.payment_ledger import get_payment_ledger
+    return get_payment_ledger(PAYMENT_LEDGER)
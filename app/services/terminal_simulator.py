@@ -0,0 +1,121 @@
+"""
+Local stand-in for a card terminal, speaking the protocol of
+payment_gateway.TerminalGateway, with configurable latency and faults:
+
+  python -m app.cli terminal-simulator --port 9100 --latency 0.3 --failure-rate 0.05
+  KIOSK_PAYMENT_GATEWAY=terminal KIOSK_TERMINAL_ADDR=127.0.0.1:9100 python run.py
+"""
+import asyncio
+import json
+import random
+import threading
+import uuid
+
+
+class TerminalSimulator:
+    """
+    asyncio TCP server answering authorization requests after `latency`
+    ± `jitter` seconds. With probability `failure_rate` it drops the
+    connection instead of answering (a network or terminal fault) and with
+    probability `decline_rate` it declines. Answers are remembered per
+    payment_id, so a retried request gets the first answer, like a real
+    terminal. A void is always accepted: the payment_id (in `voided`) is
+    declined with reason "voided" from then on, even if its authorization
+    arrives later. `seed` makes the fault sequence reproducible.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2, jitter: float = 0.0,
+                 failure_rate: float = 0.0, decline_rate: float = 0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self.requests = 0
+        self.connections = 0
+        self._rng = random.Random(seed)
+        self.voided = set()
+        self._answers = {}
+        self._writers = set()
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def _handle(self, reader, writer) -> None:
+        self._writers.add(writer)
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.requests += 1
+                request = json.loads(line)
+                delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+                await asyncio.sleep(delay)
+                if self._rng.random() < self.failure_rate:
+                    break  # Drop the connection without an answer
+                writer.write((json.dumps(self._answer(request)) + "\n").encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _answer(self, request: dict) -> dict:
+        payment_id = request.get("payment_id")
+        if request.get("op") == "void":
+            self.voided.add(payment_id)
+            self._answers[payment_id] = {"payment_id": payment_id, "approved": False, "reason": "voided"}
+            return {"payment_id": payment_id, "voided": True}
+        answer = self._answers.get(payment_id)
+        if answer is None:
+            if self._rng.random() < self.decline_rate:
+                answer = {"payment_id": payment_id, "approved": False, "reason": "declined"}
+            else:
+                answer = {"payment_id": payment_id, "approved": True, "auth_code": uuid.uuid4().hex[:8].upper()}
+            self._answers[payment_id] = answer
+        return answer
+
+    async def start(self) -> None:
+        """Starts listening; with port 0 the chosen port is in `self.port`."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    # ── background thread (tests, benchmarks) ───────────────
+    def start_in_thread(self) -> "TerminalSimulator":
+        """Runs the server on its own event loop in a daemon thread. Returns self."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="terminal-simulator", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.start(), self._loop).result()
+        return self
+
+    def stop(self) -> None:
+        """Stops a server started with start_in_thread()."""
+        async def _stop():
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()  # Pooled client connections would otherwise keep it open
+            await self._server.wait_closed()
+            handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in handlers:
+                task.cancel()  # Handlers still sleeping on an answer
+            await asyncio.gather(*handlers, return_exceptions=True)
+        asyncio.run_coroutine_threadsafe(_stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start_in_thread()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
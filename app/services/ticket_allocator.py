@@ -0,0 +1,80 @@
+import os
+import threading
+from datetime import date
+
+from app.utils.daily_log import DailyEventLog
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+TICKET_DIR = os.getenv("KIOSK_TICKET_DIR", os.path.join(BASE_DIR, "data", "tickets"))
+# fsync every issued ticket (survives power loss, costs a disk flush per ticket)
+TICKET_FSYNC = os.getenv("KIOSK_TICKET_FSYNC", "0").strip().lower() in ("1", "true", "yes")
+
+
+def format_ticket(department: str, number: int) -> str:
+    """Display form of a ticket, e.g. 내과-007."""
+    return f"{department}-{number:03d}"
+
+
+def parse_ticket(ticket: str) -> tuple:
+    """(department, number) of a ticket made by format_ticket. Raises ValueError otherwise."""
+    department, _, number = str(ticket).rpartition("-")
+    if not department or not number.isdigit():
+        raise ValueError(f"Not a queue ticket: {ticket!r}")
+    return department, int(number)
+
+
+class TicketAllocator:
+    """
+    Per-department queue numbers that count up from 1 each day.
+
+    Every issued number is recorded as one `department<TAB>number` line in a
+    DailyEventLog (`<dir>/YYYY-MM-DD.log`). The log is the persisted state:
+    after a restart the day's counters are rebuilt from it, and a new day
+    starts a new file, which is the daily reset.
+
+    Issuing holds the log's fcntl lock (and a thread lock), catches up on
+    lines other processes appended since the last call, then appends its own
+    line. Counters stay in memory between calls, so an issue is a lock, one
+    small read and one small write: no parsing of the whole log and, unless
+    `fsync` is set, no disk flush.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False, today=date.today):
+        self.directory = directory
+        self._counters = {}
+        self._log = DailyEventLog(directory, self._apply, self._counters.clear, today=today, fsync=fsync)
+
+    def _apply(self, fields: list) -> None:
+        if len(fields) != 2 or not fields[1].isdigit():
+            return
+        department, number = fields[0], int(fields[1])
+        if number > self._counters.get(department, 0):
+            self._counters[department] = number
+
+    def issue(self, department: str) -> str:
+        """Returns the next ticket for `department` today, e.g. 내과-001."""
+        department = " ".join(str(department).split()) or "X"  # No tabs/newlines in the log
+
+        def build():
+            number = self._counters.get(department, 0) + 1
+            return [[department, number]], number
+
+        return format_ticket(department, self._log.record(build))
+
+    def last_issued(self, department: str) -> int:
+        """Highest number issued today for `department` (0 if none)."""
+        self._log.refresh()
+        return self._counters.get(department, 0)
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_ticket_allocator() -> TicketAllocator:
+    """Returns the process-wide allocator for TICKET_DIR."""
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None or _allocator.directory != TICKET_DIR:
+            _allocator = TicketAllocator(TICKET_DIR, fsync=TICKET_FSYNC)
+        return _allocator
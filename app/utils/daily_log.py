@@ -0,0 +1,88 @@
+import os
+import threading
+from datetime import date
+
+from app.utils.file_lock import append_bytes, file_lock
+
+
+class DailyEventLog:
+    """
+    Append-only event log that starts a new file every day, shared by all
+    worker processes: `<dir>/YYYY-MM-DD.log`, one tab-separated event per line.
+
+    Each process keeps its own state in memory and folds every event into it
+    through `apply(fields)`; `reset()` is called when the day changes. Under
+    an fcntl lock on `<dir>/YYYY-MM-DD.lock`, `record()` first applies the
+    events other processes appended since the last call, then builds its own
+    events from the now current state, appends them with one write, and
+    applies them. So every process sees the same sequence of events without
+    re-reading the whole file, and the log doubles as the state persisted
+    across restarts.
+    """
+
+    def __init__(self, directory: str, apply, reset, today=date.today, fsync: bool = False):
+        self.directory = directory
+        self.fsync = fsync
+        self._apply = apply
+        self._reset = reset
+        self._today = today
+        self._lock = threading.RLock()
+        self._day = None
+        self._offset = 0
+
+    def _paths(self, day: date) -> tuple:
+        stem = os.path.join(self.directory, day.isoformat())
+        return stem + ".log", stem + ".lock"
+
+    def _current_day_locked(self) -> tuple:
+        day = self._today()
+        if day != self._day:
+            os.makedirs(self.directory, exist_ok=True)
+            self._day, self._offset = day, 0
+            self._reset()
+        return self._paths(day)
+
+    def _catch_up_locked(self, log_path: str) -> None:
+        try:
+            with open(log_path, mode="rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # We hold the lock, so a line without newline was left by a writer
+            # that died mid-append. Terminate it so the next line starts cleanly.
+            append_bytes(log_path, b"\n")
+            data += b"\n"
+            end = len(data)
+        for line in data[:end].decode("utf-8", errors="replace").splitlines():
+            if line:
+                self._apply(line.split("\t"))
+        self._offset += end
+
+    def record(self, build):
+        """
+        Appends the events returned by `build()` (a list of field lists, may be
+        empty) and returns `build`'s second return value. `build` runs with
+        the state caught up and the lock held, so it can decide from the
+        latest state; its events are applied before `record` returns.
+        """
+        with self._lock:
+            log_path, lock_path = self._current_day_locked()
+            with file_lock(lock_path):
+                self._catch_up_locked(log_path)
+                events, result = build()
+                if events:
+                    lines = "".join(
+                        "\t".join(" ".join(str(field).split()) for field in event) + "\n" for event in events
+                    ).encode("utf-8")
+                    append_bytes(log_path, lines, fsync=self.fsync)
+                    self._offset += len(lines)
+                    for event in events:
+                        self._apply([" ".join(str(field).split()) for field in event])
+            return result
+
+    def refresh(self) -> None:
+        """Applies events appended by other processes since the last call."""
+        self.record(lambda: ([], None))
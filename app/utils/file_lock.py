@@ -0,0 +1,65 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, callers still hold their thread locks
+    fcntl = None
+
+
+@contextmanager
+def file_lock(lock_path: str, shared: bool = False):
+    """
+    Holds an advisory fcntl lock on `lock_path` for the duration of the block.
+
+    The lock is taken on a separate `<file>.lock` file rather than on the data
+    file itself, so the data file can be replaced with os.replace while the
+    lock is held. flock locks conflict between separate open() calls, so the
+    same helper serialises threads of one process as well as processes.
+    """
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """
+    Replaces `path` with `data` so that readers see either the old or the new
+    file, never a partial one: write a temp file in the same directory, fsync
+    it, then os.replace it over the target.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def append_bytes(path: str, data: bytes, fsync: bool = False) -> None:
+    """
+    Appends `data` with a single O_APPEND write so concurrent appenders never
+    interleave. With `fsync=True` the write is flushed to disk before returning.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+        if fsync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -1,6 +1,14 @@
-from fpdf import FPDF
+from fpdf import FPDF, XPos, YPos
+from fpdf.fonts import SubsetMap
+from fontTools import ttLib
+import copy
+import hashlib
+import io
+import json
 import os
-from datetime import datetime
+import string
+import threading
+from datetime import datetime, timezone
 
 
 class MissingKoreanFontError(FileNotFoundError):
@@ -22,12 +30,56 @@ FONT_DIR = os.path.abspath(
 )
 os.makedirs(FONT_DIR, exist_ok=True)  # Ensure the directory exists
 KOREAN_FONT_PATH = os.path.join(FONT_DIR, "NanumSquareNeo-bRg.ttf")
+KOREAN_FONT_FAMILY = "NanumSquareNeo"
+
+# Parsed fonts, shared by every PDF: font path -> (file bytes, TTFFont template)
+_font_cache = {}
+_font_cache_lock = threading.Lock()
+
+
+def _font_template(path):
+    """
+    Font file bytes and an fpdf TTFFont parsed from them once per process.
+    Parsing (cmap, widths and glyph ids of every character) is most of the
+    cost of a certificate, so later PDFs only copy the result.
+    """
+    with _font_cache_lock:
+        cached = _font_cache.get(path)
+        if cached is None:
+            with open(path, "rb") as f:
+                data = f.read()
+            pdf = FPDF()
+            pdf.add_font(KOREAN_FONT_FAMILY, "", path)
+            cached = (data, pdf.fonts[KOREAN_FONT_FAMILY.lower()])
+            _font_cache[path] = cached
+        return cached
+
+
+def _attach_font(pdf_instance, path):
+    """Adds the cached font at `path` to a new PDF, as add_font() would."""
+    font = copy.copy(_font_template(path)[1])  # Metrics, cmap and glyph ids are read-only and shared
+    font.i = len(pdf_instance.fonts) + 1
+    _fresh_tables(font)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font.subset = SubsetMap(font)
+    pdf_instance.fonts[KOREAN_FONT_FAMILY.lower()] = font
+
+
+def warm_up_fonts() -> bool:
+    """Parses the Korean font ahead of the first PDF (app startup). Returns False if it is missing."""
+    if not os.path.exists(KOREAN_FONT_PATH):
+        print(f"Warning: Korean font not found at {KOREAN_FONT_PATH}; PDFs cannot be generated.")
+        return False
+    _font_template(KOREAN_FONT_PATH)
+    return True
+
 
 def _add_korean_font(pdf_instance):
     """Helper to add NanumSquareNeo font to the PDF instance."""
     if os.path.exists(KOREAN_FONT_PATH):
-        pdf_instance.add_font("NanumSquareNeo", "", KOREAN_FONT_PATH, uni=True)
-        pdf_instance.set_font("NanumSquareNeo", size=12)
+        _attach_font(pdf_instance, KOREAN_FONT_PATH)
+        pdf_instance.set_font(KOREAN_FONT_FAMILY, size=12)
         return True
     raise MissingKoreanFontError(
         (
@@ -37,108 +89,238 @@ def _add_korean_font(pdf_instance):
         )
     )
 
-def create_prescription_pdf_bytes(patient_name, patient_rrn, department, prescriptions, total_fee, doctor_name, issue_date):
-    pdf = FPDF()
-    pdf.add_page()
-    _add_korean_font(pdf)
-
-    # Title
-    pdf.set_font_size(20)
-    pdf.cell(0, 15, txt="처방전 (Prescription)", ln=True, align="C")
-    pdf.ln(5)
-
-    # Header Information
-    pdf.set_font_size(12)
-    # current_date = datetime.now().strftime("%Y-%m-%d") # Removed
-    pdf.cell(0, 7, txt=f"발행일: {issue_date}", ln=True, align="R") # Use issue_date parameter
-    pdf.cell(0, 7, txt="기관명: 중앙대 보건소", ln=True)
-    pdf.cell(0, 7, txt=f"환자 성명: {patient_name}", ln=True)
-    pdf.cell(0, 7, txt=f"주민등록번호: {patient_rrn}", ln=True)
-    pdf.cell(0, 7, txt=f"진료과: {department}", ln=True)
-    pdf.ln(5)
-
-    # Prescriptions Table Header
-    pdf.set_font_size(14)
-    pdf.cell(0, 10, txt="처방내역", ln=True)
-    pdf.set_font_size(11) # Slightly smaller for table content
-    pdf.cell(130, 10, txt="처방명 (항목)", border=1)
-    pdf.cell(50, 10, txt="금액 (원)", border=1, ln=True, align="R")
-
-    # Prescriptions Table Rows
-    if prescriptions:
-        for item in prescriptions:
-            # Ensure text fits, potentially use multi_cell if names are very long
-            pdf.cell(130, 10, txt=str(item.get("name", "N/A")), border=1)
-            pdf.cell(50, 10, txt=f"{item.get('fee', 0):,.0f}", border=1, ln=True, align="R")
-    else:
-        pdf.cell(180, 10, txt="처방 내역이 없습니다.", border=1, ln=True, align="C")
-
-    # Total Fee
-    pdf.set_font_size(12)
-    pdf.cell(130, 10, txt="총계 (Total Fee)", border=1, align="R")
-    pdf.cell(50, 10, txt=f"{total_fee:,.0f}", border=1, ln=True, align="R")
-    pdf.ln(10)
-
-    # Footer/Notes
-    pdf.set_font_size(10)
-    pdf.multi_cell(0, 7, txt=f"위와 같이 처방합니다.\n\n\n의사명: {doctor_name} (서명/날인)") # Use doctor_name parameter
-    pdf.ln(5)
-    pdf.cell(0, 7, txt="* 이 처방전은 발행일로부터 7일간 유효합니다.", ln=True)
+def _fresh_tables(font):
+    """
+    Gives a copied font its own TTFont over the cached font bytes. Output
+    subsets the font tables in place, so no two PDFs may share them (lazy:
+    tables are only read from the bytes when subsetting).
+    """
+    data = _font_template(str(font.ttffile))[0]
+    font.ttfont = ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False, lazy=True)
 
 
+def _pdf_bytes(pdf):
     pdf_bytes = pdf.output(dest="S")
     if isinstance(pdf_bytes, str):
         return pdf_bytes.encode("latin-1")
     return bytes(pdf_bytes)
 
+
+# ── Certificate templates ─────────────────────────────────────
+# Certificate layouts are data: LAYOUT_DIR/<document type>.<lang>.json holds
+# the page as a list of elements laid out top to bottom. Texts are
+# str.format templates over the fields passed to render_certificate().
+#   {"type": "text", "text", "h", "size", "align", "border"}   one full-width line
+#   {"type": "row", "cells": [{"w", "text", "align"}], "h", "size", "border"}
+#   {"type": "space", "h"}                                       vertical gap
+#   {"type": "paragraph", "text", "h", "size", "height"}        wrapped text; with
+#        "height" it fills a fixed box, so the layout below it does not move
+#   {"type": "table", "rows": <field>, "columns": [{"header", "w", "text",
+#        "default", "align"}], "h", "size", "empty"}             bordered table over a
+#        list of dicts; column texts are formatted with each row dict
+# "size" (font size) carries over to the following elements.
+LAYOUT_DIR = os.path.join(os.path.dirname(__file__), "certificate_layouts")
+DEFAULT_LANG = "ko"
+
+_NEXT_LINE = {"new_x": XPos.LMARGIN, "new_y": YPos.NEXT}
+_SAME_LINE = {"new_x": XPos.RIGHT, "new_y": YPos.TOP}
+
+
+class _RowFields(dict):
+    """A table row's fields; missing ones format as the column default."""
+
+    def __init__(self, row, default):
+        super().__init__(row)
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+
+def _has_fields(text):
+    return any(field is not None for _, field, _, _ in string.Formatter().parse(text))
+
+
+class CertificateTemplate:
+    """
+    A certificate layout compiled for repeated rendering.
+
+    Everything whose position does not depend on the data - the static text
+    and borders down to the first element of variable height (a table, or a
+    paragraph with fields and no fixed "height") - is laid out once into a
+    prototype page. Each render copies that page (the parsed font is shared,
+    not copied), stamps the field texts at their recorded positions and
+    lays out only the rest of the page.
+    """
+
+    def __init__(self, layout: dict, fingerprint: str = ""):
+        self.title = layout.get("title", "")
+        self.fingerprint = fingerprint  # Hash of the layout file: part of certificate cache keys
+        self.elements = []
+        size = layout.get("size", 12)
+        for element in layout["elements"]:
+            size = element.get("size", size)
+            self.elements.append(dict(element, size=size))
+        self._prototype, self._stamps, self._resume = self._compile()
+
+    # ── drawing ─────────────────────────────────────────────
+    def _cell_text(self, pdf, text, fields, stamps, w, h, align):
+        """The text to draw now; in compile mode field texts are recorded as stamps and drawn empty."""
+        if stamps is not None and _has_fields(text):
+            stamps.append(("cell", pdf.get_x(), pdf.get_y(), w, h, text, align, pdf.font_size_pt))
+            return ""
+        return text.format_map(fields)
+
+    def _draw(self, pdf, element, fields, stamps=None, rows_only=False):
+        pdf.set_font_size(element["size"])
+        kind = element["type"]
+        if kind == "space":
+            pdf.ln(element["h"])
+        elif kind in ("text", "row"):
+            cells = element.get("cells") or [{"w": 0, "text": element["text"], "align": element.get("align", "L")}]
+            for i, cell in enumerate(cells):
+                w, align = cell.get("w", 0), cell.get("align", "L")
+                text = self._cell_text(pdf, cell["text"], fields, stamps, w, element["h"], align)
+                pdf.cell(w, element["h"], text=text, border=element.get("border", 0), align=align,
+                         **(_NEXT_LINE if i == len(cells) - 1 else _SAME_LINE))
+        elif kind == "paragraph":
+            x, y = pdf.get_x(), pdf.get_y()
+            if stamps is not None and _has_fields(element["text"]):
+                stamps.append(("paragraph", x, y, 0, element["h"], element["text"], "L", pdf.font_size_pt))
+            else:
+                pdf.multi_cell(0, element["h"], text=element["text"].format_map(fields), **_NEXT_LINE)
+            if "height" in element:
+                pdf.set_xy(pdf.l_margin, y + element["height"])
+        elif kind == "table":
+            columns = element["columns"]
+            last = len(columns) - 1
+            if not rows_only:
+                for i, column in enumerate(columns):
+                    pdf.cell(column["w"], element["h"], text=column["header"], border=1,
+                             align=column.get("align", "L"), **(_NEXT_LINE if i == last else _SAME_LINE))
+            if stamps is not None:
+                return
+            rows = fields.get(element["rows"]) or []
+            for row in rows:
+                for i, column in enumerate(columns):
+                    text = column["text"].format_map(_RowFields(row, column.get("default", "")))
+                    pdf.cell(column["w"], element["h"], text=text, border=1,
+                             align=column.get("align", "L"), **(_NEXT_LINE if i == last else _SAME_LINE))
+            if not rows:
+                pdf.cell(sum(column["w"] for column in columns), element["h"], text=element.get("empty", ""),
+                         border=1, align="C", **_NEXT_LINE)
+        else:
+            raise ValueError(f"Unknown certificate layout element: {kind!r}")
+
+    def _compile(self):
+        """Lays out the static part once. Returns (prototype FPDF, stamps, resume point)."""
+        pdf = FPDF()
+        pdf.add_page()
+        _add_korean_font(pdf)
+        stamps = []
+        for index, element in enumerate(self.elements):
+            if element["type"] == "table":
+                self._draw(pdf, element, {}, stamps)  # Header only
+                return pdf, stamps, (index, True, pdf.get_x(), pdf.get_y())
+            if element["type"] == "paragraph" and "height" not in element and _has_fields(element["text"]):
+                return pdf, stamps, (index, False, pdf.get_x(), pdf.get_y())
+            self._draw(pdf, element, {}, stamps)
+        return pdf, stamps, (len(self.elements), False, pdf.get_x(), pdf.get_y())
+
+    def render(self, fields: dict) -> bytes:
+        """The certificate for `fields` as PDF bytes."""
+        prototype_font = next(iter(self._prototype.fonts.values()))
+        # Metrics and glyph ids are read-only: share them instead of deep-copying ~12k entries each
+        memo = {id(prototype_font.cw): prototype_font.cw, id(prototype_font.glyph_ids): prototype_font.glyph_ids}
+        pdf = copy.deepcopy(self._prototype, memo)
+        for font in pdf.fonts.values():
+            _fresh_tables(font)
+        pdf.set_creation_date(datetime.now(timezone.utc))
+        for kind, x, y, w, h, text, align, size in self._stamps:
+            pdf.set_font_size(size)
+            pdf.set_xy(x, y)
+            if kind == "cell":
+                pdf.cell(w, h, text=text.format_map(fields), align=align)
+            else:
+                pdf.multi_cell(w, h, text=text.format_map(fields))
+        index, rows_only, x, y = self._resume
+        pdf.set_xy(x, y)
+        for element in self.elements[index:]:
+            self._draw(pdf, element, fields, rows_only=rows_only)
+            rows_only = False
+        return _pdf_bytes(pdf)
+
+
+_templates = {}  # layout path -> CertificateTemplate
+_templates_lock = threading.Lock()
+
+
+def _layout_path(doc_type: str, lang: str) -> str:
+    """LAYOUT_DIR/<doc_type>.<lang>.json, or the Korean layout if there is none in `lang`."""
+    if not doc_type.replace("_", "").isalnum():
+        raise ValueError(f"Invalid certificate type: {doc_type!r}")
+    for candidate in (lang, DEFAULT_LANG):
+        path = os.path.join(LAYOUT_DIR, f"{doc_type}.{candidate}.json")
+        if os.path.exists(path):
+            return path
+    raise ValueError(f"No certificate layout for {doc_type!r}")
+
+
+def layout_fingerprint(doc_type: str, lang: str = DEFAULT_LANG) -> str:
+    """SHA-256 of the layout file used for `doc_type` in `lang` (without compiling it)."""
+    with open(_layout_path(doc_type, lang), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_certificate_template(doc_type: str, lang: str = DEFAULT_LANG) -> CertificateTemplate:
+    """
+    The compiled template of a document type ("prescription", "confirmation",
+    or any other layout file in LAYOUT_DIR) in `lang`, falling back to the
+    Korean layout. Each layout is compiled once per process.
+    """
+    path = _layout_path(doc_type, lang)
+    with _templates_lock:
+        template = _templates.get(path)
+        if template is None:
+            with open(path, "rb") as f:
+                raw = f.read()
+            template = CertificateTemplate(json.loads(raw.decode("utf-8")), hashlib.sha256(raw).hexdigest())
+            _templates[path] = template
+        return template
+
+
+def render_certificate(doc_type: str, fields: dict, lang: str = DEFAULT_LANG) -> bytes:
+    """Renders a certificate of `doc_type` with `fields` and returns the PDF bytes."""
+    return get_certificate_template(doc_type, lang).render(fields)
+
+
+def create_prescription_pdf_bytes(patient_name, patient_rrn, department, prescriptions, total_fee, doctor_name,
+                                  issue_date, lang=DEFAULT_LANG):
+    """Create a prescription PDF and return its bytes."""
+    return render_certificate("prescription", {
+        "patient_name": patient_name,
+        "patient_rrn": patient_rrn,
+        "department": department,
+        "prescriptions": prescriptions,
+        "total_fee": total_fee,
+        "doctor_name": doctor_name,
+        "issue_date": issue_date,
+    }, lang)
+
+
 def create_confirmation_pdf_bytes(
     patient_name,
     patient_rrn,
     disease_name,
     date_of_diagnosis,
     date_of_issue,
+    lang=DEFAULT_LANG,
 ):
     """Create a medical confirmation PDF and return its bytes."""
-    pdf = FPDF()
-    pdf.add_page()
-    _add_korean_font(pdf)
-
-    # Title
-    pdf.set_font_size(20)
-    pdf.cell(0, 15, txt="진료확인서 (Medical Confirmation)", ln=True, align="C")
-    pdf.ln(5)
-
-    # Information
-    pdf.set_font_size(12)
-    pdf.cell(0, 7, txt=f"발행일: {date_of_issue}", ln=True, align="R")
-    pdf.cell(0, 7, txt="기관명: 중앙대 보건소", ln=True)
-    pdf.cell(0, 7, txt=f"환자 성명: {patient_name}", ln=True)
-    pdf.cell(0, 7, txt=f"주민등록번호: {patient_rrn}", ln=True)
-    pdf.cell(0, 7, txt=f"진단명 (병명): {disease_name}", ln=True)
-    pdf.ln(10)
-
-    # Confirmation Statement
-    # Using a more detailed confirmation text
-    confirmation_text = (
-        f"상기 환자는 위와 같은 진단명으로 {date_of_diagnosis} 본원에서 진료를 받았음을 확인합니다.\n\n"
-        "This is to confirm that the patient named above received medical treatment at our clinic "
-        f"on {date_of_diagnosis} for the diagnosis mentioned.\n\n"
-        "진료의견: 안정가료 및 처방약 복용 요망.\n"
-        "(Medical Opinion: Rest and medication as prescribed.)"
-    )
-    pdf.multi_cell(0, 7, txt=confirmation_text)
-    pdf.ln(15)
-
-    # Doctor's Confirmation
-    pdf.set_font_size(12)
-    pdf.cell(0, 10, txt="담당의사: 김중앙 (Dr. Kim, Joongang)", ln=True, align="R")
-    pdf.cell(0, 10, txt="중앙대학교 보건소 (CAU Health Center)", ln=True, align="R")
-    pdf.ln(5)
-    # Placeholder for stamp/signature image if available
-    # pdf.image("path/to/stamp.png", x=pdf.get_x() + 120, y=pdf.get_y() -10, w=30)
-
-
-    pdf_bytes = pdf.output(dest="S")
-    if isinstance(pdf_bytes, str):
-        return pdf_bytes.encode("latin-1")
-    return bytes(pdf_bytes)
+    return render_certificate("confirmation", {
+        "patient_name": patient_name,
+        "patient_rrn": patient_rrn,
+        "disease_name": disease_name,
+        "date_of_diagnosis": date_of_diagnosis,
+        "date_of_issue": date_of_issue,
+    }, lang)
@@ -0,0 +1,11 @@
+def mask_rrn(rrn: str) -> str:
+    """
+    Resident registration number with everything after the birth date and
+    the gender digit hidden ("850101-1234567" → "850101-1******"), for
+    exports and logs that must not identify a patient on their own.
+    """
+    rrn = (rrn or "").strip()
+    birth, dash, rest = rrn.partition("-")
+    if not dash:
+        return rrn[:7] + "*" * max(0, len(rrn) - 7)
+    return f"{birth}-{rest[:1]}{'*' * max(0, len(rest) - 1)}"
@@ -0,0 +1,49 @@
+"""
+Access control for staff-only endpoints (/admin/*, /api/changes and the
+queue desk actions).
+
+With KIOSK_STAFF_TOKEN set, a request must carry it as
+"Authorization: Bearer <token>" or in an "X-Staff-Token" header. Without a
+token, only requests from the kiosk machine itself (loopback) are allowed;
+behind a reverse proxy every request looks local, so set a token there.
+"""
+import hmac
+import ipaddress
+import os
+from functools import wraps
+
+from flask import jsonify, request
+
+STAFF_TOKEN = os.getenv("KIOSK_STAFF_TOKEN", "")
+
+
+def _presented_token() -> str:
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        return authorization[len("Bearer "):].strip()
+    return request.headers.get("X-Staff-Token", "")
+
+
+def is_staff_request() -> bool:
+    """True if the current request may use staff endpoints."""
+    if STAFF_TOKEN:
+        return hmac.compare_digest(_presented_token().encode("utf-8"), STAFF_TOKEN.encode("utf-8"))
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+def require_staff():
+    """before_request hook of staff-only blueprints: a 401 response unless is_staff_request()."""
+    if not is_staff_request():
+        return jsonify({"error": "staff authorization required"}), 401
+    return None
+
+
+def staff_required(view):
+    """Decorator for single staff-only routes of an otherwise public blueprint."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return require_staff() or view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,65 @@
+"""
+Certificate PDF latency at each stage of pdf_generator's caching:
+
+  no caches             - fpdf2 add_font() parses the Korean TTF and the
+                          template is compiled for every PDF
+  cached font           - the parsed font is shared, the template still
+                          compiled for every PDF
+  compiled template     - the static layout is reused and only the fields,
+                          the table rows and what follows them are laid out
+
+Usage:
+    python -m benchmarks.pdf_generation [ROUNDS]    (default 20)
+
+Reports the median and p95 of create_prescription_pdf_bytes and
+create_confirmation_pdf_bytes, after warm_up_fonts() as at app startup.
+"""
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+from app.utils import pdf_generator
+
+PRESCRIPTION = ("홍길동", "900101-1234567", "내과",
+                [{"name": "감기약 처방", "fee": 5000}, {"name": "소화제 처방", "fee": 6000}],
+                11000, "김의사", "2025-06-19")
+CONFIRMATION = ("홍길동", "900101-1234567", "감기", "2025-06-18", "2025-06-19")
+
+
+def parse_every_time(pdf_instance):
+    """_add_korean_font without the font cache: add_font() parses the TTF."""
+    pdf_instance.add_font(pdf_generator.KOREAN_FONT_FAMILY, "", pdf_generator.KOREAN_FONT_PATH)
+    pdf_instance.set_font(pdf_generator.KOREAN_FONT_FAMILY, size=12)
+
+
+def measure(fn, args, rounds: int, recompile: bool) -> list:
+    seconds = []
+    for _ in range(rounds):
+        if recompile:
+            pdf_generator._templates.clear()  # Lay out the whole page again
+        start = time.perf_counter()
+        fn(*args)
+        seconds.append(time.perf_counter() - start)
+    return sorted(seconds)
+
+
+def report(label: str, seconds: list) -> None:
+    p95 = seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))]
+    print(f"  {label:44s} median {statistics.median(seconds) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms")
+
+
+def main(rounds: int = 20) -> None:
+    pdf_generator.warm_up_fonts()
+    print(f"{rounds} PDFs each")
+    for name, fn, args in (("prescription", pdf_generator.create_prescription_pdf_bytes, PRESCRIPTION),
+                           ("confirmation", pdf_generator.create_confirmation_pdf_bytes, CONFIRMATION)):
+        with patch.object(pdf_generator, "_add_korean_font", parse_every_time):
+            report(f"{name}, no caches", measure(fn, args, rounds, recompile=True))
+        report(f"{name}, cached font, compiled per PDF", measure(fn, args, rounds, recompile=True))
+        fn(*args)
+        report(f"{name}, compiled template", measure(fn, args, rounds, recompile=False))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,80 @@
+"""
+What certificate rendering does to the rest of a threaded web worker:
+
+  in request threads  - RenderPool(workers=0): fpdf2 holds the GIL
+  render pool         - RenderPool(workers=N): PDFs built in worker processes
+
+Usage:
+    python -m benchmarks.render_pool [PDFS] [WORKERS]    (default 24, 2)
+
+Four threads issue PDFS prescriptions between them while a fifth thread,
+standing in for the other requests of the process, wakes up every 5 ms.
+Reports the PDF throughput and how late that thread woke up (median, p99,
+max) — the stall every other request sees while PDFs render.
+"""
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.render_pool import RenderPool
+from app.utils.pdf_generator import create_prescription_pdf_bytes
+
+CALLERS = 4
+TICK = 0.005
+
+
+def prescription(i: int) -> dict:
+    return {
+        "patient_name": f"환자{i}", "patient_rrn": "900101-1234567", "department": "내과",
+        "prescriptions": [{"name": "감기약 처방", "fee": 5000}, {"name": "소화제 처방", "fee": 6000}],
+        "total_fee": 11000, "doctor_name": "김의사", "issue_date": "2025-06-19",
+    }
+
+
+def measure(pool: RenderPool, pdfs: int) -> tuple:
+    """(seconds for all PDFs, lateness of every tick in ms)"""
+    lateness = []
+    done = threading.Event()
+
+    def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            time.sleep(TICK)
+            lateness.append((time.perf_counter() - start - TICK) * 1000)
+
+    thread = threading.Thread(target=ticker)
+    thread.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CALLERS) as callers:
+        list(callers.map(lambda i: pool.run(create_prescription_pdf_bytes, **prescription(i)), range(pdfs)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    thread.join()
+    return elapsed, lateness
+
+
+def report(label: str, pdfs: int, elapsed: float, lateness: list) -> None:
+    lateness = sorted(lateness)
+    p99 = lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))]
+    print(f"{label:<22} {pdfs / elapsed:6.1f} PDF/s   other thread late by "
+          f"median {statistics.median(lateness):6.2f} ms, p99 {p99:6.2f} ms, max {lateness[-1]:6.2f} ms")
+
+
+def main(pdfs: int = 24, workers: int = 2) -> None:
+    print(f"{pdfs} prescriptions from {CALLERS} threads")
+    in_thread = RenderPool(workers=0)
+    in_thread.warm_up()
+    in_thread.run(create_prescription_pdf_bytes, **prescription(-1))
+    report("in request threads", pdfs, *measure(in_thread, pdfs))
+
+    pool = RenderPool(workers=workers, max_pending=pdfs, timeout=60)
+    for i in range(workers * 2):
+        pool.run(create_prescription_pdf_bytes, **prescription(-1))  # Start the workers, compile the template
+    report(f"render pool ({workers} proc)", pdfs, *measure(pool, pdfs))
+    pool.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,85 @@
+"""
+Revenue per department, average total_fee and status mix: a loop over
+csv.DictReader rows vs ReservationFrame (NumPy columns + bincount).
+
+Usage:
+    python -m benchmarks.reservation_analytics [ROWS]    (default 1000000)
+
+Generates a synthetic month of reservations (a few departments and statuses,
+paid rows with a total_fee) in a temp directory. The loop aggregates straight
+from DictReader; the frame is built from the parsed Reservation records the
+repository keeps in memory, so "load" is the column extraction and
+"aggregate" is the vectorized group-by on its own.
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.services.analytics_service import ReservationFrame
+from app.services.reservation_repository import parse_reservations
+
+COLUMNS = ["name", "rrn", "time", "department", "location", "doctor", "status", "prescription_names", "total_fee"]
+DEPARTMENTS = ["내과", "외과", "소아과", "이비인후과", "피부과", "정형외과", "안과"]
+STATUSES = ["Pending", "Registered", "Paid", "Cancelled"]
+
+
+def write_sample(path: str, rows: int) -> None:
+    rng = random.Random(7)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            status = rng.choice(STATUSES)
+            writer.writerow([
+                f"환자{i:07d}", f"{rng.randint(500101, 991231)}-{i:07d}",
+                f"2025-06-{1 + i % 30:02d} {8 + i % 10:02d}:{(i * 7) % 60:02d}",
+                rng.choice(DEPARTMENTS), "본관1층", "닥터김", status, "",
+                str(rng.randrange(5000, 60000, 1000)) if status == "Paid" else "0",
+            ])
+
+
+def aggregate_loop(path: str) -> tuple:
+    revenue, mix = {}, {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            department = row["department"]
+            statuses = mix.setdefault(department, {})
+            statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+            if row["status"] == "Paid":
+                count, total = revenue.get(department, (0, 0))
+                revenue[department] = (count + 1, total + int(row["total_fee"]))
+    return revenue, mix
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(rows: int = 1_000_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "reservations.csv")
+        write_sample(path, rows)
+        print(f"{rows} rows, {os.path.getsize(path) / 1e6:.1f} MB on disk")
+
+        (loop_revenue, loop_mix), loop_seconds = timed(aggregate_loop, path)
+        print(f"  DictReader loop       {loop_seconds * 1000:8.1f} ms  (parse + aggregate)")
+
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            records = parse_reservations(f)[1]
+        frame, load_seconds = timed(ReservationFrame, records)
+        aggregate_seconds = float("inf")
+        for _ in range(5):
+            (revenue, mix), seconds = timed(lambda: (frame.revenue_by_department(), frame.status_mix()))
+            aggregate_seconds = min(aggregate_seconds, seconds)
+        assert revenue == loop_revenue and mix == loop_mix
+        print(f"  ReservationFrame load {load_seconds * 1000:8.1f} ms  (columns from parsed records)")
+        print(f"  ReservationFrame agg  {aggregate_seconds * 1000:8.1f} ms  (revenue + status mix)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,80 @@
+"""
+Memory per row and parse time: csv.DictReader dicts vs Reservation records.
+
+Usage:
+    python -m benchmarks.reservation_records [ROWS]    (default 100000)
+
+Generates a synthetic reservations.csv with realistic cardinality (a few
+departments/doctors/statuses, unique names and RRNs) in a temp directory,
+then parses it both ways. Memory is the tracemalloc peak of the parsed
+list, divided by the row count.
+"""
+import csv
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.services.reservation_repository import parse_reservations
+
+COLUMNS = ["name", "rrn", "time", "department", "location", "doctor", "status", "prescription_names", "total_fee"]
+DEPARTMENTS = [("내과", "본관1층", "닥터김"), ("외과", "별관2층", "닥터박"), ("소아과", "본관2층", "닥터이"),
+               ("이비인후과", "본관3층", "닥터최"), ("피부과", "별관1층", "닥터정")]
+STATUSES = ["Pending", "Registered", "Paid"]
+
+
+def write_sample(path: str, rows: int) -> None:
+    rng = random.Random(7)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            department, location, doctor = rng.choice(DEPARTMENTS)
+            writer.writerow([
+                f"환자{i:06d}", f"{rng.randint(500101, 991231)}-{i:07d}",
+                f"2025-06-19 {8 + i % 10:02d}:{(i * 7) % 60:02d}",
+                department, location, doctor, rng.choice(STATUSES), "", "0",
+            ])
+
+
+def parse_dict_reader(path: str) -> list:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def parse_records(path: str) -> list:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return parse_reservations(f)[1]
+
+
+def measure(parse, path: str, rows: int) -> tuple:
+    best = float("inf")
+    for _ in range(5):
+        gc.collect()
+        start = time.perf_counter()
+        parse(path)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    result = parse(path)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(result) == rows
+    return best, current / rows
+
+
+def main(rows: int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "reservations.csv")
+        write_sample(path, rows)
+        print(f"{rows} rows, {os.path.getsize(path) / 1e6:.1f} MB on disk")
+        for label, parse in (("csv.DictReader", parse_dict_reader), ("Reservation", parse_records)):
+            seconds, per_row = measure(parse, path, rows)
+            print(f"  {label:<15} parse {seconds * 1000:7.1f} ms   {per_row:6.0f} bytes/row")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -1,6 +1,16 @@
+import os
+
 from app import create_app
 
-app = create_app()
+DEBUG = True
+
+# debug=True이면 werkzeug 리로더가 이 파일을 두 번 실행함: 서버를 재시작만 하는 감시 프로세스
+# (WERKZEUG_RUN_MAIN 없음)와 실제 서버. PDF 워커는 실제 서버에서만 띄움
+_reloader_watcher = __name__ == "__main__" and DEBUG and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+
+# PDF 렌더링 워커(spawn)는 이 파일을 __mp_main__으로 다시 import하므로, 그때는 앱을 만들지 않음
+if __name__ != "__mp_main__":
+    app = create_app(warm_up=not _reloader_watcher)
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    app.run(debug=DEBUG, port=5001)
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.analytics_service import ReservationFrame, get_reservation_frame, get_revenue_summary
+from app.services.reservation_repository import get_reservation_repository
+from app.services.storage import Reservation
+
+MOCK_RESERVATIONS_CSV_DATA = """name,rrn,time,department,location,doctor,status,prescription_names,total_fee
+김예약,850101-1234567,2025-06-19 08:20,내과,본관1층,닥터김,Paid,감기약 처방,5000
+박테스트,920202-2345678,2025-06-19 09:00,외과,별관2층,닥터박,Paid,물리치료,20000
+이환자,930303-3456789,2025-06-20 10:00,내과,본관1층,닥터김,Paid,소화제 처방,7000
+최대기,940404-4567890,2025-06-20 11:00,내과,본관1층,닥터김,Registered,,0
+정오류,950505-5678901,2025-06-21 12:00,외과,별관2층,닥터박,Paid,,not-a-number
+"""
+
+
+class TestAnalyticsService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        for target, value in (('app.services.analytics_service.RESV_CSV', self.csv_path),
+                              ('app.services.change_log.CHANGE_LOG', os.path.join(self.tmp_dir, "changes.jsonl"))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        self.frame = ReservationFrame(get_reservation_repository(self.csv_path).all())
+
+    def test_revenue_by_department(self):
+        self.assertEqual(self.frame.revenue_by_department(), {"내과": (2, 12000), "외과": (2, 20000)})
+        self.assertEqual(self.frame.revenue_by_department(start="2025-06-20", end="2025-06-21"), {"내과": (1, 7000)})
+        self.assertEqual(self.frame.revenue_by_department("Cancelled"), {})
+        self.assertEqual(self.frame.revenue_by_department(None, end="2025-06-20"), {"내과": (1, 5000), "외과": (1, 20000)})
+
+    def test_status_mix(self):
+        self.assertEqual(self.frame.status_mix(), {"내과": {"Paid": 2, "Registered": 1}, "외과": {"Paid": 2}})
+        self.assertEqual(self.frame.status_mix(start="2025-06-21"), {"외과": {"Paid": 1}})
+
+    def test_rows_with_different_headers(self):
+        short = ("department", "status", "total_fee")
+        rows = [Reservation(short, ["내과", "Paid", "1000"]),
+                Reservation(("status", "department"), ["Paid", "외과"])]
+        frame = ReservationFrame(rows)
+        self.assertEqual(frame.revenue_by_department(), {"내과": (1, 1000), "외과": (1, 0)})
+        self.assertEqual(len(ReservationFrame([])), 0)
+
+    def test_summary_is_rebuilt_only_after_changes(self):
+        summary = get_revenue_summary()
+        self.assertEqual((summary["paid"], summary["revenue"], summary["average_fee"]), (4, 32000, 8000))
+        self.assertEqual(summary["departments"]["내과"], {"paid": 2, "revenue": 12000, "average_fee": 6000})
+        frame = get_reservation_frame()
+        self.assertIs(get_reservation_frame(), frame)
+        # Written without a change-log entry (as another process or a manual fix would)
+        get_reservation_repository(self.csv_path).update("940404-4567890", {"status": "Paid", "total_fee": "3000"})
+        frame = get_reservation_frame()
+        self.assertEqual(get_revenue_summary("2025-06-20", "2025-06-21")["departments"],
+                         {"내과": {"paid": 2, "revenue": 10000, "average_fee": 5000}})
+        self.assertIs(get_reservation_frame(), frame)
+        # The CSV replaced by hand with the same number of rows
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA.replace("Paid", "Cancelled"))
+        self.assertIsNot(get_reservation_frame(), frame)
+        self.assertEqual(get_revenue_summary()["paid"], 1)  # Only the journaled update is still Paid
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from unittest.mock import patch
+
+from app.services import certificate_cache
+from app.services.certificate_cache import CertificateCache, certificate_key
+
+
+class TestCertificateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+
+    def test_key_depends_on_content_only(self):
+        fields = {"patient_rrn": "850101-1234567", "prescriptions": [{"name": "감기약 처방", "fee": 5000}]}
+        reordered = {"prescriptions": [{"fee": 5000, "name": "감기약 처방"}], "patient_rrn": "850101-1234567"}
+        self.assertEqual(certificate_key("prescription", fields), certificate_key("prescription", reordered))
+        self.assertNotEqual(certificate_key("prescription", fields), certificate_key("confirmation", fields))
+        self.assertNotEqual(certificate_key("prescription", fields, "v1"), certificate_key("prescription", fields, "v2"))
+        # Keyed: without the install's secret a name cannot be matched to an RRN
+        self.assertNotEqual(certificate_key("prescription", fields, secret=b"a"),
+                            certificate_key("prescription", fields, secret=b"b"))
+
+    def test_secret_is_created_once_per_install(self):
+        with patch.object(certificate_cache, 'CERTIFICATE_CACHE_DIR', self.tmp_dir), \
+                patch.object(certificate_cache, 'CERTIFICATE_CACHE_SECRET', ""), \
+                patch.object(certificate_cache, '_secret', None):
+            secret = certificate_cache.cache_secret()
+            path = os.path.join(self.tmp_dir, certificate_cache.SECRET_FILE_NAME)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+            certificate_cache._secret = None  # Another worker process
+            self.assertEqual(certificate_cache.cache_secret(), secret)
+
+    def test_get_or_render_renders_once(self):
+        cache = CertificateCache(self.tmp_dir)
+        renders = []
+        render = lambda: renders.append(1) or b"%PDF-1"
+        self.assertEqual(cache.get_or_render("k", render), b"%PDF-1")
+        self.assertEqual(cache.get_or_render("k", render), b"%PDF-1")
+        self.assertEqual(len(renders), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_memory_tier_is_a_size_bounded_lru_over_disk(self):
+        cache = CertificateCache(self.tmp_dir, memory_bytes=10)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+        cache.get("a")               # b is now least recently used
+        cache.put("c", b"cccc")      # 12 bytes: b leaves memory
+        self.assertEqual(list(cache._memory), ["a", "c"])
+        self.assertEqual(cache.get("b"), b"bbbb")  # Still on disk
+        # Another worker (or a restart) finds the PDFs on disk
+        self.assertEqual(CertificateCache(self.tmp_dir).get("c"), b"cccc")
+        self.assertIsNone(CertificateCache(self.tmp_dir).get("d"))
+
+    def test_disk_tier_drops_oldest(self):
+        cache = CertificateCache(self.tmp_dir, memory_bytes=0, disk_bytes=25)
+        for number, key in enumerate("abc"):
+            cache.put(key, key.encode() * 10)
+            os.utime(cache._path(key), (time.time() - 100 + number, time.time() - 100 + number))
+        cache.get("a")  # A hit does not make a file younger
+        cache._trim_disk()
+        # 30 bytes > 25: the oldest files go until at most 90% is left
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["b.pdf", "c.pdf"])
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), b"b" * 10)
+
+    def test_disk_entries_expire(self):
+        cache = CertificateCache(self.tmp_dir, memory_bytes=0, max_age=3600)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+        old = time.time() - 7200
+        os.utime(cache._path("a"), (old, old))
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(os.path.exists(cache._path("a")))
+        os.utime(cache._path("b"), (old, old))
+        cache._next_sweep = 0        # max_age / 24 later
+        cache.put("c", b"cccc")      # The sweep deletes expired files nobody asked for
+        self.assertEqual(os.listdir(self.tmp_dir), ["c.pdf"])
+
+    def test_memory_only(self):
+        cache = CertificateCache(None)
+        cache.put("a", b"aaaa")
+        self.assertEqual(cache.get("a"), b"aaaa")
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@ import unittest
 from unittest.mock import patch, mock_open, MagicMock
 import os
 import csv
+import shutil
+import tempfile
 from io import BytesIO
 from datetime import datetime
 
@@ -17,6 +19,8 @@ from app.services.certificate_service import (
     prepare_medical_confirmation_pdf,
     MissingKoreanFontError # Assuming this is also in certificate_service or utils
 )
+from app.services.certificate_cache import CertificateCache
+from app.services.render_pool import RenderPool
 # If MissingKoreanFontError is in utils, the import path needs to be correct.
 # For now, assuming it's accessible or defined in certificate_service for simplicity of this example.
 
@@ -44,6 +48,17 @@ class TestCertificateService(unittest.TestCase):
         self.patient_name = "홍길동"
         self.patient_rrn = "900101-1234567"
         self.department = "내과"
+        # Issued PDFs are cached in a temporary directory
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        self.cache = CertificateCache(self.tmp_dir)
+        patcher = patch('app.services.certificate_service.get_certificate_cache', return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Render in this process: the mocked PDF builders cannot be sent to worker processes
+        patcher = patch('app.services.certificate_service.get_render_pool', return_value=RenderPool(workers=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     @patch('app.services.certificate_service.os.path.exists')
     @patch('builtins.open', new_callable=mock_open)
@@ -151,7 +166,7 @@ class TestCertificateService(unittest.TestCase):
         self.assertIsNone(pdf_bytes)
         self.assertIsNone(filename)
 
-    @patch('app.services.certificate_service.create_confirmation_pdf_bytes', return_value=BytesIO(b"fake_confirm_pdf"))
+    @patch('app.services.certificate_service.create_confirmation_pdf_bytes', return_value=b"fake_confirm_pdf")
     @patch('app.services.certificate_service.random.randint', return_value=7) # Mock random days for diagnosis date
     def test_prepare_medical_confirmation_pdf_success(self, mock_randint, mock_create_confirm_pdf):
         disease_name = "감기" # Department used as disease_name
@@ -159,7 +174,7 @@ class TestCertificateService(unittest.TestCase):
         pdf_bytes, filename = prepare_medical_confirmation_pdf(self.patient_name, self.patient_rrn, disease_name)
 
         self.assertIsNotNone(pdf_bytes)
-        self.assertEqual(pdf_bytes.getvalue(), b"fake_confirm_pdf")
+        self.assertEqual(pdf_bytes, b"fake_confirm_pdf")
         self.assertTrue(filename.startswith(f"medical_confirmation_{self.patient_name}_"))
         self.assertTrue(filename.endswith(".pdf"))
 
@@ -173,6 +188,42 @@ class TestCertificateService(unittest.TestCase):
         self.assertTrue("date_of_issue" in kwargs)
         self.assertEqual(kwargs["date_of_issue"], datetime.now().strftime("%Y-%m-%d"))
 
+    @patch('app.services.certificate_service.create_prescription_pdf_bytes', return_value=b"%PDF prescription")
+    def test_reprinted_prescription_is_served_from_cache(self, mock_create_pdf):
+        prescription_details = {
+            "doctor_name": "김의사",
+            "doctor_license_number": "12345",
+            "department": self.department,
+            "prescriptions": [{"name": "감기약 처방", "fee": 5000}],
+            "total_fee": 5000,
+            "issue_date": "2025-06-19"
+        }
+        first, _ = prepare_prescription_pdf(self.patient_name, self.patient_rrn, self.department, prescription_details)
+        # Another license number is not printed, so it is the same certificate
+        reprint, _ = prepare_prescription_pdf(self.patient_name, self.patient_rrn, self.department,
+                                              dict(prescription_details, doctor_license_number="54321"))
+        self.assertEqual((first, reprint), (b"%PDF prescription", b"%PDF prescription"))
+        self.assertEqual(mock_create_pdf.call_count, 1)
+        # Another fee is another certificate
+        prepare_prescription_pdf(self.patient_name, self.patient_rrn, self.department,
+                                 dict(prescription_details, total_fee=6000))
+        self.assertEqual(mock_create_pdf.call_count, 2)
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 2)
+
+    @patch('app.services.certificate_service.create_confirmation_pdf_bytes', return_value=b"%PDF confirmation")
+    @patch('app.services.certificate_service.get_reservation_reader')
+    def test_confirmation_states_the_visit_date(self, mock_reader, mock_create_confirm_pdf):
+        mock_reader.return_value.get_by_rrn.return_value = {"rrn": self.patient_rrn, "time": "2025-06-19 08:20"}
+        prepare_medical_confirmation_pdf(self.patient_name, self.patient_rrn, "내과")
+        prepare_medical_confirmation_pdf(self.patient_name, self.patient_rrn, "내과")
+        mock_create_confirm_pdf.assert_called_once()
+        self.assertEqual(mock_create_confirm_pdf.call_args.kwargs["date_of_diagnosis"], "2025-06-19")
+
+        mock_reader.return_value.get_by_rrn.return_value = None  # No reservation: the day of issue
+        prepare_medical_confirmation_pdf(self.patient_name, self.patient_rrn, "내과")
+        self.assertEqual(mock_create_confirm_pdf.call_args.kwargs["date_of_diagnosis"],
+                         datetime.now().strftime("%Y-%m-%d"))
+
 
 if __name__ == '__main__':
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
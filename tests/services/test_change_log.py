@@ -0,0 +1,78 @@
+import unittest
+import multiprocessing
+import os
+import shutil
+import tempfile
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.change_log import ChangeLog, reservation_change
+
+
+def _append_many(path, count, queue):
+    # Runs in a child process: its own ChangeLog, like another kiosk worker
+    log = ChangeLog(path)
+    queue.put([log.append_many([reservation_change("update", str(n), {"status": "Registered"})])[0]
+               for n in range(count)])
+
+
+class TestChangeLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "changes.jsonl")
+        self.log = ChangeLog(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_changes_are_sequenced_and_read_by_cursor(self):
+        self.assertEqual(self.log.read(0), [])
+        seqs = self.log.append_many([
+            reservation_change("insert", "850101-1234567", {"name": "김예약", "status": "Pending"}),
+            reservation_change("update", "850101-1234567", {"status": "Registered"}, {"status": "Pending"}),
+        ])
+        self.assertEqual(seqs, [1, 2])
+        self.assertEqual(self.log.append_many([reservation_change("update", "850101-1234567", {"status": "Paid"},
+                                                                  {"status": "Registered"})]), [3])
+        changes = self.log.read(1)
+        self.assertEqual([(c["seq"], c["previous_status"], c["status"]) for c in changes],
+                         [(2, "Pending", "Registered"), (3, "Registered", "Paid")])
+        self.assertEqual([c["seq"] for c in self.log.read(0, limit=2)], [1, 2])
+        self.assertEqual(self.log.read(3), [])
+        self.assertEqual(self.log.last_seq, 3)
+
+    def test_instances_share_the_sequence(self):
+        other = ChangeLog(self.path)
+        self.log.append_many([reservation_change("update", "1", {"status": "Registered"})])
+        self.assertEqual(other.append_many([reservation_change("update", "2", {"status": "Paid"})]), [2])
+        self.assertEqual([c["rrn"] for c in self.log.read(0)], ["1", "2"])
+        restarted = ChangeLog(self.path)
+        self.assertEqual(restarted.last_seq, 2)
+
+    def test_partial_line_from_crashed_writer_is_skipped(self):
+        self.log.append_many([reservation_change("update", "1", {"status": "Registered"})])
+        with open(self.path, "ab") as f:
+            f.write(b'{"seq":2,"op":')
+        other = ChangeLog(self.path)
+        self.assertEqual(other.append_many([reservation_change("update", "2", {"status": "Paid"})]), [2])
+        self.assertEqual([c["rrn"] for c in self.log.read(0)], ["1", "2"])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_processes_never_share_a_seq(self):
+        ctx = multiprocessing.get_context("fork")
+        queue = ctx.Queue()
+        workers = [ctx.Process(target=_append_many, args=(self.path, 30, queue)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        seqs = [seq for _ in workers for seq in queue.get(timeout=30)]
+        for worker in workers:
+            worker.join()
+        self.assertEqual(sorted(seqs), list(range(1, 91)))
+        self.assertEqual([c["seq"] for c in self.log.read(0)], list(range(1, 91)))
+
+
+if __name__ == '__main__':
+    unittest.main()
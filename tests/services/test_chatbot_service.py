@@ -387,11 +387,11 @@ class TestChatbotServiceHandlers(unittest.TestCase):
             self.assertEqual(result, {"reply": "어떤 증상으로 방문하셨나요? 다음 중에서 선택해주세요: 발열, 기침 (예: 발열, 기침 등)"})
 
     # --- Tests for handle_payment_request ---
-    @patch('app.services.chatbot_service.payment_service.update_reservation_with_payment_details')
+    @patch('app.services.chatbot_service.payment_service.commit_payment')
     @patch('app.services.chatbot_service.reception_service.lookup_reservation')
-    def test_handle_payment_confirmation_success(self, mock_lookup, mock_update_payment):
+    def test_handle_payment_confirmation_success(self, mock_lookup, mock_commit_payment):
         mock_lookup.return_value = {"name": "고길동", "rrn": "850515-1987654", "status": "Registered", "department": "내과"}
-        mock_update_payment.return_value = True
+        mock_commit_payment.return_value = "pay-1"
 
         params = {
             "name": "고길동", "rrn": "850515-1987654",
@@ -400,7 +400,7 @@ class TestChatbotServiceHandlers(unittest.TestCase):
         }
         result = handle_payment_request(params, "some query")
         self.assertEqual(result, {"reply": "고길동님의 결제가 card로 완료되었습니다. 총 35000원이 결제되었습니다. 감사합니다."})
-        mock_update_payment.assert_called_once_with("850515-1987654", ["감기약", "소화제"], 35000)
+        mock_commit_payment.assert_called_once_with("850515-1987654", ["감기약", "소화제"], 35000, "card")
 
     @patch('app.services.chatbot_service.payment_service.load_department_prescriptions')
     @patch('app.services.chatbot_service.reception_service.lookup_reservation')
@@ -516,42 +516,46 @@ class TestChatbotServiceHandlers(unittest.TestCase):
             self.assertEqual(result, {"reply": expected_reply})
         mock_lookup_reservation.assert_called_once_with(mock_patient_name, mock_patient_rrn)
 
+    @patch('app.services.chatbot_service.get_queue_status')
     @patch('app.services.chatbot_service.update_reservation_status')
     @patch('app.services.chatbot_service.new_ticket')
     @patch('app.services.chatbot_service.handle_choose_symptom_action')
     @patch('app.services.chatbot_service.lookup_reservation')
     def test_handle_reception_pending_patient_no_dept_with_symptom_success(
-        self, mock_lookup_reservation, mock_handle_choose_symptom, mock_new_ticket, mock_update_status
+        self, mock_lookup_reservation, mock_handle_choose_symptom, mock_new_ticket, mock_update_status,
+        mock_get_queue_status
     ):
         mock_patient_name = "보류환자쓰리"
         mock_patient_rrn = "PEND03-PENDING"
         user_provided_symptom = "cough" # This is the key
         derived_department = "호흡기내과"
-        mock_new_ticket_num = "P008"
+        issued_ticket = "호흡기내과-008"
 
         mock_lookup_reservation.return_value = {
             "name": mock_patient_name, "rrn": mock_patient_rrn,
             "status": "Pending", "department": None
         }
-        # Mocking SYM_TO_DEPT and SYMPTOMS is implicitly handled if handle_choose_symptom_action is correctly mocked
-        # and if the symptom key provided is valid.
-        mock_handle_choose_symptom.return_value = {"department": derived_department, "ticket": "ignored_ticket_from_choose_symptom"}
-        mock_new_ticket.return_value = mock_new_ticket_num
+        # handle_choose_symptom_action issues and queues the ticket; no second ticket is drawn
+        mock_handle_choose_symptom.return_value = {"department": derived_department, "ticket": issued_ticket,
+                                                   "position": 3, "eta_minutes": 10}
+        mock_get_queue_status.return_value = {"ticket": issued_ticket, "state": "waiting",
+                                              "position": 3, "eta_minutes": 10}
         mock_update_status.return_value = True
 
         # User provides symptom in this turn because bot asked in a hypothetical previous turn, or user is proactive
         params = {"name": mock_patient_name, "rrn": mock_patient_rrn, "symptom": user_provided_symptom}
         result = handle_reception_request(params, f"I have a {user_provided_symptom}.")
 
-        expected_reply = f"{mock_patient_name}님의 예약이 확인되었습니다. {derived_department}으로 접수되었으며, 대기번호는 {mock_new_ticket_num}번입니다."
+        expected_reply = (f"{mock_patient_name}님의 예약이 확인되었습니다. {derived_department}으로 접수되었으며, 대기번호는 {issued_ticket}번입니다."
+                          " 현재 대기 순서는 3번째이며, 예상 대기시간은 약 10분입니다.")
         self.assertEqual(result, {"reply": expected_reply})
 
         mock_lookup_reservation.assert_called_once_with(mock_patient_name, mock_patient_rrn)
         mock_handle_choose_symptom.assert_called_once_with(user_provided_symptom)
-        mock_new_ticket.assert_called_once_with(derived_department)
+        mock_new_ticket.assert_not_called()
         mock_update_status.assert_called_once_with(
             mock_patient_rrn, 'Registered',
             department=derived_department,
-            ticket_number=mock_new_ticket_num,
+            ticket_number=issued_ticket,
             name=mock_patient_name
         )
@@ -0,0 +1,70 @@
+import unittest
+import os
+import threading
+import sys
+from unittest.mock import patch
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.event_bus import EventBus, publish_status_change
+
+
+class TestEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus(buffer_size=3, history_size=5)
+
+    def test_every_subscriber_gets_each_event_once(self):
+        first, second = self.bus.subscribe(), self.bus.subscribe()
+        self.bus.publish("ticket_called", {"ticket": "내과-001"})
+        self.bus.publish("queue_changed", {"department": "내과"})
+        for subscription in (first, second):
+            events = subscription.get(timeout=0)
+            self.assertEqual([(e["id"], e["type"]) for e in events], [(1, "ticket_called"), (2, "queue_changed")])
+            self.assertEqual(subscription.get(timeout=0), [])
+
+    def test_slow_subscriber_drops_oldest_without_affecting_others(self):
+        slow, fast = self.bus.subscribe(), self.bus.subscribe()
+        for n in range(5):
+            self.bus.publish("queue_changed", {"n": n})
+            self.assertEqual(len(fast.get(timeout=0)), 1)
+        self.assertEqual([e["data"]["n"] for e in slow.get(timeout=0)], [2, 3, 4])
+        self.assertTrue(slow.take_overflow())
+        self.assertFalse(slow.take_overflow())
+        self.assertFalse(fast.take_overflow())
+
+    def test_reconnect_replays_missed_events(self):
+        for n in range(4):
+            self.bus.publish("queue_changed", {"n": n})
+        resumed = self.bus.subscribe(last_event_id=2)
+        self.assertEqual([e["id"] for e in resumed.get(timeout=0)], [3, 4])
+        self.assertFalse(resumed.take_overflow())
+        for n in range(4):
+            self.bus.publish("queue_changed", {"n": n})
+        # Event 2 has left the history: the display must resync
+        self.assertTrue(self.bus.subscribe(last_event_id=1).take_overflow())
+
+    def test_get_wakes_on_publish_and_close(self):
+        subscription = self.bus.subscribe()
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(subscription.get(timeout=5)))
+        reader.start()
+        self.bus.publish("ticket_called", {})
+        reader.join(timeout=5)
+        self.assertEqual(len(received), 1)
+        with subscription:
+            self.assertEqual(len(self.bus), 1)
+        self.assertEqual(len(self.bus), 0)
+        self.assertEqual(subscription.get(timeout=5), [])  # Closed: returns at once
+
+    def test_status_change_leaves_out_patient_identity(self):
+        record = {"name": "김예약", "rrn": "850101-1234567", "department": "내과", "ticket_number": "내과-003"}
+        with patch('app.services.event_bus._bus', self.bus):
+            event = publish_status_change(record, "Paid")
+        self.assertEqual(event["data"], {"ticket": "내과-003", "department": "내과", "status": "Paid"})
+        self.assertIsNone(publish_status_change(None, "Paid"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.fee_catalog import FeeCatalog
+
+FEES_CSV = """Department,Prescription,Fee
+내과,감기약 처방,5000
+내과,소화제 처방,6000
+Dermatology,Ointment,7000
+정형외과,물리치료,abc
+"""
+
+
+class TestFeeCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "treatment_fees.csv")
+        self._write(FEES_CSV)
+        self.catalog = FeeCatalog(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, content):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def test_indexes(self):
+        self.assertEqual(self.catalog.items_for("내과"), [{"name": "감기약 처방", "fee": 5000},
+                                                        {"name": "소화제 처방", "fee": 6000}])
+        self.assertEqual(self.catalog.items_for(" dermatology "), [{"name": "Ointment", "fee": 7000}])
+        self.assertEqual(self.catalog.items_for("안과"), [])
+        self.assertEqual(self.catalog.fee_of("소화제 처방"), 6000)
+        self.assertEqual(self.catalog.fee_of("없는 처방", -1), -1)
+        self.assertEqual(self.catalog.invalid_item("정형외과"), "물리치료")
+        self.assertIsNone(self.catalog.invalid_item("내과"))
+
+    def test_parsed_once_and_reloaded_when_the_file_changes(self):
+        self.catalog.items_for("내과")
+        with patch('builtins.open', side_effect=AssertionError("re-parsed")):
+            self.assertEqual(self.catalog.fee_of("감기약 처방"), 5000)
+        self._write(FEES_CSV.replace("5000", "5500") + "안과,안약 처방,4000\n")
+        self.assertEqual(self.catalog.fee_of("감기약 처방"), 5500)
+        self.assertEqual(self.catalog.items_for("안과"), [{"name": "안약 처방", "fee": 4000}])
+
+    def test_returned_items_are_copies(self):
+        self.catalog.items_for("내과")[0]["fee"] = 0
+        self.assertEqual(self.catalog.items_for("내과")[0]["fee"], 5000)
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            FeeCatalog(os.path.join(self.tmp_dir, "missing.csv")).items_for("내과")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+import threading
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.idempotency import IdempotencyCache
+
+
+class TestIdempotencyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = IdempotencyCache(ttl=60, max_keys=3, clock=lambda: self.now)
+        self.calls = 0
+
+    def _pay(self):
+        self.calls += 1
+        return f"pay-{self.calls}"
+
+    def test_repeated_key_returns_original_result(self):
+        self.assertEqual(self.cache.run("k1", self._pay), "pay-1")
+        self.assertEqual(self.cache.run("k1", self._pay), "pay-1")
+        self.assertEqual(self.cache.run("k2", self._pay), "pay-2")
+        self.assertEqual(self.cache.run(None, self._pay), "pay-3")
+        self.assertEqual(self.cache.run(None, self._pay), "pay-4")
+        self.assertEqual(len(self.cache), 2)
+
+    def test_keys_expire_after_ttl(self):
+        self.cache.run("k1", self._pay)
+        self.now = 59
+        self.assertEqual(self.cache.run("k1", self._pay), "pay-1")
+        self.now = 60
+        self.assertEqual(self.cache.run("k1", self._pay), "pay-2")
+
+    def test_oldest_keys_are_evicted_beyond_max_keys(self):
+        for key in ("k1", "k2", "k3", "k4"):
+            self.cache.run(key, self._pay)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.run("k4", self._pay), "pay-4")
+        self.assertEqual(self.cache.run("k1", self._pay), "pay-5")
+
+    def test_failures_are_not_remembered(self):
+        def fail():
+            raise RuntimeError("storage down")
+        with self.assertRaises(RuntimeError):
+            self.cache.run("k1", fail)
+        self.assertIsNone(self.cache.run("k1", lambda: None))
+        self.assertEqual(self.cache.run("k1", self._pay), "pay-1")
+
+    def test_concurrent_repeat_waits_for_first_call(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_pay():
+            started.set()
+            release.wait(5)
+            return self._pay()
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(self.cache.run("k1", slow_pay)))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(self.cache.run("k1", self._pay)))
+        second.start()
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(results, ["pay-1", "pay-1"])
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch
+import os
+import random
+import shutil
+import tempfile
+import sys
+from datetime import date
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.partitioned_store import PartitionedReservationStore, split_into_partitions
+from app.services.storage import DEFAULT_FIELDNAMES, get_reservation_store
+from app.services import reception_service
+
+ROWS = [
+    {"name": "김예약", "rrn": "850101-1234567", "time": "2025-06-18 08:20", "department": "내과", "status": "Paid"},
+    {"name": "박테스트", "rrn": "920202-2345678", "time": "2025-06-19 09:00", "department": "외과", "status": "Pending"},
+    {"name": "김예약", "rrn": "850101-1234567", "time": "2025-06-19 10:00", "department": "피부과", "status": "Pending"},
+    {"name": "최미래", "rrn": "990101-1111111", "time": "2025-06-20 11:00", "department": "안과", "status": "Pending"},
+    {"name": "이오래", "rrn": "700101-1000000", "time": "2025-04-01 09:00", "department": "내과", "status": "Paid"},
+]
+
+
+class TestPartitionedReservationStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.today = date(2025, 6, 19)
+        split_into_partitions(ROWS, self.tmp_dir, DEFAULT_FIELDNAMES)
+        self.store = PartitionedReservationStore(self.tmp_dir, today=lambda: self.today)
+        patcher = patch('app.services.change_log.CHANGE_LOG', os.path.join(self.tmp_dir, "changes.jsonl"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_split_writes_one_file_per_day(self):
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)),
+                         ["2025-04-01.csv", "2025-06-18.csv", "2025-06-19.csv", "2025-06-20.csv"])
+
+    def test_today_is_checked_first_then_future_then_past(self):
+        self.assertEqual(self.store.get_by_rrn("850101-1234567")["department"], "피부과")
+        self.assertEqual(self.store.find("최미래", "990101-1111111")["department"], "안과")
+        self.assertEqual(self.store.find("김예약", "850101-1234567")["time"], "2025-06-19 10:00")
+
+    def test_fallback_is_limited_to_date_range(self):
+        self.assertIsNone(self.store.get_by_rrn("700101-1000000"))  # Older than lookback_days
+        self.assertEqual(self.store.search("700101-1000000", start=date(2025, 4, 1))["status"], "Paid")
+        self.assertEqual(self.store.search("850101-1234567", end=date(2025, 6, 18))["department"], "내과")
+
+    def test_past_days_are_sealed_and_read_only(self):
+        signature = self.store.signature()
+        self.store.update("850101-1234567", {"status": "Registered"})
+        self.assertNotEqual(self.store.signature(), signature)
+        self.assertFalse(self.store.update("700101-1000000", {"status": "Cancelled"}))
+        with self.assertRaises(ValueError):
+            self.store.append({"name": "과거", "rrn": "010101-3000000", "time": "2025-06-18 09:00"}, DEFAULT_FIELDNAMES)
+        # Today's row was updated; yesterday's partition has no journal
+        self.assertEqual(self.store.get_by_rrn("850101-1234567")["status"], "Registered")
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "2025-06-18.csv.journal")))
+
+    def test_day_rollover_seals_and_compresses(self):
+        store = PartitionedReservationStore(self.tmp_dir, compress=True, today=lambda: self.today)
+        store.update("920202-2345678", {"status": "Paid"})
+        self.today = date(2025, 6, 20)
+        self.assertEqual(store.get_by_rrn("990101-1111111")["name"], "최미래")
+        names = sorted(os.listdir(self.tmp_dir))
+        self.assertIn("2025-06-19.csv.gz", names)
+        self.assertNotIn("2025-06-19.csv", names)
+        self.assertNotIn("2025-06-19.csv.journal", names)
+        self.assertIn("2025-06-19.csv.lock", names)  # Other workers may be waiting on it
+        # The journal was folded in before compressing
+        self.assertEqual(store.get_by_rrn("920202-2345678")["status"], "Paid")
+        self.assertFalse(store.update("920202-2345678", {"status": "Cancelled"}))
+
+    def test_sample_reads_one_day_only(self):
+        rng = random.Random(1)
+        self.assertEqual(self.store.sample(rng)["time"][:10], "2025-06-19")  # Today by default
+        self.assertEqual(self.store.sample(rng, status="Paid", day="2025-06-18")["name"], "김예약")
+        self.assertIsNone(self.store.sample(rng, status="Paid"))             # None today, no other day tried
+        self.assertIsNone(self.store.sample(rng, day="2025-06-21"))          # No partition
+        self.today = date(2025, 6, 21)
+        self.assertIsNone(self.store.sample(rng))
+
+    def test_append_goes_to_partition_of_its_day(self):
+        self.store.append({"name": "신환자", "rrn": "010101-3000000", "time": "2025-06-19 12:00:00"}, DEFAULT_FIELDNAMES)
+        self.store.append({"name": "예약자", "rrn": "020202-4000000", "time": "2025-06-25 09:00"}, DEFAULT_FIELDNAMES)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, "2025-06-25.csv")))
+        self.assertEqual(self.store.get_by_rrn("010101-3000000")["name"], "신환자")
+        self.assertEqual(len(self.store), len(ROWS) + 2)
+
+    def test_services_use_partitioned_backend_when_configured(self):
+        with patch('app.services.storage.STORAGE_BACKEND', 'partitioned'), \
+             patch('app.services.partitioned_store._stores', {self.tmp_dir: self.store}), \
+             patch('app.services.storage.PARTITION_DIR', self.tmp_dir):
+            self.assertIs(get_reservation_store("unused.csv"), self.store)
+            self.assertTrue(reception_service.update_reservation_status("920202-2345678", "Registered"))
+            self.assertEqual(reception_service.lookup_reservation("박테스트", "920202-2345678")["status"], "Registered")
+
+
+if __name__ == '__main__':
+    unittest.main()
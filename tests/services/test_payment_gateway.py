@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import AsyncMock
+import os
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.payment_gateway import TerminalGateway, parse_address
+from app.services.terminal_simulator import TerminalSimulator
+
+
+class TestTerminalGateway(unittest.TestCase):
+
+    def _start(self, gateway_options=None, **simulator_options):
+        simulator = TerminalSimulator(**{"latency": 0.0, "seed": 1, **simulator_options}).start_in_thread()
+        self.addCleanup(simulator.stop)
+        gateway = TerminalGateway("127.0.0.1", simulator.port, **{"backoff": 0.0, **(gateway_options or {})})
+        self.addCleanup(gateway.close)  # Runs before simulator.stop
+        return simulator, gateway
+
+    def test_approves_over_pooled_connections(self):
+        simulator, gateway = self._start({"pool_size": 2})
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda n: gateway.authorize(f"p-{n}", 1000, "card"), range(20)))
+        self.assertTrue(all(result["approved"] and result["auth_code"] for result in results))
+        self.assertEqual(simulator.requests, 20)
+        self.assertLessEqual(simulator.connections, 2)
+
+    def test_decline_is_not_retried(self):
+        simulator, gateway = self._start(decline_rate=1.0)
+        self.assertEqual(gateway.authorize("p-1", 1000, "card"), {"approved": False, "reason": "declined"})
+        self.assertEqual(simulator.requests, 1)
+
+    def test_dropped_connection_is_retried_and_answer_reused(self):
+        simulator, gateway = self._start({"retries": 4}, failure_rate=0.3)
+        results = [gateway.authorize(f"p-{n}", 1000, "card") for n in range(10)]
+        self.assertTrue(all(result["approved"] for result in results))
+        self.assertGreater(simulator.requests, 10)
+        self.assertEqual(gateway.authorize("p-0", 1000, "card"), results[0])
+
+    def test_deadline_covers_retries(self):
+        simulator, gateway = self._start({"timeout": 0.3, "retries": 2}, latency=1.0)
+        gateway.void_async = AsyncMock(return_value=True)
+        started = time.monotonic()
+        self.assertEqual(gateway.authorize("p-1", 1000, "card"), {"approved": False, "reason": "terminal_unavailable"})
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(simulator.requests, 3)
+        # The terminal may approve one of the abandoned attempts: it is voided
+        gateway.void_async.assert_awaited_once_with("p-1")
+
+    def test_void_cancels_approval(self):
+        simulator, gateway = self._start()
+        self.assertTrue(gateway.authorize("p-1", 1000, "card")["approved"])
+        self.assertTrue(gateway.void("p-1"))
+        self.assertEqual(gateway.authorize("p-1", 1000, "card"), {"approved": False, "reason": "voided"})
+        # A void that overtakes its authorization still wins
+        self.assertTrue(gateway.void("p-2"))
+        self.assertFalse(gateway.authorize("p-2", 1000, "card")["approved"])
+        self.assertEqual(simulator.voided, {"p-1", "p-2"})
+
+    def test_void_without_terminal_fails(self):
+        simulator, gateway = self._start({"timeout": 0.5, "retries": 1})
+        gateway.port = 1  # Nothing listens there
+        self.assertFalse(gateway.void("p-1"))
+
+    def test_unreachable_terminal(self):
+        simulator, gateway = self._start({"timeout": 1.0, "retries": 1})
+        gateway.port = 1  # Nothing listens there
+        self.assertEqual(gateway.authorize("p-1", 1000, "card")["reason"], "terminal_unavailable")
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("10.0.0.5:9100"), ("10.0.0.5", 9100))
+        self.assertEqual(parse_address(":9100"), ("127.0.0.1", 9100))
+
+
+if __name__ == '__main__':
+    unittest.main()
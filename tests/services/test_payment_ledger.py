@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import time
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.payment_ledger import PaymentLedger
+from app.services.reservation_repository import ReservationRepository
+from app.services.storage import DuplicatePaymentError
+
+
+def _payment(payment_id, patient_id="850101-1234567", timestamp="2025-06-19T09:00:00.000", amount=5000):
+    return {"payment_id": payment_id, "patient_id": patient_id, "amount": amount,
+            "method": "card", "status": "completed", "timestamp": timestamp}
+
+
+class TestPaymentLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "payments.jsonl")
+        self.ledger = PaymentLedger(self.path, fsync_batch=3, fsync_interval=60)
+
+    def tearDown(self):
+        self.ledger.flush()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_indexes(self):
+        self.ledger.add_payment(_payment("p-2", timestamp="2025-06-19T11:00:00.000"))
+        self.ledger.add_payment(_payment("p-1", timestamp="2025-06-19T09:00:00.000"))
+        self.ledger.add_payment(_payment("p-3", patient_id="920202-2345678", timestamp="2025-06-20T10:00:00.000"))
+        self.assertEqual(self.ledger.get_payment("p-1")["timestamp"], "2025-06-19T09:00:00.000")
+        self.assertIsNone(self.ledger.get_payment("p-9"))
+        self.assertEqual([p["payment_id"] for p in self.ledger.payments_for_patient("850101-1234567")], ["p-1", "p-2"])
+        self.assertEqual([p["payment_id"] for p in self.ledger.payments_between("2025-06-19", "2025-06-20")],
+                         ["p-1", "p-2"])
+        self.assertEqual([p["payment_id"] for p in self.ledger.payments_between("2025-06-19T10", "2025-06-21")],
+                         ["p-2", "p-3"])
+        self.assertEqual(list(self.ledger.iter_payments_between("2025-06-19T10", "2025-06-21")),
+                         self.ledger.payments_between("2025-06-19T10", "2025-06-21"))
+
+    def test_returned_records_are_copies(self):
+        self.ledger.add_payment(_payment("p-1"))
+        self.ledger.get_payment("p-1")["amount"] = 0
+        self.assertEqual(self.ledger.get_payment("p-1")["amount"], 5000)
+
+    def test_shared_between_instances_and_restarts(self):
+        other = PaymentLedger(self.path)
+        self.ledger.add_payment(_payment("p-1"))
+        self.assertEqual(other.get_payment("p-1")["amount"], 5000)
+        other.add_payment(_payment("p-2", timestamp="2025-06-19T10:00:00.000"))
+        self.assertEqual(len(self.ledger.payments_for_patient("850101-1234567")), 2)
+        self.assertEqual(len(PaymentLedger(self.path)), 2)
+
+    def test_idempotency_key_is_refused_across_instances(self):
+        self.ledger.add_payment(dict(_payment("p-1"), idempotency_key="k-1"))
+        other = PaymentLedger(self.path)  # Another worker process
+        with self.assertRaises(DuplicatePaymentError) as caught:
+            other.add_payment(dict(_payment("p-2"), idempotency_key="k-1"))
+        self.assertEqual(caught.exception.payment_id, "p-1")
+        self.assertEqual(other.payment_for_key("k-1")["payment_id"], "p-1")
+        self.assertIsNone(other.payment_for_key("k-2"))
+        self.assertEqual(len(PaymentLedger(self.path)), 1)
+
+    def test_partial_line_from_crashed_writer_is_skipped(self):
+        self.ledger.add_payment(_payment("p-1"))
+        with open(self.path, "ab") as f:
+            f.write(b'{"payment_id":"p-torn",')
+        PaymentLedger(self.path).add_payment(_payment("p-2"))
+        self.assertEqual(len(PaymentLedger(self.path)), 2)
+        self.assertIsNotNone(self.ledger.get_payment("p-2"))
+
+    def test_fsync_is_batched(self):
+        with patch('app.services.payment_ledger.os.fsync') as mock_fsync:
+            for n in range(7):
+                self.ledger.add_payment(_payment(f"p-{n}"))
+            self.assertEqual(mock_fsync.call_count, 2)
+            self.ledger.flush()
+            self.assertEqual(mock_fsync.call_count, 3)
+            self.ledger.flush()
+            self.assertEqual(mock_fsync.call_count, 3)
+
+    def test_fsync_after_interval_without_more_writes(self):
+        ledger = PaymentLedger(self.path, fsync_batch=100, fsync_interval=0.05)
+        with patch('app.services.payment_ledger.os.fsync') as mock_fsync:
+            ledger.add_payment(_payment("p-1"))
+            deadline = time.monotonic() + 5
+            while not mock_fsync.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(mock_fsync.call_count, 1)
+
+    def test_commit_payment_is_one_synced_line(self):
+        csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("name,rrn,status,prescription_names,total_fee\n김예약,850101-1234567,Registered,,0\n")
+        repo = ReservationRepository(csv_path)
+        fields = {"prescription_names": "감기약", "total_fee": "5000", "status": "Paid"}
+        with patch('app.services.payment_ledger.os.fsync') as mock_fsync:
+            self.ledger.add_payment(_payment("p-1"))
+            self.assertTrue(self.ledger.commit_payment(_payment("p-2"), repo, "850101-1234567", fields))
+            self.assertEqual(mock_fsync.call_count, 1)  # Also covers the unsynced p-1
+            self.assertFalse(self.ledger.commit_payment(_payment("p-3"), repo, "000000-0000000", fields))
+        self.assertEqual(PaymentLedger(self.path).get_payment("p-2")["reservation"],
+                         {"rrn": "850101-1234567", "fields": fields})
+        self.assertIsNone(self.ledger.get_payment("p-3"))
+        self.assertEqual(repo.get_by_rrn("850101-1234567")["status"], "Paid")
+
+
+if __name__ == '__main__':
+    unittest.main()
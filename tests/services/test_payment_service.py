@@ -1,6 +1,9 @@
 import unittest
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 import os
+import random
+import shutil
+import tempfile
 import uuid # For checking payment_id format, though not strictly necessary to mock uuid itself
 import sys
 
@@ -11,8 +14,16 @@ from app.services.payment_service import (
     process_new_payment,
     get_payment_details,
     load_department_prescriptions,
-    _payments_db # Import for checking db state, use with caution in tests (implementation detail)
+    get_patient_payments,
+    get_payments_between,
+    get_prescription_quote,
+    commit_payment,
+    recover_payment_commits,
+    recover_payment_commits_on_startup,
 )
+from app.services.quote_store import get_quote_store
+from app.services.reservation_repository import ReservationRepository, get_reservation_repository
+from app.services.storage import get_payment_store
 
 # Mock data for TREATMENT_FEES_CSV
 MOCK_TREATMENT_FEES_CSV_DATA = """Department,Prescription,Fee
@@ -23,17 +34,37 @@ MOCK_TREATMENT_FEES_CSV_DATA = """Department,Prescription,Fee
 피부과,피부 연고 처방,7000
 """
 
+MOCK_RESERVATIONS_CSV_DATA = """name,rrn,time,department,location,doctor,status,prescription_names,total_fee
+김예약,850101-1234567,2025-06-19 08:20,내과,본관1층,닥터김,Registered,,0
+"""
+
 class TestPaymentService(unittest.TestCase):
 
     def setUp(self):
-        # Clear the in-memory database before each test
-        _payments_db.clear()
+        # Each test gets its own payment ledger
+        self.tmp_dir = tempfile.mkdtemp()
+        patcher = patch('app.services.storage.PAYMENT_LEDGER', os.path.join(self.tmp_dir, "payments.jsonl"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        self.addCleanup(get_quote_store().pop, "test_patient_001")
         self.patient_id = "test_patient_001"
         self.amount = 10000
         self.method = "card"
 
+    def _patch_fee_table_path(self, path):
+        patcher = patch('app.services.payment_service.TREATMENT_FEES_CSV', path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _use_fee_table(self, content):
+        path = os.path.join(self.tmp_dir, "treatment_fees.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        self._patch_fee_table_path(path)
+
     def test_process_new_payment(self):
-        initial_db_size = len(_payments_db)
+        initial_db_size = len(get_payment_store())
         payment_id = process_new_payment(self.patient_id, self.amount, self.method)
 
         self.assertIsNotNone(payment_id)
@@ -44,8 +75,8 @@ class TestPaymentService(unittest.TestCase):
         except ValueError:
             self.fail("payment_id is not a valid UUID v4 string")
 
-        self.assertEqual(len(_payments_db), initial_db_size + 1)
-        new_payment_record = _payments_db[-1]
+        self.assertEqual(len(get_payment_store()), initial_db_size + 1)
+        new_payment_record = get_patient_payments(self.patient_id)[-1]
         self.assertEqual(new_payment_record["payment_id"], payment_id)
         self.assertEqual(new_payment_record["patient_id"], self.patient_id)
         self.assertEqual(new_payment_record["amount"], self.amount)
@@ -61,22 +92,135 @@ class TestPaymentService(unittest.TestCase):
         self.assertEqual(retrieved_details["payment_id"], payment_id)
         self.assertEqual(retrieved_details["patient_id"], self.patient_id)
 
+    def test_payments_by_patient_and_time_range(self):
+        with patch('app.services.payment_service.datetime') as mock_datetime:
+            for hour, patient in ((9, "p-1"), (11, "p-2"), (10, "p-1")):
+                mock_datetime.now.return_value.isoformat.return_value = f"2025-06-19T{hour:02d}:00:00.000"
+                process_new_payment(patient, hour * 1000, "card")
+        self.assertEqual([p["amount"] for p in get_patient_payments("p-1")], [9000, 10000])
+        self.assertEqual([p["amount"] for p in get_payments_between("2025-06-19T10", "2025-06-19T12")], [10000, 11000])
+        self.assertEqual(get_payments_between("2025-06-20", "2025-06-21"), [])
+
+    def test_prescription_quote_is_stored_and_reused(self):
+        self._use_fee_table(MOCK_TREATMENT_FEES_CSV_DATA + "내과,해열제 처방,4000\n내과,진통제 처방,3000\n")
+        state = random.getstate()
+        quote = get_prescription_quote(self.patient_id, "내과")
+        self.assertEqual(random.getstate(), state)  # The global RNG is left alone
+        self.assertEqual(quote["department"], "내과")
+        self.assertEqual(quote["total_fee"], sum(item["fee"] for item in quote["prescriptions_for_display"]))
+        with patch('app.services.payment_service.load_department_prescriptions') as mock_load:
+            self.assertEqual(get_prescription_quote(self.patient_id, "내과"), quote)
+            self.assertEqual(get_prescription_quote(self.patient_id), quote)
+            mock_load.assert_not_called()
+        # Drawn again identically once it is gone (expired, or stored by another worker)
+        get_quote_store().pop(self.patient_id)
+        self.assertEqual(get_prescription_quote(self.patient_id, "내과"), quote)
+        self.assertIsNone(get_prescription_quote("someone-else"))
+        self.assertIn("error", get_prescription_quote(self.patient_id, "안과"))
+
+    def _use_reservations(self):
+        os.makedirs(os.path.join(self.tmp_dir, "data"))
+        csv_path = os.path.join(self.tmp_dir, "data", "reservations.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        for target, value in (('app.services.payment_service.BASE_DIR', self.tmp_dir),
+                              ('app.services.change_log.CHANGE_LOG', os.path.join(self.tmp_dir, "changes.jsonl"))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return csv_path
+
+    def test_commit_payment_marks_reservation_paid(self):
+        csv_path = self._use_reservations()
+        pay_id = commit_payment("850101-1234567", ["감기약 처방", "소화제 처방"], 11000, "card")
+        self.assertEqual(get_payment_details(pay_id)["amount"], 11000)
+        row = get_reservation_repository(csv_path).get_by_rrn("850101-1234567")
+        self.assertEqual((row["status"], row["prescription_names"], row["total_fee"]),
+                         ("Paid", "감기약 처방,소화제 처방", "11000"))
+        self.assertIsNone(commit_payment("000000-0000000", ["감기약 처방"], 5000, "card"))
+        self.assertEqual(len(get_payment_store()), 1)
+
+    def test_recover_payment_commits_applies_lost_reservation_update(self):
+        csv_path = self._use_reservations()
+        # The process "dies" after the ledger commit, before the reservation write
+        with patch.object(ReservationRepository, 'update', return_value=True):
+            pay_id = commit_payment("850101-1234567", ["감기약 처방"], 5000, "cash")
+        repo = get_reservation_repository(csv_path)
+        self.assertEqual(repo.get_by_rrn("850101-1234567")["status"], "Registered")
+        self.assertEqual(recover_payment_commits(get_payment_details(pay_id)["timestamp"][:10]), 1)
+        self.assertEqual(repo.get_by_rrn("850101-1234567")["total_fee"], "5000")
+        self.assertEqual(recover_payment_commits("2000-01-01"), 0)
+
+    def test_startup_recovery_covers_the_days_since_the_last_startup(self):
+        csv_path = self._use_reservations()
+        mark_path = os.path.join(self.tmp_dir, "payments.jsonl.recovered")
+        with open(mark_path, "w", encoding="utf-8") as f:
+            f.write("2000-01-01T00:00:00.000")  # The last startup was long ago
+        with patch.object(ReservationRepository, 'update', return_value=False):
+            commit_payment("850101-1234567", ["감기약 처방"], 5000, "cash")
+        with patch('app.services.payment_service.recover_payment_commits', return_value=0) as mock_recover:
+            recover_payment_commits_on_startup()
+        mock_recover.assert_called_once_with("2000-01-01T00:00:00.000")
+        self.assertEqual(recover_payment_commits_on_startup(), 1)
+        self.assertEqual(get_reservation_repository(csv_path).get_by_rrn("850101-1234567")["status"], "Paid")
+        with open(mark_path, encoding="utf-8") as f:
+            self.assertGreater(f.read(), "2000-01-02")  # Where this pass began
+
+    def test_authorized_payment_that_cannot_be_stored_is_voided(self):
+        self._use_reservations()
+        with patch('app.services.payment_service.get_payment_gateway') as mock_gateway, \
+                patch('app.services.payment_ledger.PaymentLedger._append', side_effect=OSError("disk full")):
+            mock_gateway.return_value.authorize.return_value = {"approved": True, "auth_code": "A1"}
+            self.assertIsNone(commit_payment("850101-1234567", ["감기약 처방"], 5000, "card"))
+            self.assertIsNone(process_new_payment(self.patient_id, self.amount, self.method))
+        voided = [call.args[0] for call in mock_gateway.return_value.void.call_args_list]
+        authorized = [call.args[0] for call in mock_gateway.return_value.authorize.call_args_list]
+        self.assertEqual(voided, authorized)
+        self.assertEqual(len(voided), 2)
+
+    def test_declined_payment_is_not_stored(self):
+        csv_path = self._use_reservations()
+        with patch('app.services.payment_service.get_payment_gateway') as mock_gateway:
+            mock_gateway.return_value.authorize.return_value = {"approved": False, "reason": "declined"}
+            self.assertIsNone(process_new_payment(self.patient_id, self.amount, self.method))
+            self.assertIsNone(commit_payment("850101-1234567", ["감기약 처방"], 5000, "card"))
+        self.assertEqual(len(get_payment_store()), 0)
+        self.assertEqual(get_reservation_repository(csv_path).get_by_rrn("850101-1234567")["status"], "Registered")
+
+    def test_repeated_idempotency_key_is_charged_once(self):
+        self._use_reservations()
+        pay_id = commit_payment("850101-1234567", ["감기약 처방"], 5000, "card", idempotency_key="k-1")
+        with patch('app.services.payment_service.get_payment_gateway') as mock_gateway:
+            self.assertEqual(commit_payment("850101-1234567", ["감기약 처방"], 5000, "card", idempotency_key="k-1"),
+                             pay_id)
+        mock_gateway.return_value.authorize.assert_not_called()
+        self.assertEqual(len(get_payment_store()), 1)
+
+    def test_key_committed_by_another_process_first_voids_this_approval(self):
+        self._use_reservations()
+        pay_id = commit_payment("850101-1234567", ["감기약 처방"], 5000, "card", idempotency_key="k-1")
+        # Both processes looked the key up before either had committed it
+        with patch('app.services.payment_ledger.PaymentLedger.payment_for_key', return_value=None), \
+                patch('app.services.payment_service.get_payment_gateway') as mock_gateway:
+            mock_gateway.return_value.authorize.return_value = {"approved": True, "auth_code": "A2"}
+            self.assertEqual(commit_payment("850101-1234567", ["감기약 처방"], 5000, "card", idempotency_key="k-1"),
+                             pay_id)
+        mock_gateway.return_value.void.assert_called_once()
+        self.assertEqual(len(get_payment_store()), 1)
+
     def test_get_payment_details_non_existing(self):
         non_existing_id = str(uuid.uuid4())
         retrieved_details = get_payment_details(non_existing_id)
         self.assertIsNone(retrieved_details)
 
-    @patch('app.services.payment_service.os.path.exists', return_value=True)
-    @patch('builtins.open')
-    def test_load_department_prescriptions_valid_department(self, mock_open_func, mock_path_exists):
-        mock_csv_file = mock_open(read_data=MOCK_TREATMENT_FEES_CSV_DATA)
-        mock_open_func.return_value = mock_csv_file.return_value
+    def test_load_department_prescriptions_valid_department(self):
+        self._use_fee_table(MOCK_TREATMENT_FEES_CSV_DATA)
 
         department = "내과"
         # Patch random.sample to control selection for testing counts and content
         # The service selects min(2, len), min(3, len) items. "내과" has 2 items.
         # So, it will try to select random.randint(min(2,2), min(3,2)) -> random.randint(2,2) -> 2 items
-        with patch('app.services.payment_service.random.sample') as mock_random_sample:
+        with patch.object(random.Random, 'sample') as mock_random_sample:
             # Simulate random.sample returning the two items for '내과'
             mock_random_sample.return_value = [
                 {"name": "감기약 처방", "fee": 5000},
@@ -101,11 +245,8 @@ class TestPaymentService(unittest.TestCase):
             self.assertEqual(result["total_fee"], 11000)
             mock_random_sample.assert_called_once() # Ensure random.sample was called
 
-    @patch('app.services.payment_service.os.path.exists', return_value=True)
-    @patch('builtins.open')
-    def test_load_department_prescriptions_department_not_found(self, mock_open_func, mock_path_exists):
-        mock_csv_file = mock_open(read_data=MOCK_TREATMENT_FEES_CSV_DATA)
-        mock_open_func.return_value = mock_csv_file.return_value
+    def test_load_department_prescriptions_department_not_found(self):
+        self._use_fee_table(MOCK_TREATMENT_FEES_CSV_DATA)
 
         department = "안과" # Not in MOCK_TREATMENT_FEES_CSV_DATA
         result = load_department_prescriptions(department)
@@ -115,8 +256,8 @@ class TestPaymentService(unittest.TestCase):
         self.assertEqual(result.get("prescriptions", []), []) # or prescriptions_for_display
         self.assertEqual(result.get("total_fee"), 0)
 
-    @patch('app.services.payment_service.os.path.exists', return_value=False)
-    def test_load_department_prescriptions_csv_not_found(self, mock_path_exists):
+    def test_load_department_prescriptions_csv_not_found(self):
+        self._patch_fee_table_path(os.path.join(self.tmp_dir, "missing.csv"))
         department = "내과"
         result = load_department_prescriptions(department)
 
@@ -125,18 +266,15 @@ class TestPaymentService(unittest.TestCase):
         self.assertEqual(result.get("prescriptions", []), [])
         self.assertEqual(result.get("total_fee"), 0)
 
-    @patch('app.services.payment_service.os.path.exists', return_value=True)
-    @patch('builtins.open')
-    def test_load_department_prescriptions_random_selection_logic(self, mock_open_func, mock_path_exists):
+    def test_load_department_prescriptions_random_selection_logic(self):
         # Test with a department that has more than 3 items to check random sampling range
         # For this, we need to modify the mock CSV data or use a different department
         # Let's use '정형외과' which has 2 items, so 2 items should be selected.
-        mock_csv_file = mock_open(read_data=MOCK_TREATMENT_FEES_CSV_DATA)
-        mock_open_func.return_value = mock_csv_file.return_value
+        self._use_fee_table(MOCK_TREATMENT_FEES_CSV_DATA)
         department = "정형외과" # Has 2 items in CSV
 
         # random.sample will be called to select 2 items from 2 available
-        with patch('app.services.payment_service.random.sample') as mock_random_sample:
+        with patch.object(random.Random, 'sample') as mock_random_sample:
             # Define what random.sample should return for this specific call
             # These are the actual items for 정형외과
             simulated_sample_return = [
@@ -154,12 +292,9 @@ class TestPaymentService(unittest.TestCase):
             # For 2 items, num_to_select is random.randint(min(2,2), min(3,2)) -> randint(2,2) -> 2
             mock_random_sample.assert_called_once_with(unittest.mock.ANY, 2)
 
-    @patch('app.services.payment_service.os.path.exists', return_value=True)
-    @patch('builtins.open')
-    @patch('app.services.payment_service.random.sample') # Mock random.sample
-    def test_load_department_prescriptions_unexpected_error(self, mock_random_sample, mock_open_func, mock_path_exists):
-        mock_csv_file = mock_open(read_data=MOCK_TREATMENT_FEES_CSV_DATA)
-        mock_open_func.return_value = mock_csv_file.return_value
+    @patch.object(random.Random, 'sample') # Mock random.Random.sample (selection uses a per-call RNG)
+    def test_load_department_prescriptions_unexpected_error(self, mock_random_sample):
+        self._use_fee_table(MOCK_TREATMENT_FEES_CSV_DATA)
 
         # Configure random.sample to raise an unexpected error
         mock_random_sample.side_effect = RuntimeError("Simulated unexpected error from random.sample")
@@ -0,0 +1,127 @@
+import unittest
+import os
+import random
+import shutil
+import tempfile
+import sys
+from datetime import date
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.queue_engine import DepartmentQueue, QueueEngine, _Fenwick
+
+
+class TestFenwick(unittest.TestCase):
+
+    def test_prefix_sums_survive_growth(self):
+        tree = _Fenwick(size=4)
+        counts = {}
+        rng = random.Random(5)
+        for _ in range(300):
+            index = rng.randint(1, 500)
+            tree.add(index, 1)
+            counts[index] = counts.get(index, 0) + 1
+        for probe in (1, 3, 4, 5, 64, 257, 500, 1000):
+            self.assertEqual(tree.prefix(probe), sum(c for i, c in counts.items() if i <= probe))
+
+
+class TestDepartmentQueue(unittest.TestCase):
+
+    def test_positions_follow_numbers_and_cancellations(self):
+        queue = DepartmentQueue(service_seconds=60)
+        for number in (3, 1, 2, 5):
+            queue.join(number)
+        self.assertEqual([queue.position(n) for n in (1, 2, 3, 5)], [1, 2, 3, 4])
+        queue.remove(2)
+        self.assertEqual(queue.position(5), 3)
+        self.assertEqual(queue.position(2), 0)
+        self.assertEqual(queue.next_number(), 1)
+        queue.call(1, now=0)
+        self.assertEqual(queue.next_number(), 3)
+        # One in service plus one ahead
+        self.assertEqual(queue.eta_seconds(5), 2 * 60)
+        self.assertEqual(queue.eta_seconds(5, desks=2), 60)
+
+    def test_stale_calls_stop_counting_toward_eta(self):
+        queue = DepartmentQueue(service_seconds=60)
+        for number in range(1, 5):
+            queue.join(number)
+        # Three calls the desk never completed, then one more waiting ticket
+        for number in (1, 2, 3):
+            queue.call(number, now=0)
+        self.assertEqual(queue.eta_seconds(4, desks=2), 60)  # Capped at the two desks
+        self.assertEqual(queue.eta_seconds(4, desks=2, now=100), 60)
+        self.assertEqual(queue.eta_seconds(4, desks=2, now=1000), 0)  # Long past three visits
+        queue.call(4, now=1000)
+        queue.join(5)
+        self.assertEqual(queue.eta_seconds(5, now=1000), 60)
+
+    def test_service_time_is_exponentially_weighted(self):
+        queue = DepartmentQueue(service_seconds=300)
+        queue.join(1)
+        queue.call(1, now=1000)
+        queue.complete(1, now=1100, alpha=0.5)
+        self.assertEqual(queue.service_seconds, 200)
+        self.assertEqual(queue.completed, 1)
+
+
+class TestQueueEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.now = 1000.0
+        self.today = date(2025, 6, 19)
+        self.engine = self._engine()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _engine(self):
+        return QueueEngine(self.tmp_dir, default_service_seconds=300,
+                           today=lambda: self.today, clock=lambda: self.now)
+
+    def test_join_call_complete(self):
+        self.assertEqual(self.engine.join("내과-001")["position"], 1)
+        status = self.engine.join("내과-002")
+        self.assertEqual((status["state"], status["position"], status["eta_minutes"]), ("waiting", 2, 5))
+        self.assertEqual(self.engine.join("내과-002")["position"], 2)  # Joining twice is a no-op
+        self.assertEqual(self.engine.call_next("내과"), "내과-001")
+        self.assertEqual(self.engine.status("내과-001")["state"], "serving")
+        self.now += 60
+        self.assertTrue(self.engine.complete("내과-001"))
+        self.assertEqual(self.engine.status("내과-001")["state"], "done")
+        self.assertEqual(self.engine.summary("내과")["service_seconds"], 228)  # 300 + 0.3 * (60 - 300)
+        self.assertEqual(self.engine.status("내과-002")["eta_seconds"], 0)
+        self.assertIsNone(self.engine.call_next("외과"))
+
+    def test_cancel(self):
+        self.engine.join("외과-001")
+        self.engine.join("외과-002")
+        self.assertTrue(self.engine.cancel("외과-001"))
+        self.assertFalse(self.engine.cancel("외과-001"))
+        self.assertEqual(self.engine.status("외과-002")["position"], 1)
+        self.assertEqual(self.engine.call_next("외과"), "외과-002")
+
+    def test_state_is_shared_and_rebuilt_from_log(self):
+        self.engine.join("내과-001")
+        other = self._engine()
+        other.join("내과-002")
+        self.assertEqual(self.engine.status("내과-002")["position"], 2)
+        self.assertEqual(other.call_next("내과"), "내과-001")
+        restarted = self._engine()
+        self.assertEqual(restarted.status("내과-002")["position"], 1)
+        self.assertEqual(restarted.summary("내과")["serving"], ["내과-001"])
+
+    def test_new_day_starts_empty(self):
+        self.engine.join("내과-001")
+        self.today = date(2025, 6, 20)
+        self.assertEqual(self.engine.summary("내과")["waiting"], 0)
+
+    def test_rejects_malformed_tickets(self):
+        with self.assertRaises(ValueError):
+            self.engine.join("내과TICKET")
+
+
+if __name__ == '__main__':
+    unittest.main()
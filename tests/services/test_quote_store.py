@@ -0,0 +1,46 @@
+import unittest
+import os
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.quote_store import QuoteStore
+
+
+class TestQuoteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.store = QuoteStore(ttl=60, clock=lambda: self.now)
+
+    def test_quotes_expire_after_ttl(self):
+        self.store.put("a", {"total_fee": 1000})
+        self.now = 59
+        self.assertEqual(self.store.get("a"), {"total_fee": 1000})
+        self.now = 60
+        self.assertIsNone(self.store.get("a"))
+        self.assertEqual(len(self.store), 0)
+
+    def test_requote_restarts_ttl(self):
+        self.store.put("a", {"total_fee": 1000})  # Expires at 60
+        self.now = 30
+        self.store.put("b", {"total_fee": 2000})  # Expires at 90
+        self.now = 40
+        self.store.put("a", {"total_fee": 1500})  # Now expires at 100
+        self.now = 70
+        self.assertEqual(self.store.get("a"), {"total_fee": 1500})
+        self.assertEqual(self.store.get("b"), {"total_fee": 2000})
+        self.now = 95
+        self.assertIsNone(self.store.get("b"))
+        self.assertEqual(self.store.pop("a"), {"total_fee": 1500})
+        self.assertIsNone(self.store.get("a"))
+
+    def test_stored_quote_cannot_be_changed_through_returned_copy(self):
+        self.store.put("a", {"total_fee": 1000})["total_fee"] = 0
+        self.store.get("a")["total_fee"] = 0
+        self.assertEqual(self.store.get("a")["total_fee"], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
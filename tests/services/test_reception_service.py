@@ -1,6 +1,8 @@
 import unittest
-from unittest.mock import patch, mock_open, MagicMock
+from unittest.mock import patch
 import os
+import shutil
+import tempfile
 from datetime import datetime
 import sys
 
@@ -14,9 +16,17 @@ from app.services.reception_service import (
     handle_choose_symptom_action,
     new_ticket, # Import if testing directly, or it's tested via handle_choose_symptom_action
     fake_scan_rrn, # Import if testing directly
+    get_queue_status,
+    call_next_ticket,
+    add_new_patient_reception,
+    update_reservation_status,
+    update_reservations_bulk,
     SYMPTOMS, # Import for context if needed
     SYM_TO_DEPT # Import for context if needed
 )
+from app.services.change_log import get_change_log
+from app.services.event_bus import EventBus
+from app.services.reservation_repository import get_reservation_repository
 
 MOCK_RESERVATIONS_CSV_DATA = """name,rrn,department,time,location,doctor,status,transcription,amount
 김예약,850101-1234567,내과,10:00,본관1층,닥터김,Pending,,0
@@ -25,12 +35,27 @@ MOCK_RESERVATIONS_CSV_DATA = """name,rrn,department,time,location,doctor,status,
 
 class TestReceptionService(unittest.TestCase):
 
-    @patch('app.services.reception_service.os.path.exists', return_value=True)
-    @patch('builtins.open')
-    def test_lookup_reservation_existing(self, mock_open_func, mock_path_exists):
-        mock_csv_file = mock_open(read_data=MOCK_RESERVATIONS_CSV_DATA)
-        mock_open_func.return_value = mock_csv_file.return_value
-
+    def setUp(self):
+        # Each test gets its own reservations file so the repository cache
+        # never leaks rows between tests.
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        patcher = patch('app.services.reception_service.RESV_CSV', self.csv_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for target, name in (('app.services.ticket_allocator.TICKET_DIR', "tickets"),
+                             ('app.services.queue_engine.QUEUE_DIR', "queue"),
+                             ('app.services.change_log.CHANGE_LOG', "changes.jsonl")):
+            patcher = patch(target, os.path.join(self.tmp_dir, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_lookup_reservation_existing(self):
         name = "김예약"
         rrn = "850101-1234567"
         result = lookup_reservation(name, rrn)
@@ -43,19 +68,14 @@ class TestReceptionService(unittest.TestCase):
         self.assertEqual(result["transcription"], "")
         self.assertEqual(result["amount"], "0") # Values from DictReader are strings
 
-    @patch('app.services.reception_service.os.path.exists', return_value=True)
-    @patch('builtins.open')
-    def test_lookup_reservation_non_existing(self, mock_open_func, mock_path_exists):
-        mock_csv_file = mock_open(read_data=MOCK_RESERVATIONS_CSV_DATA)
-        mock_open_func.return_value = mock_csv_file.return_value
-
+    def test_lookup_reservation_non_existing(self):
         name = "최미예약"
         rrn = "991212-2000000"
         result = lookup_reservation(name, rrn)
         self.assertIsNone(result)
 
-    @patch('app.services.reception_service.os.path.exists', return_value=False)
-    def test_lookup_reservation_csv_not_found(self, mock_path_exists):
+    def test_lookup_reservation_csv_not_found(self):
+        os.remove(self.csv_path)
         name = "김예약"
         rrn = "850101-1234567"
         result = lookup_reservation(name, rrn)
@@ -152,61 +172,100 @@ class TestReceptionService(unittest.TestCase):
         mock_new_ticket.assert_called_once_with(expected_department)
 
     def test_new_ticket_format(self):
-        # Test the actual new_ticket function's format
-        department = "정형외과"
-        # Mock datetime and random.randint for predictable ticket numbers
-        with patch('app.services.reception_service.datetime') as mock_datetime, \
-             patch('app.services.reception_service.random.randint') as mock_randint:
-
-            mock_now = MagicMock()
-            mock_now.strftime.return_value = "100000" # HHMMSS
-            mock_datetime.now.return_value = mock_now
-            mock_randint.return_value = 50 # Random int part
-
-            ticket = new_ticket(department)
-
-            # Expected format: First letter of department + HHMMSS + random_int
-            # 정형외과 -> 정
-            # For simplicity, using first char '정'. Actual service uses department[0]
-            # If SYM_TO_DEPT values are Korean, department[0] will be Korean.
-            # The service has: dept_code = department[0] if department else "X"
-            # So for "정형외과", dept_code will be "정"
-            expected_ticket_prefix = department[0]
-            self.assertTrue(ticket.startswith(expected_ticket_prefix))
-            self.assertIn("10000050", ticket) # HHMMSS + randint
-            mock_datetime.now.assert_called_once()
-            mock_randint.assert_called_once_with(10,99)
-
-    @patch('app.services.reception_service.os.path.exists', return_value=True)
-    @patch('builtins.open')
-    def test_fake_scan_rrn_reads_from_csv(self, mock_open_func, mock_path_exists):
-        mock_csv_file = mock_open(read_data=MOCK_RESERVATIONS_CSV_DATA)
-        mock_open_func.return_value = mock_csv_file.return_value
-
-        with patch('app.services.reception_service.random.choice') as mock_random_choice:
-            # Simulate random.choice returning the first entry from our mock CSV data
-            # The data read by csv.DictReader will be a list of dicts
-            # Example: [{'Name': '김예약', 'RRN': '850101-1234567', ...}, ...]
-            mock_random_choice.return_value = {
-                "name": "김예약", "rrn": "850101-1234567", "department": "내과",
-                "time": "10:00", "location": "본관1층", "doctor": "닥터김",
-                "status": "Pending", "transcription": "", "amount": "0"
-            }
-
-            name, rrn = fake_scan_rrn()
-
-            self.assertEqual(name, "김예약")
-            self.assertEqual(rrn, "850101-1234567")
-            mock_random_choice.assert_called_once()
-
-    @patch('app.services.reception_service.os.path.exists', return_value=False)
-    def test_fake_scan_rrn_csv_not_found_fallback(self, mock_path_exists):
+        # Per-department counters: 정형외과 and 정신건강의학과 share a first letter but never collide
+        self.assertEqual(new_ticket("정형외과"), "정형외과-001")
+        self.assertEqual(new_ticket("정신건강의학과"), "정신건강의학과-001")
+        self.assertEqual(new_ticket("정형외과"), "정형외과-002")
+
+    def test_handle_choose_symptom_action_joins_queue(self):
+        first = handle_choose_symptom_action("headache")
+        second = handle_choose_symptom_action("headache")
+        self.assertEqual(first["position"], 1)
+        self.assertEqual(second["position"], 2)
+        self.assertEqual(get_queue_status(second["ticket"])["position"], 2)
+        self.assertGreater(second["eta_minutes"], first["eta_minutes"])
+
+    def test_call_next_ticket_is_announced(self):
+        ticket = handle_choose_symptom_action("headache")["ticket"]
+        bus = EventBus()
+        with patch('app.services.event_bus._bus', bus):
+            board = bus.subscribe()
+            self.assertEqual(call_next_ticket("신경과", "2번 진료실"), ticket)
+            self.assertIsNone(call_next_ticket("신경과"))
+            self.assertTrue(update_reservation_status("850101-1234567", "Registered"))
+        events = board.get(timeout=0)
+        self.assertEqual([e["type"] for e in events], ["ticket_called", "queue_changed", "status_changed"])
+        self.assertEqual(events[0]["data"]["desk"], "2번 진료실")
+        self.assertEqual(events[1]["data"]["serving"], [ticket])
+        self.assertNotIn("rrn", events[2]["data"])
+
+    def test_mutations_are_recorded_in_change_log(self):
+        log = get_change_log(os.path.join(self.tmp_dir, "changes.jsonl"))
+        self.assertTrue(update_reservation_status("850101-1234567", "Registered"))
+        self.assertTrue(add_new_patient_reception("이신규", "010101-3000000", "내과", "내과-001"))
+        self.assertFalse(update_reservation_status("000000-0000000", "Registered"))
+        changes = log.read(0)
+        self.assertEqual([(c["seq"], c["op"], c["rrn"], c["previous_status"], c["status"]) for c in changes],
+                         [(1, "update", "850101-1234567", "Pending", "Registered"),
+                          (2, "insert", "010101-3000000", None, "Registered")])
+
+    def test_fake_scan_rrn_reads_from_csv(self):
+        scanned = {fake_scan_rrn() for _ in range(30)}
+        self.assertTrue(scanned <= {("김예약", "850101-1234567"), ("박테스트", "920202-2345678")})
+        self.assertEqual(len(scanned), 2)
+
+    def test_fake_scan_rrn_uses_cached_index_without_copying_rows(self):
+        repo = get_reservation_repository(self.csv_path)
+        repo.get_by_rrn("850101-1234567")  # Index is loaded
+        with patch.object(repo, "all") as mock_all, \
+             patch('app.services.reception_service.random.randrange', return_value=1):
+            self.assertEqual(fake_scan_rrn(), ("박테스트", "920202-2345678"))
+            mock_all.assert_not_called()
+
+    def test_fake_scan_rrn_pending_today(self):
+        today = datetime.now().strftime("%Y-%m-%d")
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            f.write(f"오늘대기,770707-1000000,내과,{today} 09:00,본관1층,닥터김,Pending,,0\n")
+            f.write(f"오늘완료,880808-2000000,내과,{today} 10:00,본관1층,닥터김,Paid,,0\n")
+        for _ in range(10):
+            self.assertEqual(fake_scan_rrn(pending_today=True), ("오늘대기", "770707-1000000"))
+        # Nobody pending today: any reservation is picked instead
+        update_reservation_status("770707-1000000", "Registered")
+        self.assertIn(fake_scan_rrn(pending_today=True)[0], {"김예약", "박테스트", "오늘대기", "오늘완료"})
+
+    def test_fake_scan_rrn_csv_not_found_fallback(self):
         # Test fallback behavior when CSV is not found
+        os.remove(self.csv_path)
         name, rrn = fake_scan_rrn()
         # Default fallback from the function
         self.assertEqual(name, "이서연")
         self.assertEqual(rrn, "920202-2345678")
 
+    def test_update_reservations_bulk(self):
+        results = update_reservations_bulk({
+            "850101-1234567": {"status": "Cancelled", "bogus_field": "x"},
+            "920202-2345678": {"status": "Pending", "department": "내과"},
+            "000000-0000000": {"status": "Cancelled"},
+        })
+        self.assertEqual(results, {"850101-1234567": True, "920202-2345678": True, "000000-0000000": False})
+        self.assertEqual(lookup_reservation("김예약", "850101-1234567")["status"], "Cancelled")
+        updated = lookup_reservation("박테스트", "920202-2345678")
+        self.assertEqual(updated["status"], "Pending")
+        self.assertEqual(updated["department"], "내과")
+
+    def test_update_reservations_bulk_writes_once(self):
+        with patch('app.services.reservation_repository.append_bytes') as mock_append:
+            update_reservations_bulk({
+                "850101-1234567": {"status": "Cancelled"},
+                "920202-2345678": {"status": "Cancelled"},
+            })
+            mock_append.assert_called_once()
+
+    def test_update_reservations_bulk_missing_file(self):
+        os.remove(self.csv_path)
+        self.assertEqual(update_reservations_bulk({"850101-1234567": {"status": "Cancelled"}}),
+                         {"850101-1234567": False})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import patch
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.render_pool import RenderPool, RenderPoolBusyError
+from app.utils.pdf_generator import create_confirmation_pdf_bytes
+
+
+class TestRenderPool(unittest.TestCase):
+
+    def test_renders_in_worker_process(self):
+        pool = RenderPool(workers=1, max_pending=2, timeout=60)
+        self.addCleanup(pool.close)
+        self.assertNotEqual(pool.run(os.getpid), os.getpid())
+        pdf_bytes = pool.run(create_confirmation_pdf_bytes, patient_name="홍길동", patient_rrn="900101-1234567",
+                             disease_name="내과", date_of_diagnosis="2024-05-01", date_of_issue="2024-05-02")
+        self.assertTrue(pdf_bytes.startswith(b"%PDF"))
+        with self.assertRaises(ValueError):
+            pool.run(int, "not a number")  # Errors of the build come back to the caller
+        self.assertEqual(pool._slots._value, 2)  # Every slot was given back
+
+    def test_full_queue_is_refused(self):
+        pool = RenderPool(workers=1, max_pending=1, timeout=60)
+        self.addCleanup(pool.close)
+        pool._slots.acquire()  # One render already queued
+        with patch.object(pool, '_get_executor') as mock_executor:
+            with self.assertRaises(RenderPoolBusyError):
+                pool.run(os.getpid)
+        mock_executor.assert_not_called()
+
+    def test_timeout(self):
+        pool = RenderPool(workers=1, max_pending=2, timeout=0.5)
+        self.addCleanup(pool.close)
+        pool.warm_up()
+        started = time.monotonic()
+        with self.assertRaises(RenderPoolBusyError):
+            pool.run(time.sleep, 3)
+        self.assertLess(time.monotonic() - started, 2.5)
+
+    def test_without_workers_renders_in_process(self):
+        pool = RenderPool(workers=0)
+        with patch.object(pool, '_get_executor') as mock_executor:
+            self.assertEqual(pool.run(os.getpid), os.getpid())
+        mock_executor.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
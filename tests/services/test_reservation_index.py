@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import patch
+import os
+import random
+import shutil
+import tempfile
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.reservation_index import MmapReservationIndex, get_mmap_index
+from app.services.reservation_repository import ReservationRepository, read_journal
+from app.services.storage import DEFAULT_FIELDNAMES, get_reservation_reader
+from app.services import reception_service
+
+MOCK_RESERVATIONS_CSV_DATA = """name,rrn,time,department,location,doctor,status,prescription_names,total_fee
+김예약,850101-1234567,2025-06-19 08:20,내과,본관1층,닥터김,Pending,,0
+박테스트,920202-2345678,2025-06-19 09:00,외과,별관2층,닥터박,Registered,"진통제, 소염제",0
+"""
+
+
+class TestMmapReservationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        with open(self.csv_path, "w", encoding="utf-8-sig") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        self.index = MmapReservationIndex(self.csv_path)
+        self.repo = ReservationRepository(self.csv_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_lookups_match_repository(self):
+        for rrn in ("850101-1234567", "920202-2345678"):
+            self.assertEqual(self.index.get_by_rrn(rrn), self.repo.get_by_rrn(rrn))
+        self.assertEqual(self.index.get_by_rrn("920202-2345678")["prescription_names"], "진통제, 소염제")
+        self.assertEqual(self.index.find("김예약", "850101-1234567")["department"], "내과")
+        self.assertIsNone(self.index.find("박테스트", "850101-1234567"))
+        self.assertIsNone(self.index.get_by_rrn("000000-0000000"))
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.fieldnames[0], "name")  # BOM stripped
+
+    def test_appends_are_indexed_incrementally(self):
+        self.index.get_by_rrn("850101-1234567")
+        self.repo.append({"name": "신환자", "rrn": "010101-3000000", "status": "Registered"}, DEFAULT_FIELDNAMES)
+        with patch("app.services.reservation_index._Mapping") as new_mapping:
+            self.assertEqual(self.index.get_by_rrn("010101-3000000")["name"], "신환자")
+            new_mapping.assert_not_called()  # Same inode, grown file: no full rebuild
+        self.assertEqual(len(self.index), 3)
+
+    def test_partial_appended_line_waits_until_complete(self):
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            f.write("반쪽,770707-1000000,2025-06-19 10:00")
+        self.assertIsNone(self.index.get_by_rrn("770707-1000000"))
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            f.write(",내과,본관1층,닥터김,Pending,,0\n")
+        self.assertEqual(self.index.get_by_rrn("770707-1000000")["department"], "내과")
+
+    def test_journal_updates_are_overlaid(self):
+        self.repo.update("850101-1234567", {"status": "Paid", "total_fee": 15000})
+        row = self.index.get_by_rrn("850101-1234567")
+        self.assertEqual(row["status"], "Paid")
+        self.assertEqual(row["total_fee"], "15000")
+
+    def test_rebuilds_after_compaction(self):
+        self.index.get_by_rrn("850101-1234567")
+        self.repo.update("850101-1234567", {"status": "Paid"})
+        self.repo.compact()
+        self.assertEqual(self.index.get_by_rrn("850101-1234567")["status"], "Paid")
+        self.repo.update("850101-1234567", {"status": "Registered"})
+        self.assertEqual(self.index.get_by_rrn("850101-1234567")["status"], "Registered")
+
+    def test_compaction_during_a_journal_read_is_not_missed(self):
+        self.repo.update("850101-1234567", {"status": "Registered", "prescription_names": "감기약, 소화제, 해열제"})
+        self.index.get_by_rrn("850101-1234567")  # Read up to the end of the journal
+        self.repo.update("850101-1234567", {"doctor": "닥터이"})
+        raced = []
+
+        def compact_first(*args):
+            # The writer compacts and appends again after this reader mapped the CSV
+            if not raced:
+                raced.append(True)
+                self.repo.compact()
+                self.repo.update("920202-2345678", {"status": "Paid"})
+            return read_journal(*args)
+
+        with patch('app.services.reservation_index.read_journal', side_effect=compact_first):
+            self.assertEqual(self.index.get_by_rrn("920202-2345678")["status"], "Paid")
+        self.assertEqual(self.index.get_by_rrn("850101-1234567")["status"], "Registered")
+
+    def test_duplicate_rrn_first_row_wins(self):
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            f.write("동명이인,850101-1234567,2025-06-19 11:00,외과,별관2층,닥터박,Pending,,0\n")
+        self.repo.update("850101-1234567", {"status": "Paid"})
+        self.assertEqual(self.index.get_by_rrn("850101-1234567")["name"], "김예약")
+        later = self.index.find("동명이인", "850101-1234567")
+        self.assertEqual(later["department"], "외과")
+        self.assertEqual(later["status"], "Pending")  # Journal applies to the first row only
+
+    def test_sample_parses_one_line_and_applies_journal(self):
+        self.repo.update("850101-1234567", {"status": "Paid"})
+        with patch.object(self.index, "_parse", wraps=self.index._parse) as parse:
+            row = self.index.sample(random.Random(0))
+            self.assertEqual(parse.call_count, 1)
+        self.assertIn(row["name"], {"김예약", "박테스트"})
+        self.assertEqual(self.index.sample(random.Random(0), status="Paid")["name"], "김예약")
+        self.assertIsNone(self.index.sample(random.Random(0), status="Paid", day="2025-06-20"))
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            MmapReservationIndex(os.path.join(self.tmp_dir, "missing.csv")).get_by_rrn("850101-1234567")
+
+    def test_mmap_mode_is_opt_in(self):
+        self.assertIsInstance(get_reservation_reader(self.csv_path), ReservationRepository)
+        with patch('app.services.storage.RESERVATION_LOOKUP', 'mmap'), \
+             patch('app.services.reception_service.RESV_CSV', self.csv_path):
+            self.assertIs(get_reservation_reader(self.csv_path), get_mmap_index(self.csv_path))
+            self.assertEqual(reception_service.lookup_reservation("김예약", "850101-1234567")["status"], "Pending")
+
+
+if __name__ == '__main__':
+    unittest.main()
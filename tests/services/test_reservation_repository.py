@@ -0,0 +1,280 @@
+import unittest
+from unittest.mock import patch
+import csv
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.reservation_repository import _EMPTY, ReservationRepository, get_reservation_repository, read_journal
+from app.services.storage import Reservation
+from app.utils.file_lock import file_lock
+
+
+def _update_many(csv_path, rrns, status):
+    # Runs in a child process: a separate repository instance, like another worker
+    repo = ReservationRepository(csv_path, compact_threshold=7)
+    for rrn in rrns:
+        repo.update(rrn, {"status": status})
+
+
+MOCK_RESERVATIONS_CSV_DATA = """name,rrn,time,department,location,doctor,status,prescription_names,total_fee
+김예약,850101-1234567,2025-06-19 08:20,내과,본관1층,닥터김,Pending,,0
+박테스트,920202-2345678,2025-06-19 09:00,외과,별관2층,닥터박,Registered,,0
+"""
+
+
+class TestReservationRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        self.repo = ReservationRepository(self.csv_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _read_rows(self):
+        with open(self.csv_path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+
+    def test_lookups_use_indexes(self):
+        self.assertEqual(self.repo.get_by_rrn("920202-2345678")["name"], "박테스트")
+        self.assertEqual(self.repo.find("김예약", "850101-1234567")["department"], "내과")
+        self.assertIsNone(self.repo.find("박테스트", "850101-1234567"))
+        self.assertIsNone(self.repo.get_by_rrn("000000-0000000"))
+        self.assertEqual(len(self.repo), 2)
+
+    def test_file_is_parsed_once_while_unchanged(self):
+        self.repo.get_by_rrn("850101-1234567")
+        with patch('builtins.open') as mock_open_func:
+            self.repo.get_by_rrn("850101-1234567")
+            self.repo.find("박테스트", "920202-2345678")
+            self.repo.all()
+            mock_open_func.assert_not_called()
+
+    def test_reloads_when_file_changes(self):
+        self.assertIsNone(self.repo.get_by_rrn("990101-1111111"))
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            f.write("최신규,990101-1111111,2025-06-19 10:00,피부과,,,Pending,,0\n")
+        self.assertEqual(self.repo.get_by_rrn("990101-1111111")["name"], "최신규")
+
+    def test_returned_rows_are_read_only_snapshots(self):
+        row = self.repo.get_by_rrn("850101-1234567")
+        self.assertIsInstance(row, Reservation)
+        with self.assertRaises(TypeError):
+            row["status"] = "Changed"
+        with self.assertRaises(AttributeError):
+            row.status = "Changed"
+        self.repo.update("850101-1234567", {"status": "Paid"})
+        # An update swaps in a new record; the one handed out earlier is unchanged
+        self.assertEqual(row["status"], "Pending")
+        self.assertEqual(self.repo.get_by_rrn("850101-1234567").status, "Paid")
+
+    def test_rows_behave_like_dict_reader_rows(self):
+        with open(self.csv_path, newline="", encoding="utf-8-sig") as f:
+            expected = list(csv.DictReader(f))
+        self.assertEqual(self.repo.all(), expected)
+        row = self.repo.get_by_rrn("850101-1234567")
+        self.assertEqual(list(row), list(expected[0]))
+        self.assertEqual(row.to_dict(), expected[0])
+        self.assertNotIn("ticket_number", row)  # Not a column of this file
+        self.assertIsNone(row.get("ticket_number"))
+        # Equal cell values are shared between rows
+        self.assertIs(self.repo.all()[0]["total_fee"], self.repo.all()[1]["total_fee"])
+
+    def test_update_appends_to_journal_and_ignores_unknown_columns(self):
+        self.assertTrue(self.repo.update("850101-1234567", {"status": "Registered", "not_a_column": "x"}))
+        self.assertEqual(self.repo.get_by_rrn("850101-1234567")["status"], "Registered")
+        # The base file is untouched; the change lives in the journal
+        self.assertEqual(self._read_rows()[0]["status"], "Pending")
+        with open(self.repo.journal_path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        # A fresh instance (e.g. another worker) replays the journal on load
+        other = ReservationRepository(self.csv_path)
+        self.assertEqual(other.get_by_rrn("850101-1234567")["status"], "Registered")
+        self.assertNotIn("not_a_column", other.get_by_rrn("850101-1234567"))
+
+    def test_journal_records_from_other_instances_are_replayed(self):
+        other = ReservationRepository(self.csv_path)
+        self.repo.get_by_rrn("850101-1234567")
+        other.update("850101-1234567", {"status": "Paid"})
+        self.assertEqual(self.repo.get_by_rrn("850101-1234567")["status"], "Paid")
+
+    def test_partial_journal_line_is_ignored_until_complete(self):
+        self.repo.get_by_rrn("850101-1234567")
+        with open(self.repo.journal_path, "wb") as f:
+            f.write(b'{"rrn": "850101-1234567", "fields": {"status": "Pa')
+        self.assertEqual(self.repo.get_by_rrn("850101-1234567")["status"], "Pending")
+        with open(self.repo.journal_path, "ab") as f:
+            f.write(b'id"}}\n')
+        self.assertEqual(self.repo.get_by_rrn("850101-1234567")["status"], "Paid")
+
+    def test_compaction_folds_journal_into_csv(self):
+        repo = ReservationRepository(self.csv_path, compact_threshold=2)
+        repo.update("850101-1234567", {"status": "Registered"})
+        self.assertEqual(self._read_rows()[0]["status"], "Pending")
+        repo.update("920202-2345678", {"status": "Paid", "total_fee": 5000})
+        rows = self._read_rows()
+        self.assertEqual(rows[0]["status"], "Registered")
+        self.assertEqual(rows[1]["status"], "Paid")
+        self.assertEqual(rows[1]["total_fee"], "5000")
+        self.assertEqual(os.path.getsize(repo.journal_path), 0)
+        self.assertEqual(ReservationRepository(self.csv_path).get_by_rrn("920202-2345678")["status"], "Paid")
+
+    def test_compaction_during_a_journal_read_is_not_missed(self):
+        writer = ReservationRepository(self.csv_path)  # Another worker process
+        writer.update("850101-1234567", {"status": "Registered", "prescription_names": "감기약, 소화제, 해열제"})
+        self.repo.get_by_rrn("850101-1234567")  # Read up to the end of the journal
+        writer.update("850101-1234567", {"doctor": "닥터이"})
+        raced = []
+
+        def compact_first(*args):
+            # The writer compacts and appends again after this reader checked the CSV
+            if not raced:
+                raced.append(True)
+                writer.compact()
+                writer.update("920202-2345678", {"status": "Paid"})
+            return read_journal(*args)
+
+        with patch('app.services.reservation_repository.read_journal', side_effect=compact_first):
+            self.assertEqual(self.repo.get_by_rrn("920202-2345678")["status"], "Paid")
+            self.assertEqual(self.repo.get_by_rrn("850101-1234567")["status"], "Registered")
+        self.assertEqual(self.repo.signature(), writer.signature())
+
+    def test_concurrent_processes_do_not_lose_updates(self):
+        rrns = [f"800101-{i:07d}" for i in range(40)]
+        with open(self.csv_path, "a", encoding="utf-8") as f:
+            for rrn in rrns:
+                f.write(f"환자,{rrn},2025-06-19 10:00,내과,,,Pending,,0\n")
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_update_many, args=(self.csv_path, rrns[i::4], f"Done{i}"))
+                   for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+        repo = ReservationRepository(self.csv_path)
+        for i, rrn in enumerate(rrns):
+            self.assertEqual(repo.get_by_rrn(rrn)["status"], f"Done{i % 4}")
+        # Compactions ran while others were appending; the base CSV stays well-formed
+        self.assertEqual(len(self._read_rows()), len(rrns) + 2)
+        self.assertEqual([n for n in os.listdir(self.tmp_dir) if n.endswith(".tmp")], [])
+
+    def test_readers_serve_snapshot_while_write_in_flight(self):
+        self.assertEqual(self.repo.get_by_rrn("850101-1234567")["status"], "Pending")
+        ReservationRepository(self.csv_path).update("850101-1234567", {"status": "Paid"})
+        result = {}
+
+        def read():
+            result["status"] = self.repo.get_by_rrn("850101-1234567")["status"]
+
+        with self.repo._lock:  # Simulate a writer thread holding the repository
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(2)
+            self.assertFalse(reader.is_alive())
+        self.assertEqual(result["status"], "Pending")
+        self.assertEqual(self.repo.get_by_rrn("850101-1234567")["status"], "Paid")
+
+    def test_failed_compaction_leaves_csv_intact(self):
+        self.repo.update("850101-1234567", {"status": "Registered"})
+        with open(self.csv_path, "rb") as f:
+            before = f.read()
+        with patch('app.utils.file_lock.os.replace', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.repo.compact()
+        with open(self.csv_path, "rb") as f:
+            self.assertEqual(f.read(), before)
+        self.assertEqual([n for n in os.listdir(self.tmp_dir) if n.endswith(".tmp")], [])
+        self.assertEqual(ReservationRepository(self.csv_path).get_by_rrn("850101-1234567")["status"], "Registered")
+
+    def test_sample_streams_file_until_loaded(self):
+        ReservationRepository(self.csv_path).update("920202-2345678", {"status": "Paid"})
+        rng = random.Random(3)
+        self.assertEqual(self.repo.sample(rng, status="Paid")["name"], "박테스트")
+        self.assertIs(self.repo._snapshot, _EMPTY)  # Streamed, not indexed
+        self.repo.get_by_rrn("850101-1234567")
+        self.assertEqual(self.repo.sample(rng, status="Paid")["name"], "박테스트")
+        self.assertIsNone(self.repo.sample(rng, status="Pending", day="2025-06-20"))
+        self.assertIn(self.repo.sample(rng)["rrn"], {"850101-1234567", "920202-2345678"})
+
+    def test_on_commit_runs_under_the_write_lock(self):
+        seen = []
+        other_writer = threading.Event()
+
+        def write_elsewhere():
+            with file_lock(self.repo.lock_path):
+                other_writer.set()
+
+        def on_commit(applied):
+            # Another writer waits on the lock file until the change is logged
+            threading.Thread(target=write_elsewhere, daemon=True).start()
+            self.assertFalse(other_writer.wait(0.2))
+            seen.extend((rrn, fields, previous["status"]) for rrn, fields, previous in applied)
+            raise OSError("change log unavailable")
+
+        with self.assertRaises(OSError):  # Not swallowed: the caller learns the change was not logged
+            self.repo.update_many({"850101-1234567": {"status": "Paid", "bogus": "x"},
+                                   "000000-0000000": {"status": "Paid"}}, on_commit)
+        self.assertTrue(other_writer.wait(5))
+        self.assertEqual(seen, [("850101-1234567", {"status": "Paid"}, "Pending")])
+        self.repo.append({"name": "이신규", "rrn": "010101-3000000", "status": "Registered"}, [], seen.extend)
+        self.assertEqual(seen[-1], ("010101-3000000",
+                                    {"name": "이신규", "rrn": "010101-3000000", "status": "Registered"}, None))
+
+    def test_seal_runs_under_the_write_lock_and_keeps_the_lock_file(self):
+        self.repo.update("850101-1234567", {"status": "Paid"})
+        other_writer = threading.Event()
+
+        def write_elsewhere():
+            with file_lock(self.repo.lock_path):
+                other_writer.set()
+
+        def finish():
+            # E.g. compressing the sealed CSV: no other writer gets in meanwhile
+            threading.Thread(target=write_elsewhere, daemon=True).start()
+            self.assertFalse(other_writer.wait(0.2))
+            self.assertFalse(os.path.exists(self.repo.journal_path))
+
+        self.repo.seal(finish)
+        self.assertTrue(other_writer.wait(5))
+        self.assertTrue(os.path.exists(self.repo.lock_path))
+        self.assertEqual(ReservationRepository(self.csv_path).get_by_rrn("850101-1234567")["status"], "Paid")
+
+    def test_update_unknown_rrn(self):
+        self.assertFalse(self.repo.update("000000-0000000", {"status": "Paid"}))
+
+    def test_append_keeps_existing_header(self):
+        self.repo.append({"name": "신환자", "rrn": "010101-3000000", "ticket_number": "X1", "status": "Registered"},
+                         ["name", "rrn", "ticket_number", "status"])
+        self.assertEqual(self.repo.get_by_rrn("010101-3000000")["status"], "Registered")
+        rows = self._read_rows()
+        self.assertEqual(rows[-1]["name"], "신환자")
+        self.assertNotIn("ticket_number", rows[-1])
+
+    def test_append_creates_missing_file(self):
+        os.remove(self.csv_path)
+        self.repo.append({"name": "신환자", "rrn": "010101-3000000"}, ["name", "rrn"])
+        self.assertEqual(self._read_rows(), [{"name": "신환자", "rrn": "010101-3000000"}])
+
+    def test_missing_file_raises(self):
+        os.remove(self.csv_path)
+        with self.assertRaises(FileNotFoundError):
+            self.repo.get_by_rrn("850101-1234567")
+
+    def test_shared_instance_per_path(self):
+        self.assertIs(get_reservation_repository(self.csv_path), get_reservation_repository(self.csv_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
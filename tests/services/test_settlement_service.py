@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.settlement_service import export_csv, export_jsonl, settlement_records, settlement_rows
+from app.services.storage import get_payment_store
+
+MOCK_RESERVATIONS_CSV_DATA = """name,rrn,time,department,location,doctor,status,prescription_names,total_fee
+김예약,850101-1234567,2025-06-19 08:20,내과,본관1층,닥터김,Paid,감기약 처방,5000
+박테스트,920202-2345678,2025-06-19 09:00,외과,별관2층,닥터박,Paid,,0
+"""
+
+
+def _payment(payment_id, patient_id, timestamp, amount, method="card"):
+    return {"payment_id": payment_id, "patient_id": patient_id, "amount": amount,
+            "method": method, "status": "completed", "timestamp": timestamp}
+
+
+class TestSettlementService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        for target, value in (('app.services.settlement_service.RESV_CSV', self.csv_path),
+                              ('app.services.storage.PAYMENT_LEDGER', os.path.join(self.tmp_dir, "payments.jsonl"))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        store = get_payment_store()
+        store.add_payment(_payment("p-1", "850101-1234567", "2025-06-19T09:10:00.000", 5000))
+        store.add_payment(_payment("p-2", "920202-2345678", "2025-06-19T10:00:00.000", 15000, "cash"))
+        store.add_payment(_payment("p-3", "000000-0000000", "2025-06-19T11:00:00.000", 1000))
+        store.add_payment(_payment("p-4", "850101-1234567", "2025-06-20T09:00:00.000", 7000))
+        # A committed payment keeps the prescriptions it charged, even if the reservation changed since
+        store.add_payment(dict(_payment("p-5", "920202-2345678", "2025-06-19T12:00:00.000", 20000),
+                               reservation={"rrn": "920202-2345678",
+                                            "fields": {"prescription_names": "물리치료", "total_fee": "20000"}}))
+
+    def test_rows_are_joined_with_reservations(self):
+        rows = list(settlement_rows("2025-06-19"))
+        self.assertEqual([row["payment_id"] for row in rows], ["p-1", "p-2", "p-3", "p-5"])
+        self.assertEqual((rows[0]["department"], rows[0]["prescription_names"]), ("내과", "감기약 처방"))
+        self.assertEqual(rows[0]["patient_id"], "850101-1******")  # Exports never carry a full RRN
+        self.assertEqual((rows[2]["department"], rows[2]["prescription_names"]), ("", ""))
+        self.assertEqual((rows[3]["department"], rows[3]["prescription_names"]), ("외과", "물리치료"))
+
+    def test_subtotals_follow_the_payments(self):
+        records = list(settlement_records("2025-06-19"))
+        self.assertEqual([record["record"] for record in records[4:]],
+                         ["department_total"] * 3 + ["method_total"] * 2 + ["total"])
+        subtotals = {(record["record"], record.get("department", record.get("method"))): (record["count"], record["amount"])
+                     for record in records[4:-1]}
+        self.assertEqual(subtotals, {
+            ("department_total", ""): (1, 1000),
+            ("department_total", "내과"): (1, 5000),
+            ("department_total", "외과"): (2, 35000),
+            ("method_total", "card"): (3, 26000),
+            ("method_total", "cash"): (1, 15000),
+        })
+        self.assertEqual(records[-1], {"record": "total", "count": 4, "amount": 41000})
+
+    def test_export_formats(self):
+        lines = list(export_jsonl(settlement_records("2025-06-20")))
+        self.assertEqual([json.loads(line)["record"] for line in lines],
+                         ["payment", "department_total", "method_total", "total"])
+        rows = list(csv.DictReader(io.StringIO("".join(export_csv(settlement_records("2025-06-20"))))))
+        self.assertEqual(rows[0]["payment_id"], "p-4")
+        self.assertEqual(rows[-1], dict.fromkeys(rows[-1], "") | {"record": "total", "count": "1", "amount": "7000"})
+        self.assertEqual("".join(export_csv([])).strip(), ",".join(rows[0].keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
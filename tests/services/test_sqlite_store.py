@@ -0,0 +1,171 @@
+import unittest
+from unittest.mock import patch
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.sqlite_store import SqliteStore, import_reservations_csv
+from app.services.payment_ledger import PaymentLedger
+from app.services.storage import DuplicatePaymentError, get_payment_store, get_reservation_store
+from app.services.reservation_repository import ReservationRepository
+from app.services import reception_service, payment_service
+
+MOCK_RESERVATIONS_CSV_DATA = """name,rrn,time,department,location,doctor,status,prescription_names,total_fee
+김예약,850101-1234567,2025-06-19 08:20,내과,본관1층,닥터김,Pending,,0
+박테스트,920202-2345678,2025-06-19 09:00,외과,별관2층,닥터박,Registered,,0
+"""
+
+
+class TestSqliteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        self.db_path = os.path.join(self.tmp_dir, "kiosk.sqlite3")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        patcher = patch('app.services.change_log.CHANGE_LOG', os.path.join(self.tmp_dir, "changes.jsonl"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_schema_uses_wal_and_indexes(self):
+        SqliteStore(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({"idx_reservations_rrn", "idx_reservations_department",
+                         "idx_reservations_status"} <= indexes)
+        conn.close()
+
+    def test_import_and_lookup(self):
+        self.assertEqual(import_reservations_csv(self.csv_path, self.db_path), 2)
+        store = SqliteStore(self.db_path)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get_by_rrn("920202-2345678")["name"], "박테스트")
+        self.assertEqual(store.find("김예약", "850101-1234567")["department"], "내과")
+        self.assertIsNone(store.find("박테스트", "850101-1234567"))
+        # Columns missing from the CSV are stored as empty strings
+        self.assertEqual(store.get_by_rrn("850101-1234567")["ticket_number"], "")
+
+    def test_import_includes_journal_and_replace(self):
+        ReservationRepository(self.csv_path).update("850101-1234567", {"status": "Registered"})
+        import_reservations_csv(self.csv_path, self.db_path)
+        import_reservations_csv(self.csv_path, self.db_path, replace=True)
+        store = SqliteStore(self.db_path)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get_by_rrn("850101-1234567")["status"], "Registered")
+
+    def test_import_missing_csv(self):
+        with self.assertRaises(FileNotFoundError):
+            import_reservations_csv(os.path.join(self.tmp_dir, "missing.csv"), self.db_path)
+
+    def test_update_and_append(self):
+        store = SqliteStore(self.db_path)
+        store.append({"name": "신환자", "rrn": "010101-3000000", "status": "Registered"})
+        signature = store.signature()
+        self.assertTrue(store.update("010101-3000000", {"status": "Paid", "total_fee": 12000, "bogus": "x"}))
+        self.assertNotEqual(store.signature(), signature)
+        row = store.get_by_rrn("010101-3000000")
+        self.assertEqual(row["status"], "Paid")
+        self.assertEqual(row["total_fee"], "12000")
+        self.assertFalse(store.update("000000-0000000", {"status": "Paid"}))
+
+    def test_sample_filters_in_sql(self):
+        import_reservations_csv(self.csv_path, self.db_path)
+        store = SqliteStore(self.db_path)
+        rng = random.Random(1)
+        self.assertIn(store.sample(rng)["name"], {"김예약", "박테스트"})
+        self.assertEqual(store.sample(rng, status="Pending", day="2025-06-19")["name"], "김예약")
+        self.assertIsNone(store.sample(rng, status="Pending", day="2025-06-20"))
+        plan = store._connect().execute("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM reservations "
+                                        "WHERE time >= ? AND time < ?", ("2025-06-19", "2025-06-19\uffff")).fetchall()
+        self.assertIn("idx_reservations_time", str(plan))
+
+    def test_payments(self):
+        store = SqliteStore(self.db_path)
+        record = {"payment_id": "p-1", "patient_id": "850101-1234567", "amount": 5000,
+                  "method": "card", "status": "completed", "timestamp": "2025-06-19T09:00:00"}
+        store.add_payment(record)
+        self.assertEqual(store.get_payment("p-1"), record)
+        self.assertIsNone(store.get_payment("p-2"))
+        self.assertEqual(store.payments_for_patient("850101-1234567"), [record])
+        self.assertEqual(store.payments_between("2025-06-19", "2025-06-20"), [record])
+        self.assertEqual(list(store.iter_payments_between("2025-06-19", "2025-06-20")), [record])
+        self.assertEqual(store.payments_between("2025-06-20", "2025-06-21"), [])
+
+    def test_commit_payment_is_one_transaction(self):
+        import_reservations_csv(self.csv_path, self.db_path)
+        store = SqliteStore(self.db_path)
+        record = {"payment_id": "p-1", "patient_id": "850101-1234567", "amount": 5000,
+                  "method": "card", "status": "completed", "timestamp": "2025-06-19T09:00:00"}
+        fields = {"prescription_names": "감기약", "total_fee": "5000", "status": "Paid"}
+        self.assertTrue(store.commit_payment(record, store, "850101-1234567", fields))
+        self.assertEqual(store.get_by_rrn("850101-1234567")["total_fee"], "5000")
+        self.assertEqual(store.get_payment("p-1"), record)
+        # A failing payment insert (duplicate id) rolls the reservation update back too
+        with self.assertRaises(sqlite3.IntegrityError):
+            store.commit_payment(record, store, "920202-2345678", fields)
+        self.assertEqual(store.get_by_rrn("920202-2345678")["status"], "Registered")
+        self.assertFalse(store.commit_payment(dict(record, payment_id="p-2"), store, "000000-0000000", fields))
+        self.assertIsNone(store.get_payment("p-2"))
+
+    def test_idempotency_key_is_stored_with_the_payment(self):
+        import_reservations_csv(self.csv_path, self.db_path)
+        store = SqliteStore(self.db_path)
+        record = {"payment_id": "p-1", "patient_id": "850101-1234567", "amount": 5000,
+                  "method": "card", "status": "completed", "timestamp": "2025-06-19T09:00:00"}
+        fields = {"prescription_names": "감기약", "total_fee": "5000", "status": "Paid"}
+        self.assertTrue(store.commit_payment(dict(record, idempotency_key="k-1"), store, "850101-1234567", fields))
+        other = SqliteStore(self.db_path)  # Another worker process
+        self.assertEqual(other.payment_for_key("k-1"), record)
+        self.assertIsNone(other.payment_for_key("k-2"))
+        with self.assertRaises(DuplicatePaymentError) as caught:
+            other.commit_payment(dict(record, payment_id="p-2", idempotency_key="k-1"), other, "920202-2345678", fields)
+        self.assertEqual(caught.exception.payment_id, "p-1")
+        self.assertIsNone(other.get_payment("p-2"))
+        self.assertEqual(other.get_by_rrn("920202-2345678")["status"], "Registered")
+
+    def test_on_commit_failure_rolls_back(self):
+        import_reservations_csv(self.csv_path, self.db_path)
+        store = SqliteStore(self.db_path)
+        seen = []
+
+        def on_commit(applied):
+            seen.extend((rrn, fields, previous["status"]) for rrn, fields, previous in applied)
+            raise OSError("change log unavailable")
+
+        with self.assertRaises(OSError):
+            store.update_many({"850101-1234567": {"status": "Paid"}, "000000-0000000": {"status": "Paid"}}, on_commit)
+        self.assertEqual(seen, [("850101-1234567", {"status": "Paid"}, "Pending")])
+        self.assertEqual(store.get_by_rrn("850101-1234567")["status"], "Pending")  # Never written
+        self.assertTrue(store.update("850101-1234567", {"status": "Registered"}, seen.extend))
+        self.assertEqual(seen[-1][:2], ("850101-1234567", {"status": "Registered"}))
+
+    def test_services_use_sqlite_backend_when_configured(self):
+        import_reservations_csv(self.csv_path, self.db_path)
+        with patch('app.services.storage.STORAGE_BACKEND', 'sqlite'), \
+             patch('app.services.storage.SQLITE_DB', self.db_path):
+            self.assertIsInstance(get_reservation_store(self.csv_path), SqliteStore)
+            self.assertTrue(reception_service.update_reservation_status("850101-1234567", "Registered"))
+            self.assertEqual(reception_service.lookup_reservation("김예약", "850101-1234567")["status"], "Registered")
+            pay_id = payment_service.process_new_payment("850101-1234567", 5000, "card")
+            self.assertEqual(payment_service.get_payment_details(pay_id)["amount"], 5000)
+            self.assertEqual(payment_service.get_patient_payments("850101-1234567")[0]["payment_id"], pay_id)
+
+    def test_csv_backend_is_default(self):
+        self.assertIsInstance(get_reservation_store(self.csv_path), ReservationRepository)
+        with patch('app.services.storage.PAYMENT_LEDGER', os.path.join(self.tmp_dir, "payments.jsonl")):
+            self.assertIsInstance(get_payment_store(), PaymentLedger)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import sys
+from datetime import date
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.ticket_allocator import TicketAllocator, format_ticket
+
+
+def _issue_many(directory, department, count, queue):
+    # Runs in a child process: its own allocator, like another kiosk worker
+    allocator = TicketAllocator(directory)
+    queue.put([allocator.issue(department) for _ in range(count)])
+
+
+class TestTicketAllocator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.today = date(2025, 6, 19)
+        self.allocator = TicketAllocator(self.tmp_dir, today=lambda: self.today)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_counters_are_per_department_and_monotonic(self):
+        self.assertEqual(self.allocator.issue("내과"), "내과-001")
+        self.assertEqual(self.allocator.issue("내분비내과"), "내분비내과-001")
+        self.assertEqual(self.allocator.issue("내과"), "내과-002")
+        self.assertEqual(self.allocator.last_issued("내과"), 2)
+        self.assertEqual(format_ticket("외과", 12), "외과-012")
+
+    def test_counters_survive_restart_and_reset_daily(self):
+        self.allocator.issue("내과")
+        self.allocator.issue("내과")
+        restarted = TicketAllocator(self.tmp_dir, today=lambda: self.today)
+        self.assertEqual(restarted.issue("내과"), "내과-003")
+        self.today = date(2025, 6, 20)
+        self.assertEqual(restarted.issue("내과"), "내과-001")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, "2025-06-20.log")))
+
+    def test_instances_share_the_log(self):
+        other = TicketAllocator(self.tmp_dir, today=lambda: self.today)
+        self.assertEqual(self.allocator.issue("외과"), "외과-001")
+        self.assertEqual(other.issue("외과"), "외과-002")
+        self.assertEqual(self.allocator.issue("외과"), "외과-003")
+
+    def test_partial_line_from_crashed_writer_is_skipped(self):
+        self.allocator.issue("외과")
+        with open(os.path.join(self.tmp_dir, "2025-06-19.log"), "ab") as f:
+            f.write("외과\t".encode("utf-8"))
+        other = TicketAllocator(self.tmp_dir, today=lambda: self.today)
+        self.assertEqual(other.issue("외과"), "외과-002")
+        self.assertEqual(self.allocator.issue("외과"), "외과-003")
+
+    def test_threads_never_get_duplicates(self):
+        issued = []
+        threads = [threading.Thread(target=lambda: issued.extend(self.allocator.issue("내과") for _ in range(50)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(issued), [format_ticket("내과", n) for n in range(1, 201)])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_processes_never_get_duplicates(self):
+        ctx = multiprocessing.get_context("fork")
+        queue = ctx.Queue()
+        workers = [ctx.Process(target=_issue_many, args=(self.tmp_dir, "내과", 40, queue)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        issued = [ticket for _ in workers for ticket in queue.get(timeout=30)]
+        for worker in workers:
+            worker.join()
+        self.assertEqual(sorted(issued), [format_ticket("내과", n) for n in range(1, 121)])
+
+
+if __name__ == '__main__':
+    unittest.main()
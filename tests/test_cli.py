@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch
+import io
+import os
+import shutil
+import tempfile
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.cli import main, read_changes_file
+
+MOCK_RESERVATIONS_CSV_DATA = """name,rrn,time,department,location,doctor,status,prescription_names,total_fee
+김예약,850101-1234567,2025-06-19 08:20,내과,본관1층,닥터김,Pending,,0
+박테스트,920202-2345678,2025-06-19 09:00,외과,별관2층,닥터박,Pending,,0
+"""
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "reservations.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write(MOCK_RESERVATIONS_CSV_DATA)
+        patcher = patch('app.services.change_log.CHANGE_LOG', os.path.join(self.tmp_dir, "changes.jsonl"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_read_changes_csv_skips_empty_cells(self):
+        path = self._write("changes.csv", "rrn,status,department\n850101-1234567,Cancelled,\n920202-2345678,,내과\n")
+        self.assertEqual(read_changes_file(path), {
+            "850101-1234567": {"status": "Cancelled"},
+            "920202-2345678": {"department": "내과"},
+        })
+
+    def test_read_changes_jsonl_merges_repeated_rrns(self):
+        path = self._write("changes.jsonl",
+                           '{"rrn": "850101-1234567", "status": "Pending"}\n\n'
+                           '{"rrn": "850101-1234567", "department": "외과"}\n')
+        self.assertEqual(read_changes_file(path), {"850101-1234567": {"status": "Pending", "department": "외과"}})
+
+    def test_read_changes_requires_rrn(self):
+        path = self._write("changes.jsonl", '{"status": "Pending"}\n')
+        with self.assertRaises(ValueError):
+            read_changes_file(path)
+
+    def test_bulk_update_command(self):
+        path = self._write("changes.csv", "rrn,status\n850101-1234567,Cancelled\n000000-0000000,Cancelled\n")
+        with patch('app.services.reception_service.RESV_CSV', self.csv_path), \
+             patch('sys.stdout', new_callable=io.StringIO) as out:
+            exit_code = main(["bulk-update", path])
+        self.assertEqual(exit_code, 2)
+        self.assertIn("Updated 1 of 2 reservations", out.getvalue())
+        self.assertIn("not updated: 000000-0000000", out.getvalue())
+
+    def test_recover_payments_command(self):
+        with patch('app.services.payment_service.recover_payment_commits', return_value=3) as mock_recover, \
+             patch('sys.stdout', new_callable=io.StringIO) as out:
+            self.assertEqual(main(["recover-payments", "--since", "2025-06-19"]), 0)
+        mock_recover.assert_called_once_with("2025-06-19")
+        self.assertIn("Re-applied 3 committed payments", out.getvalue())
+
+    def test_settlement_command(self):
+        output = os.path.join(self.tmp_dir, "settlement.jsonl")
+        records = [{"record": "total", "count": 0, "amount": 0}]
+        with patch('app.services.settlement_service.settlement_records', return_value=iter(records)) as mock_records:
+            self.assertEqual(main(["settlement", "--date", "2025-06-19", "--format", "jsonl", "--output", output]), 0)
+        mock_records.assert_called_once_with("2025-06-19")
+        with open(output, encoding="utf-8") as f:
+            self.assertEqual(f.read(), '{"record": "total", "count": 0, "amount": 0}\n')
+        with patch('sys.stderr', new_callable=io.StringIO):
+            self.assertEqual(main(["settlement", "--date", "19/06/2025"]), 1)
+
+    def test_import_reservations_command(self):
+        db_path = os.path.join(self.tmp_dir, "kiosk.sqlite3")
+        with patch('sys.stdout', new_callable=io.StringIO) as out:
+            self.assertEqual(main(["import-reservations", "--csv", self.csv_path, "--db", db_path]), 0)
+        self.assertIn("Imported 2 reservations", out.getvalue())
+
+    def test_partition_reservations_command(self):
+        part_dir = os.path.join(self.tmp_dir, "partitions")
+        with patch('sys.stdout', new_callable=io.StringIO) as out:
+            self.assertEqual(main(["partition-reservations", "--csv", self.csv_path,
+                                   "--dir", part_dir, "--compress"]), 0)
+        self.assertIn("Wrote 2 reservations into 1 day partitions", out.getvalue())
+        # 2025-06-19 is in the past, so it was sealed and compressed right away
+        self.assertEqual([name for name in os.listdir(part_dir) if name.endswith((".csv", ".gz"))],
+                         ["2025-06-19.csv.gz"])
+
+
+if __name__ == '__main__':
+    unittest.main()
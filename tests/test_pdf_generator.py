@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fpdf import FPDF
+
+from app.utils import pdf_generator
+from app.utils.pdf_generator import (
+    create_confirmation_pdf_bytes,
+    create_prescription_pdf_bytes,
+    get_certificate_template,
+    render_certificate,
+)
+
+PRESCRIPTION = ("홍길동", "900101-1234567", "내과",
+                [{"name": "감기약 처방", "fee": 5000}, {"name": "소화제 처방", "fee": 6000}],
+                11000, "김의사", "2025-06-19")
+CONFIRMATION = ("홍길동", "900101-1234567", "감기", "2025-06-18", "2025-06-19")
+
+REFERRAL_LAYOUT = {
+    "size": 12,
+    "elements": [
+        {"type": "text", "text": "진료의뢰서", "size": 20, "h": 15, "align": "C"},
+        {"type": "row", "h": 7, "cells": [{"w": 60, "text": "환자 성명"}, {"w": 0, "text": "{patient_name}"}]},
+        {"type": "paragraph", "h": 7, "height": 21, "text": "{patient_name} 님을 {hospital}에 의뢰합니다."},
+        {"type": "table", "rows": "items", "h": 8, "size": 10,
+         "columns": [{"header": "항목", "w": 100, "text": "{name}", "default": "N/A"}]},
+        {"type": "text", "text": "발행: {{중앙대 보건소}}", "h": 7}
+    ]
+}
+
+
+def _without_dates(pdf_bytes):
+    # Creation date, and the file /ID hashed from it
+    return re.sub(rb"/ID \[[^]]*\]", b"", re.sub(rb"D:\d+[^)]*", b"", pdf_bytes))
+
+
+@unittest.skipUnless(os.path.exists(pdf_generator.KOREAN_FONT_PATH), "Korean font not installed")
+class TestPdfGenerator(unittest.TestCase):
+
+    def setUp(self):
+        pdf_generator._font_cache.clear()
+        pdf_generator._templates.clear()
+        self.addCleanup(pdf_generator._templates.clear)
+
+    def test_font_is_parsed_once(self):
+        with patch.object(FPDF, 'add_font', autospec=True, side_effect=FPDF.add_font) as mock_add_font:
+            self.assertTrue(pdf_generator.warm_up_fonts())
+            create_prescription_pdf_bytes(*PRESCRIPTION)
+            create_confirmation_pdf_bytes(*CONFIRMATION)
+            create_prescription_pdf_bytes(*PRESCRIPTION)
+        self.assertEqual(mock_add_font.call_count, 1)
+
+    def test_static_layout_is_compiled_once(self):
+        with patch.object(pdf_generator.CertificateTemplate, '_compile',
+                          autospec=True, side_effect=pdf_generator.CertificateTemplate._compile) as mock_compile:
+            first = create_prescription_pdf_bytes(*PRESCRIPTION)
+            second = create_prescription_pdf_bytes(*PRESCRIPTION)  # After the first PDF subset its font
+            create_confirmation_pdf_bytes(*CONFIRMATION)
+        self.assertEqual(mock_compile.call_count, 2)
+        self.assertTrue(first.startswith(b"%PDF"))
+        self.assertEqual(_without_dates(first), _without_dates(second))
+        # Fields before the table are stamped; the table rows and the footer are laid out per PDF
+        template = get_certificate_template("prescription")
+        self.assertEqual([stamp[5] for stamp in template._stamps],
+                         ["발행일: {issue_date}", "환자 성명: {patient_name}",
+                          "주민등록번호: {patient_rrn}", "진료과: {department}"])
+        self.assertEqual(template.elements[template._resume[0]]["type"], "table")
+
+    def test_new_certificate_type_from_layout_file(self):
+        layout_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, layout_dir, True)
+        with open(os.path.join(layout_dir, "referral.ko.json"), "w", encoding="utf-8") as f:
+            json.dump(REFERRAL_LAYOUT, f, ensure_ascii=False)
+        with patch.object(pdf_generator, 'LAYOUT_DIR', layout_dir):
+            pdf_bytes = render_certificate("referral", {"patient_name": "홍길동", "hospital": "중앙대병원",
+                                                        "items": [{"name": "진료기록"}, {}]}, lang="en")
+            template = get_certificate_template("referral", "en")  # No English layout: Korean one
+            self.assertIs(template, get_certificate_template("referral"))
+            with self.assertRaises(ValueError):
+                get_certificate_template("discharge")
+            with self.assertRaises(ValueError):
+                get_certificate_template("../referral")
+            self.assertEqual(pdf_generator.layout_fingerprint("referral", "en"), template.fingerprint)
+        self.assertTrue(pdf_bytes.startswith(b"%PDF"))
+        self.assertEqual([(stamp[0], stamp[5]) for stamp in template._stamps],
+                         [("cell", "{patient_name}"), ("paragraph", "{patient_name} 님을 {hospital}에 의뢰합니다.")])
+        self.assertEqual(template._resume[0], 3)
+
+    def test_missing_font(self):
+        with patch.object(pdf_generator, 'KOREAN_FONT_PATH', os.path.join(pdf_generator.FONT_DIR, "missing.ttf")):
+            self.assertFalse(pdf_generator.warm_up_fonts())
+            with self.assertRaises(pdf_generator.MissingKoreanFontError):
+                create_prescription_pdf_bytes(*PRESCRIPTION)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import json
+import os
+import sys
+from unittest.mock import patch
+
+from flask import Flask
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.routes.queue import queue_bp
+from app.services.event_bus import EventBus, publish_status_change
+
+
+class TestQueueStream(unittest.TestCase):
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(queue_bp)
+        self.client = app.test_client()
+        self.bus = EventBus()
+        for target, value in (('app.routes.queue.get_event_bus', lambda: self.bus),
+                              ('app.services.event_bus._bus', self.bus),
+                              ('app.routes.queue.get_queue_board', lambda: [])):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_status_change_reaches_subscriber(self):
+        response = self.client.get("/queue/stream", buffered=False)
+        self.addCleanup(response.close)
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b"retry: 3000\n\n")
+        self.assertIn(b"event: snapshot", next(chunks))
+        record = {"name": "김예약", "rrn": "850101-1234567", "department": "내과", "ticket_number": "내과-003"}
+        publish_status_change(record, "Paid")
+        lines = next(chunks).decode("utf-8").splitlines()
+        self.assertIn("event: status_changed", lines)
+        data = json.loads(next(line for line in lines if line.startswith("data: "))[len("data: "):])
+        self.assertEqual(data, {"ticket": "내과-003", "department": "내과", "status": "Paid"})
+
+    def test_board_handles_every_published_event(self):
+        template = os.path.join(os.path.dirname(__file__), '..', 'templates', 'queue_board.html')
+        with open(template, encoding="utf-8") as f:
+            html = f.read()
+        for event_type in ("snapshot", "queue_changed", "ticket_called", "status_changed"):
+            self.assertIn(f"addEventListener('{event_type}'", html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import patch
+import os
+import runpy
+import sys
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+RUN_PY = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'run.py'))
+
+
+class TestRunScript(unittest.TestCase):
+
+    def _run(self, run_name, werkzeug_run_main=None):
+        env = {key: value for key, value in os.environ.items() if key != "WERKZEUG_RUN_MAIN"}
+        if werkzeug_run_main is not None:
+            env["WERKZEUG_RUN_MAIN"] = werkzeug_run_main
+        with patch.dict(os.environ, env, clear=True), patch('app.create_app') as mock_create_app:
+            runpy.run_path(RUN_PY, run_name=run_name)
+        return mock_create_app
+
+    def test_pdf_worker_reimport_builds_no_app(self):
+        self._run("__mp_main__").assert_not_called()
+
+    def test_reloader_watcher_skips_warm_up(self):
+        watcher = self._run("__main__")
+        watcher.assert_called_once_with(warm_up=False)
+        watcher.return_value.run.assert_called_once()
+        self._run("__main__", werkzeug_run_main="true").assert_called_once_with(warm_up=True)
+
+    def test_imported_by_a_wsgi_server(self):
+        self._run("run").assert_called_once_with(warm_up=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
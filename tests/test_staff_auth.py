@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+from flask import Flask
+
+# Ensure the app package is importable during test collection
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.routes.admin import admin_bp
+from app.routes.changes import changes_bp
+from app.routes.queue import queue_bp
+from app.utils import staff_auth
+
+
+class TestStaffAuth(unittest.TestCase):
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(admin_bp)
+        app.register_blueprint(changes_bp)
+        app.register_blueprint(queue_bp)
+        self.client = app.test_client()
+        patcher = patch('app.routes.admin.get_revenue_summary', return_value={"paid": 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, remote_addr="127.0.0.1", headers=None, path="/admin/analytics"):
+        return self.client.get(path, environ_base={"REMOTE_ADDR": remote_addr}, headers=headers)
+
+    def test_without_token_only_loopback(self):
+        with patch.object(staff_auth, 'STAFF_TOKEN', ""):
+            self.assertEqual(self.get().status_code, 200)
+            self.assertEqual(self.get("::1").status_code, 200)
+            self.assertEqual(self.get("192.168.0.20").status_code, 401)
+            self.assertEqual(self.get("192.168.0.20", path="/api/changes").status_code, 401)
+
+    def test_queue_desk_actions_need_staff(self):
+        with patch.object(staff_auth, 'STAFF_TOKEN', "s3cret"), \
+                patch('app.routes.queue.call_next_ticket', return_value="A001") as mock_call, \
+                patch('app.routes.queue.complete_ticket', return_value=True):
+            remote = {"REMOTE_ADDR": "192.168.0.20"}
+            self.assertEqual(self.client.post("/queue/call", json={"department": "내과"},
+                                              environ_base=remote).status_code, 401)
+            self.assertEqual(self.client.post("/queue/complete", json={"ticket": "A001"},
+                                              environ_base=remote).status_code, 401)
+            mock_call.assert_not_called()
+            response = self.client.post("/queue/call", json={"department": "내과"}, environ_base=remote,
+                                        headers={"Authorization": "Bearer s3cret"})
+            self.assertEqual(response.get_json()["ticket"], "A001")
+            self.assertEqual(self.client.post("/queue/complete", json={"ticket": "A001"}, environ_base=remote,
+                                              headers={"X-Staff-Token": "s3cret"}).get_json()["completed"], True)
+
+    def test_token_required_when_configured(self):
+        with patch.object(staff_auth, 'STAFF_TOKEN', "s3cret"):
+            self.assertEqual(self.get().status_code, 401)  # Loopback alone is not enough
+            self.assertEqual(self.get("192.168.0.20", {"Authorization": "Bearer s3cret"}).status_code, 200)
+            self.assertEqual(self.get("192.168.0.20", {"X-Staff-Token": "s3cret"}).status_code, 200)
+            self.assertEqual(self.get("192.168.0.20", {"X-Staff-Token": "wrong"}).status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()